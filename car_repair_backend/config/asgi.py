@@ -6,12 +6,16 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 django.setup()
 
 from channels.routing import ProtocolTypeRouter, URLRouter
-from channels.auth import AuthMiddlewareStack
+from core.middleware import JWTAuthMiddleware
 import core.routing
+from core.geocoding import get_gazetteer
+
+# Газетир парсимо при старті воркера, а не на першому запиті з геокодуванням
+get_gazetteer()
 
 application = ProtocolTypeRouter({
     "http": get_asgi_application(),
-    "websocket": AuthMiddlewareStack(
+    "websocket": JWTAuthMiddleware(
         URLRouter(
             core.routing.websocket_urlpatterns
         )
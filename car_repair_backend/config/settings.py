@@ -51,6 +51,7 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'django.contrib.gis',  # GeoDjango
+    'django.contrib.postgres',  # Повнотекстовий і триграмний пошук
     'corsheaders',
     'core',
     'ninja_extra',
@@ -160,4 +161,27 @@ CHANNEL_LAYERS = {
     "default": {
         "BACKEND": "channels.layers.InMemoryChannelLayer"
     }
-}
\ No newline at end of file
+}
+# Спільний кеш для всіх воркерів (інвалідація авторизації, версії індексів, тайли).
+# Без REDIS_URL - кеш в пам'яті процесу, придатний тільки для розробки.
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+# Скільки живе проєкція юзера в кеші, якщо кеш не спільний: бан/зміна ролі
+# в одному воркері дійде до інших не пізніше ніж за цей час
+AUTH_CACHE_LOCAL_TTL = int(os.getenv('AUTH_CACHE_LOCAL_TTL', '30'))
+# Газетир для локального геокодування (CSV: name, lat, lng, kind, parent), напр. вивантаження з OSM
+GAZETTEER_PATH = os.getenv('GAZETTEER_PATH', os.path.join(BASE_DIR, 'data', 'gazetteer.csv'))
+# Дорожній граф для часу в дорозі (каталог з nodes.csv і edges.csv), напр. вивантаження з OSM
+ROAD_GRAPH_PATH = os.getenv('ROAD_GRAPH_PATH', os.path.join(BASE_DIR, 'data', 'road_graph'))
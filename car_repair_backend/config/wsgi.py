@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
 application = get_wsgi_application()
+
+# Газетир парсимо при старті воркера, а не на першому запиті з геокодуванням
+from core.geocoding import get_gazetteer  # noqa: E402
+get_gazetteer()
@@ -1,10 +1,57 @@
+from django import forms
 from django.contrib import admin
+from django.contrib.auth import get_permission_codename
 from django.contrib.auth.admin import UserAdmin
+from django.core.exceptions import PermissionDenied
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from .search import search_requests, is_postgres
+from .importer import read_rows, import_stations
 from .models import (
     User, ServiceCategory, ServiceStation, StationPhoto, 
-    Car, Request, Offer, Review, ClientReview, RequestAttachment
+    Car, Request, Offer, Review, ClientReview, RequestAttachment,
+    ArchivedRequest, ArchivedOffer, VehicleMake, VehicleModel, VehicleGeneration
 )
 
+# 0. ШВИДКА ПАГІНАЦІЯ ДЛЯ ВЕЛИКИХ ТАБЛИЦЬ
+class EstimatedCountPaginator(Paginator):
+    """
+    На PostgreSQL для нефільтрованого списку бере оцінку кількості рядків
+    з pg_class.reltuples замість COUNT(*) по всій таблиці.
+    """
+    # Менші таблиці рахуємо чесно - це дешево
+    ESTIMATE_THRESHOLD = 10000
+
+    @cached_property
+    def count(self):
+        qs = self.object_list
+        connection = connections[qs.db]
+        if connection.vendor == 'postgresql' and not qs.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                    [qs.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] > self.ESTIMATE_THRESHOLD:
+                return row[0]
+        return super().count
+
+
+class FastChangeListMixin:
+    """
+    Спільні налаштування для великих таблиць: оцінка кількості замість COUNT(*)
+    і без другого COUNT(*) для "показати всі".
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+
 # 1. Налаштування для КАТЕГОРІЙ (Те, що ти просив)
 @admin.register(ServiceCategory)
 class ServiceCategoryAdmin(admin.ModelAdmin):
@@ -21,6 +68,11 @@ class ServiceCategoryAdmin(admin.ModelAdmin):
     # Фільтр збоку (показувати тільки кореневі або всі)
     list_filter = [('parent', admin.EmptyFieldListFilter)]
 
+    # __str__ ходить по батьках - підтягуємо всю гілку (дерево до 4 рівнів) одним JOIN.
+    # Через get_queryset, щоб працювало і для списку, і для autocomplete.
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('parent__parent__parent')
+
     # Метод, щоб в адмінці було видно "Двигун -> Звуки -> Стук"
     def get_full_path(self, obj):
         return str(obj)
@@ -41,18 +93,67 @@ class StationPhotoInline(admin.TabularInline):
     model = StationPhoto
     extra = 1
 
+class StationImportForm(forms.Form):
+    file = forms.FileField(label="Файл CSV або XLSX")
+    dry_run = forms.BooleanField(label="Тільки перевірити (нічого не створювати)", required=False)
+
 @admin.register(ServiceStation)
-class ServiceStationAdmin(admin.ModelAdmin):
+class ServiceStationAdmin(FastChangeListMixin, admin.ModelAdmin):
     list_display = ('name', 'owner', 'phone', 'rating', 'created_at')
     search_fields = ('name', 'owner__username')
+    list_select_related = ('owner',)
+    autocomplete_fields = ['owner']
+    filter_horizontal = ('categories',)
     inlines = [StationPhotoInline]
+    # Кнопка "Імпорт" над списком
+    change_list_template = 'admin/core/servicestation/change_list.html'
+
+    def get_urls(self):
+        return [
+            path('import/', self.admin_site.admin_view(self.import_view), name='core_servicestation_import'),
+        ] + super().get_urls()
+
+    def has_import_permission(self, request):
+        # Імпорт створює і СТО, і їх власників - потрібне право додавати обидва
+        user_opts = User._meta
+        return self.has_add_permission(request) and request.user.has_perm(
+            f"{user_opts.app_label}.{get_permission_codename('add', user_opts)}"
+        )
+
+    def changelist_view(self, request, extra_context=None):
+        extra_context = {**(extra_context or {}), 'has_import_permission': self.has_import_permission(request)}
+        return super().changelist_view(request, extra_context)
+
+    def import_view(self, request):
+        # Масовий імпорт СТО партнера (та сама логіка, що й manage.py import_stations)
+        if not self.has_import_permission(request):
+            raise PermissionDenied
+        form = StationImportForm(request.POST or None, request.FILES or None)
+        result = None
+        if request.method == 'POST' and form.is_valid():
+            upload = form.cleaned_data['file']
+            try:
+                result = import_stations(read_rows(upload.file, upload.name), dry_run=form.cleaned_data['dry_run'])
+            except ValueError as e:
+                form.add_error('file', str(e))
+        return TemplateResponse(request, 'admin/core/servicestation/import.html', {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Імпорт СТО',
+            'form': form,
+            'result': result,
+            'errors_shown': result['errors'][:500] if result else [],
+        })
 
 # 4. Налаштування для АВТО
 @admin.register(Car)
-class CarAdmin(admin.ModelAdmin):
+class CarAdmin(FastChangeListMixin, admin.ModelAdmin):
     list_display = ('brand_model', 'license_plate', 'owner', 'year')
     search_fields = ('license_plate', 'brand_model', 'owner__username')
     list_filter = ('year',)
+    list_select_related = ('owner',)
+    autocomplete_fields = ['owner', 'vehicle_model']
+    raw_id_fields = ['vehicle_generation']
 
 # 5. Налаштування для ЗАЯВОК
 class RequestAttachmentInline(admin.TabularInline):
@@ -60,14 +161,100 @@ class RequestAttachmentInline(admin.TabularInline):
     extra = 0
 
 @admin.register(Request)
-class RequestAdmin(admin.ModelAdmin):
+class RequestAdmin(FastChangeListMixin, admin.ModelAdmin):
     list_display = ('id', 'client', 'car_model', 'category', 'status', 'created_at')
     list_filter = ('status', 'created_at')
     search_fields = ('description', 'client__username', 'car_model')
-    autocomplete_fields = ['category', 'client'] # Теж додаємо зручний пошук
+    autocomplete_fields = ['category', 'client', 'vehicle_model'] # Теж додаємо зручний пошук
+    raw_id_fields = ['car']
+    # str(category) ходить по батьках - беремо гілку одним JOIN
+    list_select_related = ('client', 'category__parent__parent__parent')
     inlines = [RequestAttachmentInline]
 
-# 6. Решта моделей (проста реєстрація)
-admin.site.register(Offer)
-admin.site.register(Review)
-admin.site.register(ClientReview)
\ No newline at end of file
+    def get_search_results(self, request, queryset, search_term):
+        # На PostgreSQL - індексний пошук (FTS + триграми) замість icontains по всій таблиці
+        if not search_term or not is_postgres():
+            return super().get_search_results(request, queryset, search_term)
+        matched = search_requests(queryset, search_term).values('id')
+        by_client = queryset.filter(client__username__iexact=search_term).values('id')
+        return queryset.filter(Q(id__in=matched) | Q(id__in=by_client)), False
+
+# 6. ОФЕРИ ТА ВІДГУКИ
+@admin.register(Offer)
+class OfferAdmin(FastChangeListMixin, admin.ModelAdmin):
+    list_display = ('id', 'request', 'mechanic', 'price', 'is_accepted', 'created_at')
+    list_filter = ('is_accepted',)
+    # Request.__str__ показує клієнта
+    list_select_related = ('request__client', 'mechanic')
+    raw_id_fields = ['request', 'mechanic']
+
+@admin.register(Review)
+class ReviewAdmin(FastChangeListMixin, admin.ModelAdmin):
+    list_display = ('__str__', 'mechanic', 'request_id', 'created_at')
+    list_filter = ('rating',)
+    # __str__ читає author.username
+    list_select_related = ('author', 'mechanic')
+    raw_id_fields = ['request', 'author', 'mechanic']
+
+@admin.register(ClientReview)
+class ClientReviewAdmin(FastChangeListMixin, admin.ModelAdmin):
+    list_display = ('__str__', 'author', 'request_id', 'created_at')
+    list_filter = ('rating',)
+    # __str__ читає client.username
+    list_select_related = ('client', 'author')
+    raw_id_fields = ['request', 'author', 'client']
+
+# 7. АРХІВ (тільки перегляд - туди пише archive_requests)
+class ArchivedOfferInline(admin.TabularInline):
+    model = ArchivedOffer
+    extra = 0
+    can_delete = False
+    readonly_fields = ('mechanic', 'price', 'comment', 'is_accepted', 'created_at')
+    fields = readonly_fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(ArchivedRequest)
+class ArchivedRequestAdmin(FastChangeListMixin, admin.ModelAdmin):
+    list_display = ('id', 'client', 'car_model', 'status', 'created_at', 'archived_at')
+    list_filter = ('status',)
+    search_fields = ('=id', 'client__username')
+    list_select_related = ('client',)
+    raw_id_fields = ['client', 'category', 'car', 'vehicle_model']
+    inlines = [ArchivedOfferInline]
+
+    # Архів - тільки для перегляду: правки розійшлися б з історією оферів і відгуків
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+# 8. КАТАЛОГ АВТО (наповнюється load_car_catalog; правки тут скидають індекс автодоповнення)
+class VehicleModelInline(admin.TabularInline):
+    model = VehicleModel
+    extra = 0
+    fields = ('name', 'aliases')
+    show_change_link = True
+
+@admin.register(VehicleMake)
+class VehicleMakeAdmin(admin.ModelAdmin):
+    list_display = ('name', 'aliases')
+    search_fields = ('name',)
+    inlines = [VehicleModelInline]
+
+class VehicleGenerationInline(admin.TabularInline):
+    model = VehicleGeneration
+    extra = 0
+
+@admin.register(VehicleModel)
+class VehicleModelAdmin(admin.ModelAdmin):
+    list_display = ('name', 'make', 'aliases')
+    list_filter = ('make',)
+    search_fields = ('name', 'make__name')
+    list_select_related = ('make',)
+    inlines = [VehicleGenerationInline]
@@ -7,8 +7,14 @@ from .stations import station_router, geo_router
 from .service import router as service_router
 from core.api.offers import router as offers_router
 from core.api.reviews import router as reviews_router
-
-api = NinjaExtraAPI()
+from core.api.metrics import router as metrics_router
+from core.api.map import router as map_router
+from core.api.analytics import router as analytics_router
+from core.api.export import router as export_router
+from core.api.renderers import ORJSONRenderer, ORJSONParser
+
+# orjson для відповідей і тіла запитів (fallback на stdlib json, якщо не встановлено)
+api = NinjaExtraAPI(renderer=ORJSONRenderer(), parser=ORJSONParser())
 api.register_controllers(NinjaJWTDefaultController)
 
 # --- ПІДКЛЮЧЕННЯ РОУТЕРІВ ---
@@ -36,3 +42,13 @@ api.add_router("/reviews", reviews_router)
 
 api.add_router("/categories", categories_router)
 
+api.add_router("/metrics", metrics_router)
+
+# Кластери і тайли для мапи
+api.add_router("/map", map_router)
+
+# Аналітика майстра (/mechanic/stats)
+api.add_router("", analytics_router)
+
+# Експорт даних для аналітиків (тільки staff)
+api.add_router("/export", export_router)
@@ -0,0 +1,85 @@
+from datetime import timedelta
+from typing import List, Optional
+from ninja import Router, Schema
+from ninja.errors import HttpError
+from django.utils import timezone
+from core.authentication import CachedJWTAuth
+from core.models import MechanicStats, MechanicDailyStats
+from core import pricing
+
+router = Router()
+
+# Графік - не довше за цей період (відповідь не росте з історією)
+MAX_DAYS = 90
+
+class MechanicDaySchema(Schema):
+    day: str
+    offers_sent: int
+    offers_accepted: int
+    jobs_done: int
+    revenue: float
+
+class MechanicStatsSchema(Schema):
+    offers_sent: int = 0
+    offers_accepted: int = 0
+    acceptance_rate: Optional[float] = None
+    jobs_done: int = 0
+    revenue: float = 0
+    reviews_count: int = 0
+    avg_rating: Optional[float] = None
+    avg_response_minutes: Optional[float] = None
+    daily: List[MechanicDaySchema] = []
+
+class PriceEstimateSchema(Schema):
+    count: int
+    # area - по району клієнта, all - в районі замало даних, взято всю країну
+    scope: str
+    p10: float
+    p25: float
+    p50: float
+    p75: float
+    p90: float
+
+
+def _ratios(row):
+    return {
+        "acceptance_rate": round(row['offers_accepted'] / row['offers_sent'], 3) if row['offers_sent'] else None,
+        "avg_rating": round(row['rating_sum'] / row['reviews_count'], 2) if row['reviews_count'] else None,
+        "avg_response_minutes": (
+            round(row['response_seconds_sum'] / row['offers_sent'] / 60, 1) if row['offers_sent'] else None
+        ),
+    }
+
+
+@router.get("/mechanic/stats", auth=CachedJWTAuth(), response=MechanicStatsSchema)
+def get_mechanic_stats(request, days: int = 30):
+    # Готові лічильники (core/rollups.py): один рядок підсумків + не більше MAX_DAYS денних
+    user = request.auth
+    if user.role != 'mechanic' and not user.is_staff:
+        raise HttpError(403, "Тільки для майстрів")
+
+    totals = MechanicStats.objects.filter(mechanic_id=user.id).values(
+        'offers_sent', 'offers_accepted', 'jobs_done', 'revenue',
+        'reviews_count', 'rating_sum', 'response_seconds_sum',
+    ).first()
+    if not totals:
+        return {}
+
+    since = timezone.localdate() - timedelta(days=min(max(days, 1), MAX_DAYS) - 1)
+    daily = MechanicDailyStats.objects.filter(mechanic_id=user.id, day__gte=since).order_by('day').values(
+        'day', 'offers_sent', 'offers_accepted', 'jobs_done', 'revenue',
+    )
+    return {
+        **totals,
+        **_ratios(totals),
+        "daily": [{**row, "day": row['day'].isoformat()} for row in daily],
+    }
+
+
+@router.get("/price-estimate", auth=CachedJWTAuth(), response={200: PriceEstimateSchema, 204: None})
+def get_price_estimate(request, category_id: int, lat: float, lng: float):
+    # Медіана і перцентилі цін з t-digest скетчів (core/pricing.py) - без сканування оферів
+    estimate = pricing.estimate(category_id, lat, lng)
+    if estimate is None:
+        return 204, None
+    return estimate
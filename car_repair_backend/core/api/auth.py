@@ -1,7 +1,7 @@
 from ninja import Router
 from django.contrib.auth import get_user_model
 from ninja.errors import HttpError
-from ninja_jwt.authentication import JWTAuth
+from core.authentication import CachedJWTAuth
 from core.schemas import UserRegisterSchema, UserOutSchema
 
 router = Router()
@@ -26,6 +26,6 @@ def register(request, data: UserRegisterSchema):
     return user
 
 # А тут залишаємо /me (без префікса)
-@router.get("/me", auth=JWTAuth(), response=UserOutSchema)
+@router.get("/me", auth=CachedJWTAuth(), response=UserOutSchema)
 def me(request):
     return request.auth
\ No newline at end of file
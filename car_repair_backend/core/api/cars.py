@@ -1,18 +1,24 @@
 from typing import List
 from ninja import Router
 from django.shortcuts import get_object_or_404
-from ninja_jwt.authentication import JWTAuth
+from core.authentication import CachedJWTAuth
 from core.models import Car
-from core.schemas import CarIn, CarOut
+from core.schemas import CarIn, CarOut, VehicleSuggestionSchema
+from core import vehicles
+from core.api.renderers import values_response
 from core.utils.scraper import parse_unda_car  # Імпорт нашого парсера
 
 router = Router()
 
-@router.get("/my-cars", auth=JWTAuth(), response=List[CarOut])
+@router.get("/my-cars", auth=CachedJWTAuth(), response=List[CarOut])
 def get_my_cars(request):
-    return Car.objects.filter(owner=request.auth)
+    # Швидкий шлях: колонки CarOut напряму з values(), без інстансів моделей
+    return values_response(
+        Car.objects.filter(owner=request.auth).order_by('-created_at'),
+        list(CarOut.model_fields),
+    )
 
-@router.post("/my-cars", auth=JWTAuth(), response=CarOut)
+@router.post("/my-cars", auth=CachedJWTAuth(), response=CarOut)
 def add_car(request, data: CarIn):
     car, created = Car.objects.update_or_create(
         owner=request.auth,
@@ -21,13 +27,18 @@ def add_car(request, data: CarIn):
     )
     return car
 
-@router.delete("/my-cars/{car_id}", auth=JWTAuth())
+@router.delete("/my-cars/{car_id}", auth=CachedJWTAuth())
 def delete_car(request, car_id: int):
     car = get_object_or_404(Car, id=car_id, owner=request.auth)
     car.delete()
     return {"success": True}
 
-@router.get("/lookup-car", auth=JWTAuth())
+@router.get("/car-catalog", response=List[VehicleSuggestionSchema])
+def car_catalog_autocomplete(request, q: str, limit: int = 10):
+    # Індекс у пам'яті процесу - без запитів до БД
+    return vehicles.autocomplete(q, min(max(limit, 1), 50))
+
+@router.get("/lookup-car", auth=CachedJWTAuth())
 def lookup_car_by_plate(request, plate: str):
     # Викликаємо РЕАЛЬНИЙ парсер
     data, error = parse_unda_car(plate)
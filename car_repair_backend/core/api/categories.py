@@ -3,6 +3,7 @@
 from typing import List, Optional, Any
 from ninja import Router, Schema
 from core.models import ServiceCategory
+from core.categories import search_categories
 
 router = Router()
 
@@ -18,6 +19,18 @@ try:
 except AttributeError:
     CategoryTreeSchema.update_forward_refs()
 
+class CategoryPathItemSchema(Schema):
+    id: int
+    name: str
+
+class CategorySearchResultSchema(Schema):
+    id: int
+    name: str
+    # Предки від кореня: "Двигун" -> "ГРМ" для "Заміна ременя ГРМ"
+    path: List[CategoryPathItemSchema] = []
+    breadcrumb: str
+    score: float
+
 @router.get("/tree", response=List[CategoryTreeSchema])
 def get_categories_tree(request):
     # 1. Витягуємо ВСІ категорії одним швидким запитом (тільки потрібні поля)
@@ -45,4 +58,9 @@ def get_categories_tree(request):
                 category_map[parent_id]['children'].append(cat)
 
     # 4. Повертаємо тільки коріння (діти вже всередині них)
-    return roots
\ No newline at end of file
+    return roots
+
+@router.get("/search", response=List[CategorySearchResultSchema])
+def search_categories_endpoint(request, q: str, limit: int = 10):
+    # Індекс дерева в пам'яті процесу (перебудовується при зміні категорій) - без запитів до БД
+    return search_categories(q, min(max(limit, 1), 50))
@@ -0,0 +1,29 @@
+from datetime import date
+from typing import Optional
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+from ninja import Router
+from ninja.errors import HttpError
+from core.authentication import CachedJWTAuth
+from core.export import export, as_async, CONTENT_TYPES
+
+router = Router()
+
+@router.get("/{dataset}", auth=CachedJWTAuth())
+def export_dataset(request, dataset: str, format: str = "csv", date_from: Optional[date] = None,
+                   date_to: Optional[date] = None, status: Optional[str] = None):
+    # Тільки для адмінів: весь датасет потоком (серверний курсор), пам'ять не росте з кількістю рядків.
+    # Пропускна здатність останніх експортів - в /api/metrics/ (exports)
+    if not request.auth.is_staff:
+        raise HttpError(403, "Тільки для адміністраторів")
+    try:
+        chunks, _ = export(dataset, format, date_from=date_from, date_to=date_to, status=status)
+    except ValueError as e:
+        raise HttpError(400, str(e))
+
+    if isinstance(request, ASGIRequest):
+        # Під daphne синхронний ітератор StreamingHttpResponse зібрав би в список цілком
+        chunks = as_async(chunks)
+    response = StreamingHttpResponse(chunks, content_type=CONTENT_TYPES[format])
+    response['Content-Disposition'] = f'attachment; filename="{dataset}.{format}"'
+    return response
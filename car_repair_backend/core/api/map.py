@@ -0,0 +1,67 @@
+from django.http import HttpResponse
+from ninja import Router
+from ninja.errors import HttpError
+from core import tiles
+from core.api.renderers import dumps
+from core.authentication import CachedJWTAuth
+from core.search import is_postgres
+from core.geocoding import geocode, reverse_geocode
+
+router = Router()
+
+
+def _check_layer(request, layer):
+    if layer not in tiles.LAYERS:
+        raise HttpError(400, f"Невідомий шар. Доступні: {', '.join(tiles.LAYERS)}")
+    # Шар заявок - це локації клієнтів, його бачать тільки майстри
+    user = request.auth
+    if layer == 'requests' and user.role != 'mechanic' and not user.is_staff:
+        raise HttpError(403, "Тільки для майстрів")
+
+
+@router.get("/clusters", auth=CachedJWTAuth())
+def get_map_clusters(request, bbox: str, zoom: int, layer: str = "stations"):
+    # bbox=west,south,east,north - видима область мапи; точки зливаються в кластери по сітці
+    _check_layer(request, layer)
+    try:
+        west, south, east, north = (float(v) for v in bbox.split(','))
+    except ValueError:
+        raise HttpError(400, "bbox має бути у форматі west,south,east,north")
+    zoom = max(0, min(zoom, tiles.MAX_ZOOM))
+
+    try:
+        clusters = tiles.clusters_for_bbox(layer, west, south, east, north, zoom)
+    except ValueError as e:
+        raise HttpError(400, str(e))
+    return HttpResponse(dumps({"zoom": zoom, "clusters": clusters}), content_type='application/json')
+
+
+@router.get("/tiles/{layer}/{z}/{x}/{y}", auth=CachedJWTAuth())
+def get_map_tile(request, layer: str, z: int, x: int, y: int, format: str = "json"):
+    # Окремий тайл (для шарів мапи, які самі ходять по z/x/y). format=mvt - Mapbox Vector Tile
+    _check_layer(request, layer)
+    if not 0 <= z <= tiles.MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HttpError(400, "Невірні координати тайла")
+
+    if format == "mvt":
+        if not is_postgres():
+            raise HttpError(400, "Vector tiles доступні тільки на PostGIS")
+        return HttpResponse(tiles.get_tile(layer, z, x, y, 'mvt'), content_type='application/vnd.mapbox-vector-tile')
+    return HttpResponse(dumps(tiles.get_tile(layer, z, x, y)), content_type='application/json')
+
+
+@router.get("/geocode")
+def geocode_address(request, q: str):
+    # Локальний газетир (core/geocoding.py) - без зовнішніх сервісів
+    found = geocode(q)
+    if not found:
+        raise HttpError(404, "Адресу не знайдено")
+    return found
+
+
+@router.get("/reverse")
+def reverse_geocode_point(request, lat: float, lng: float):
+    found = reverse_geocode(lat, lng)
+    if not found:
+        raise HttpError(404, "Поруч немає відомих місць")
+    return found
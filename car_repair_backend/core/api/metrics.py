@@ -0,0 +1,13 @@
+from ninja import Router
+from ninja.errors import HttpError
+from core.authentication import CachedJWTAuth
+from core import metrics
+
+router = Router()
+
+@router.get("/", auth=CachedJWTAuth())
+def get_metrics(request):
+    # Тільки для адмінів: латентність доставки SOS тощо (в межах цього процесу)
+    if not request.auth.is_staff:
+        raise HttpError(403, "Тільки для адміністраторів")
+    return metrics.snapshot_all()
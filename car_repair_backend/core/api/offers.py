@@ -1,8 +1,10 @@
 from typing import List, Optional
 from ninja import Router, Schema
-from ninja_jwt.authentication import JWTAuth
+from core.authentication import CachedJWTAuth
 from django.shortcuts import get_object_or_404
-from core.models import Offer, Request
+from django.db.models import Exists, OuterRef, F
+from core.models import Offer, Request, ClientReview, ArchivedOffer
+from core import workflow
 
 router = Router()
 
@@ -73,12 +75,15 @@ class MechanicJobSchema(Schema):
     # 👇 ДОДАВ ЦЕЙ ВАЖЛИВИЙ МЕТОД 👇
     @staticmethod
     def resolve_has_client_review(obj):
+        # Список анотує client_review_exists (EXISTS у тому ж запиті)
+        if hasattr(obj, 'client_review_exists'):
+            return obj.client_review_exists
         # Перевіряємо, чи є у заявки (request) пов'язаний client_review
         return hasattr(obj.request, 'client_review')
 
 # --- ЕНДПОІНТИ ---
 
-@router.post("/", auth=JWTAuth())
+@router.post("/", auth=CachedJWTAuth())
 def create_offer(request, data: OfferCreateSchema):
     user = request.auth
     
@@ -92,34 +97,27 @@ def create_offer(request, data: OfferCreateSchema):
         from ninja.errors import HttpError
         raise HttpError(409, "Ви вже відгукнулись на цю заявку")
 
-    offer = Offer.objects.create(
-        mechanic=user,
-        request=req_obj,
-        price=data.price,
-        comment=data.comment
-    )
+    offer = workflow.create_offer(req_obj, user, data.price, data.comment)
     return {"success": True, "id": offer.id}
 
-@router.get("/mechanic/my-offers", auth=JWTAuth(), response=List[MechanicJobSchema])
+@router.get("/mechanic/my-offers", auth=CachedJWTAuth(), response=List[MechanicJobSchema])
 def get_mechanic_offers(request):
     user = request.auth
     # Додаємо select_related('request__client_review'), щоб не робити зайвих запитів до БД
+    columns = (
+        'id', 'price', 'is_accepted', 'request',
+        'request__car_model', 'request__description', 'request__status', 'request__location',
+        'request__client', 'request__client__username', 'request__client__phone',
+    )
     offers = Offer.objects.filter(mechanic=user)\
         .select_related('request', 'request__client')\
+        .only(*columns)\
+        .annotate(client_review_exists=Exists(ClientReview.objects.filter(request_id=OuterRef('request_id'))))\
         .order_by('-created_at')
-    return offers
-
-@router.post("/{offer_id}/accept", auth=JWTAuth())
-def accept_offer(request, offer_id: int):
-    offer = get_object_or_404(Offer, id=offer_id)
-    if offer.request.client != request.auth:
-         from ninja.errors import HttpError
-         raise HttpError(403, "Це не ваша заявка")
-    
-    offer.is_accepted = True
-    offer.save()
-    
-    offer.request.status = 'in_progress'
-    offer.request.save()
-    
-    return {"success": True}
\ No newline at end of file
+    # Офери на заархівовані заявки - та сама форма, відгук вже зафіксований прапорцем
+    archived = ArchivedOffer.objects.filter(mechanic=user)\
+        .select_related('request', 'request__client')\
+        .only(*columns)\
+        .annotate(client_review_exists=F('request__has_client_review'))\
+        .order_by('-created_at')
+    return [*offers, *archived]
@@ -0,0 +1,42 @@
+# car_repair_backend/core/api/projection.py
+
+from ninja.errors import HttpError
+from core.api.renderers import values_response
+
+# Колонки, які реально потрібні схемам відповіді (для .only())
+REQUEST_OUT_COLUMNS = ('id', 'car_model', 'description', 'status', 'is_sos', 'created_at', 'location', 'car_id')
+STATION_OUT_COLUMNS = ('id', 'name', 'description', 'services_list', 'rating', 'address', 'phone', 'location')
+
+# Поля, які можна попросити через ?fields= (легка проєкція, напр. пін на мапі: id,location)
+REQUEST_LIGHT_FIELDS = ('id', 'car_model', 'status', 'is_sos', 'created_at', 'location', 'category_id', 'car_id')
+STATION_LIGHT_FIELDS = ('id', 'name', 'rating', 'address', 'phone', 'location')
+
+
+def location_to_dict(row):
+    point = row['location']
+    if point:
+        return {"x": point.x, "y": point.y}
+    return None
+
+
+def parse_fields(fields, allowed):
+    """
+    "id, location" -> ['id', 'location'] з перевіркою на дозволені поля.
+    """
+    requested = [name.strip() for name in fields.split(',') if name.strip()]
+    unknown = [name for name in requested if name not in allowed]
+    if unknown or not requested:
+        raise HttpError(400, f"Невідомі поля: {', '.join(unknown) or '-'}. Доступні: {', '.join(allowed)}")
+    return requested
+
+
+def light_response(queryset, fields, allowed, *extra_querysets):
+    """
+    Відповідь тільки з запитаними колонками - одразу з values(), без моделей і схем.
+    extra_querysets (напр. архів) з тими самими полями дописуються в кінець.
+    """
+    requested = parse_fields(fields, allowed)
+    computed = {}
+    if 'location' in requested:
+        computed['location'] = location_to_dict
+    return values_response(queryset, requested, *extra_querysets, **computed)
@@ -0,0 +1,55 @@
+# car_repair_backend/core/api/renderers.py
+
+import json
+from django.http import HttpResponse
+from ninja.parser import Parser
+from ninja.renderers import JSONRenderer
+from ninja.responses import NinjaJSONEncoder
+
+try:
+    import orjson
+except ImportError:  # orjson опційний: без нього все працює на stdlib json
+    orjson = None
+
+_encoder = NinjaJSONEncoder()
+
+
+def dumps(data):
+    """
+    orjson (в рази швидше), а для типів, яких він не знає (Decimal...), -
+    той самий енкодер, що й у ninja за замовчуванням. Дати теж через нього:
+    формат як був (мілісекунди, "Z" для UTC), клієнти його парсять.
+    """
+    if orjson is None:
+        return json.dumps(data, cls=NinjaJSONEncoder)
+    return orjson.dumps(
+        data, default=_encoder.default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+    )
+
+
+class ORJSONRenderer(JSONRenderer):
+    def render(self, request, data, *, response_status):
+        return dumps(data)
+
+
+class ORJSONParser(Parser):
+    def parse_body(self, request):
+        if orjson is None:
+            return super().parse_body(request)
+        return orjson.loads(request.body)
+
+
+def values_response(queryset, fields, *extra_querysets, **computed):
+    """
+    Швидкий шлях для списків: values() замість моделей, без pydantic-валідації.
+    computed - поля, які рахуються з рядка: name=lambda row: ...
+    Допоміжні колонки (напр. 'author__username') можна прибрати через row.pop().
+    """
+    rows = list(queryset.values(*fields))
+    for extra in extra_querysets:
+        rows.extend(extra.values(*fields))
+    if computed:
+        for row in rows:
+            for name, func in computed.items():
+                row[name] = func(row)
+    return HttpResponse(dumps(rows), content_type='application/json')
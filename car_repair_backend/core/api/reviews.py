@@ -1,9 +1,10 @@
 from typing import List
 from ninja import Router, Schema
-from ninja_jwt.authentication import JWTAuth
+from core.authentication import CachedJWTAuth
 from django.shortcuts import get_object_or_404
 from django.db.models import Avg  # 👈 ДОДАНО ЦЕЙ ІМПОРТ
 from core.models import Review, Request, ClientReview
+from core.api.renderers import values_response
 
 router = Router()
 
@@ -27,7 +28,7 @@ class ReviewOutSchema(Schema):
     def resolve_created_at(obj):
         return obj.created_at.strftime('%Y-%m-%d')
 
-@router.post("/", auth=JWTAuth())
+@router.post("/", auth=CachedJWTAuth())
 def create_review(request, data: ReviewCreateSchema):
     user = request.auth
     
@@ -64,10 +65,17 @@ def create_review(request, data: ReviewCreateSchema):
 
 @router.get("/mechanic/{mechanic_id}", response=List[ReviewOutSchema])
 def get_mechanic_reviews(request, mechanic_id: int):
-    return Review.objects.filter(mechanic_id=mechanic_id).order_by('-created_at')
+    # Швидкий шлях: без інстансів Review/User і без resolve_* на кожен рядок
+    return values_response(
+        Review.objects.filter(mechanic_id=mechanic_id).order_by('-created_at'),
+        ['id', 'author__username', 'rating', 'comment', 'created_at'],
+        author_name=lambda row: row.pop('author__username'),
+        created_at=lambda row: row['created_at'].strftime('%Y-%m-%d'),
+        comment=lambda row: row['comment'] or '',
+    )
 
 # 👇 НОВИЙ ЕНДПОІНТ: Майстер оцінює клієнта
-@router.post("/client/", auth=JWTAuth())
+@router.post("/client/", auth=CachedJWTAuth())
 def create_client_review(request, data: ReviewCreateSchema):
     user = request.auth # Це майстер
     
@@ -1,16 +1,29 @@
-from typing import List
+import heapq
+from datetime import date, datetime, timedelta
+from itertools import islice
+from typing import List, Optional
 from ninja import Router, UploadedFile, File
 from django.shortcuts import get_object_or_404
 from django.contrib.gis.geos import Point
 from django.contrib.gis.measure import D
-from ninja_jwt.authentication import JWTAuth
+from django.db.models import F, Q, Exists, OuterRef, Prefetch
+from django.utils import timezone
+from core.authentication import CachedJWTAuth
+from core import workflow, road_routing
+from core.categories import category_subtree_ids, station_served_category_ids
+from core.search import search_requests, is_postgres, make_snippet, escape_headline
 from ninja.errors import HttpError
-from core.models import Request, Offer, ServiceCategory, Car, ServiceStation, RequestAttachment
-from core.schemas import RequestCreateSchema, RequestOutSchema, OfferCreateSchema, OfferOutSchema, AttachmentOutSchema
+from core.models import Request, Offer, ServiceCategory, Car, ServiceStation, RequestAttachment, Review, ArchivedRequest, ArchivedOffer
+from core.api.projection import light_response, REQUEST_OUT_COLUMNS, REQUEST_LIGHT_FIELDS
+from core.schemas import RequestCreateSchema, RequestOutSchema, RequestFeedDeltaSchema, RequestSearchResultSchema, OfferCreateSchema, OfferOutSchema, AttachmentOutSchema
 from math import radians, cos, sin, asin, sqrt
 
 router = Router()
 
+# Запас для курсора дельта-стрічки: транзакція, що почалась раніше,
+# може закомітитись пізніше - краще віддати кілька рядків повторно, ніж загубити
+FEED_CURSOR_LAG = timedelta(seconds=5)
+
 # Функція розрахунку дистанції
 def calculate_distance(lon1, lat1, lon2, lat2):
     lon1, lat1, lon2, lat2 = map(radians, [lon1, lat1, lon2, lat2])
@@ -21,9 +34,52 @@ def calculate_distance(lon1, lat1, lon2, lat2):
     r = 6371 
     return c * r
 
+def stations_distances(req, stations):
+    """
+    [(км, хвилини)] від кожної СТО до заявки: по дорожньому графу одним викликом,
+    для СТО поза графом - по прямій (хвилини тоді None).
+    """
+    routes = road_routing.travel_to(
+        (req.location.y, req.location.x),
+        [(station.location.y, station.location.x) for station in stations],
+    )
+    return [
+        (route["distance_km"], route["minutes"]) if route else
+        (calculate_distance(req.location.x, req.location.y, station.location.x, station.location.y), None)
+        for station, route in zip(stations, routes)
+    ]
+
+def station_distance(req, station):
+    return stations_distances(req, [station])[0]
+
+def filter_by_categories(queryset, user, category_id=None, only_my_categories=False):
+    """
+    Фільтр стрічки по категорії (з під-категоріями) або по послугах СТО майстра.
+    """
+    if category_id:
+        queryset = queryset.filter(category_id__in=category_subtree_ids(category_id))
+    if only_my_categories:
+        station_id = getattr(user, 'station_id', None)
+        served = station_served_category_ids(station_id) if station_id else set()
+        # Якщо СТО ще не вказала послуги - показуємо все
+        if served:
+            queryset = queryset.filter(Q(category_id__in=served) | Q(category__isnull=True))
+    return queryset
+
+def for_request_out(queryset):
+    """
+    Тільки колонки RequestOutSchema (без search_vector тощо), has_review
+    через EXISTS в тому ж запиті і вкладення одним prefetch.
+    """
+    return queryset.only(*REQUEST_OUT_COLUMNS).annotate(
+        review_exists=Exists(Review.objects.filter(request_id=OuterRef('pk')))
+    ).prefetch_related(
+        Prefetch('attachments', queryset=RequestAttachment.objects.only('id', 'request_id', 'file', 'file_type'))
+    )
+
 # --- ЗАЯВКИ (REQUESTS) ---
 
-@router.post("/requests", auth=JWTAuth(), response=RequestOutSchema)
+@router.post("/requests", auth=CachedJWTAuth(), response=RequestOutSchema)
 def create_request(request, data: RequestCreateSchema):
     user = request.auth
     # Для MVP поки беремо першу категорію або знаходимо за ID, якщо передали
@@ -39,12 +95,13 @@ def create_request(request, data: RequestCreateSchema):
         description=data.description, 
         location=Point(data.lng, data.lat), 
         status='new',
+        is_sos=data.is_sos,
         car_id=data.car_id if data.car_id else None,
     )
     return new_request
 
 # 👇 ГОЛОВНЕ: Завантаження фото/відео до заявки
-@router.post("/requests/{request_id}/attachments", auth=JWTAuth(), response=AttachmentOutSchema)
+@router.post("/requests/{request_id}/attachments", auth=CachedJWTAuth(), response=AttachmentOutSchema)
 def upload_request_attachment(request, request_id: int, file: UploadedFile = File(...)):
     user = request.auth
     req = get_object_or_404(Request, id=request_id, client=user)
@@ -55,34 +112,125 @@ def upload_request_attachment(request, request_id: int, file: UploadedFile = Fil
         file_type = 'video'
 
     attachment = RequestAttachment.objects.create(request=req, file=file, file_type=file_type)
+    # Нове фото = зміна заявки для дельта-стрічки (update без post_save)
+    Request.objects.filter(id=req.id).update(updated_at=timezone.now())
     return attachment
 
-@router.get("/requests/nearby", auth=JWTAuth(), response=List[RequestOutSchema])
-def get_nearby_requests(request, lat: float, lng: float, radius_km: int = 10):
+@router.get("/requests/nearby", auth=CachedJWTAuth(), response=List[RequestOutSchema])
+def get_nearby_requests(request, lat: float, lng: float, radius_km: int = 10,
+                        category_id: Optional[int] = None, only_my_categories: bool = False,
+                        fields: Optional[str] = None):
     user_location = Point(lng, lat)
-    # prefetch_related('attachments') дозволяє майстру бачити фото водія
     requests = Request.objects.filter(
         location__distance_lte=(user_location, D(km=radius_km)),
         status='new'
-    ).prefetch_related('attachments').order_by('-created_at')
-    return requests
+    )
+    requests = filter_by_categories(requests, request.auth, category_id, only_my_categories)
+    requests = requests.order_by('-is_sos', '-created_at')  # SOS першими (індекс request_feed_sos_idx)
+
+    # ?fields=id,location - легка проєкція (напр. піни на мапі)
+    if fields:
+        return light_response(requests, fields, REQUEST_LIGHT_FIELDS)
+    # Вкладення (prefetch) дозволяють майстру бачити фото водія
+    return for_request_out(requests)
+
+@router.get("/requests/nearby/changes", auth=CachedJWTAuth(), response=RequestFeedDeltaSchema)
+def get_nearby_requests_changes(request, lat: float, lng: float, radius_km: int = 10, since: Optional[datetime] = None,
+                                category_id: Optional[int] = None, only_my_categories: bool = False):
+    """
+    Інкрементальна стрічка: тільки те, що змінилось після курсора since.
+    Без since - повний знімок відкритих заявок + курсор.
+    """
+    user_location = Point(lng, lat)
+    cursor = timezone.now() - FEED_CURSOR_LAG
 
-@router.get("/my-requests", auth=JWTAuth(), response=List[RequestOutSchema])
-def get_my_requests(request):
-    return Request.objects.filter(client=request.auth).prefetch_related('attachments').order_by('-created_at')
+    in_radius = Request.objects.filter(location__distance_lte=(user_location, D(km=radius_km)))
+    in_radius = filter_by_categories(in_radius, request.auth, category_id, only_my_categories)
+    if since is None:
+        upserted = in_radius.filter(status='new')
+        removed = []
+    else:
+        changed = in_radius.filter(updated_at__gte=since)
+        upserted = changed.filter(status='new')
+        removed = list(changed.exclude(status='new').values_list('id', flat=True))
 
-@router.post("/requests/{request_id}/finish", auth=JWTAuth())
+    return {
+        "cursor": cursor,
+        "upserted": for_request_out(upserted).order_by('-is_sos', '-created_at'),
+        "removed": removed,
+    }
+
+@router.get("/requests/search", auth=CachedJWTAuth(), response=List[RequestSearchResultSchema])
+def search_requests_history(request, q: str, status: Optional[str] = None, category_id: Optional[int] = None,
+                            date_from: Optional[date] = None, date_to: Optional[date] = None,
+                            limit: int = 20, offset: int = 0):
+    """
+    Пошук по історії: клієнт - свої заявки, майстер - ті, на які відгукувався,
+    адмін - всі. Повнотекстовий + триграмний пошук з підсвіченим сніпетом.
+    Шукає і в гарячій таблиці, і в архіві (archive_requests) - результати
+    зливаються в один список з тим самим порядком і пагінацією.
+    """
+    user = request.auth
+    requests = Request.objects.all()
+    archived = ArchivedRequest.objects.defer('search_vector')
+    if not user.is_staff:
+        # Підзапит замість JOIN з оферами - без дублікатів і без DISTINCT
+        offered = Offer.objects.filter(mechanic_id=user.id).values('request_id')
+        requests = requests.filter(Q(client_id=user.id) | Q(id__in=offered))
+        archived_offered = ArchivedOffer.objects.filter(mechanic_id=user.id).values('request_id')
+        archived = archived.filter(Q(client_id=user.id) | Q(id__in=archived_offered))
+
+    filters = {}
+    if status:
+        filters['status'] = status
+    if category_id:
+        filters['category_id__in'] = category_subtree_ids(category_id)
+    if date_from:
+        filters['created_at__date__gte'] = date_from
+    if date_to:
+        filters['created_at__date__lte'] = date_to
+
+    limit = min(limit, 100)
+    # З кожної таблиці - перші offset+limit, після злиття лишаємо потрібну сторінку
+    window = offset + limit
+    live = list(for_request_out(search_requests(requests.filter(**filters), q))[:window])
+    archived_hits = list(search_requests(archived.filter(**filters), q).annotate(review_exists=F('has_review'))[:window])
+    if is_postgres():
+        order = lambda req: (req.rank, req.similarity, req.created_at)
+    else:
+        order = lambda req: req.created_at
+    results = heapq.merge(live, archived_hits, key=order, reverse=True)
+    results = list(islice(results, offset, window))
+    for req in results:
+        if is_postgres():
+            req.snippet = escape_headline(req.snippet)
+        else:
+            req.snippet = make_snippet(req.description, q)
+    return results
+
+@router.get("/my-requests", auth=CachedJWTAuth(), response=List[RequestOutSchema])
+def get_my_requests(request, fields: Optional[str] = None):
+    requests = Request.objects.filter(client=request.auth).order_by('-created_at')
+    # Старі закриті заявки лежать в архіві (archive_requests) - віддаємо їх після гарячих
+    archived = ArchivedRequest.objects.filter(client=request.auth).order_by('-created_at')
+    if fields:
+        return light_response(requests, fields, REQUEST_LIGHT_FIELDS, archived)
+    return [*for_request_out(requests), *archived.annotate(review_exists=F('has_review'))]
+
+@router.post("/requests/{request_id}/finish", auth=CachedJWTAuth())
 def finish_request(request, request_id: int):
     req = get_object_or_404(Request, id=request_id)
-    if req.client.id != request.auth.id:
+    if req.client_id != request.auth.id:
          raise HttpError(403, "Це не ваша заявка")
-    req.status = 'done'
-    req.save()
+    try:
+        workflow.finish_request(req)
+    except workflow.InvalidTransition as e:
+        raise HttpError(409, str(e))
     return {"success": True}
 
 # --- ПРОПОЗИЦІЇ (OFFERS) ---
 
-@router.post("/offers", auth=JWTAuth(), response=OfferOutSchema)
+@router.post("/offers", auth=CachedJWTAuth(), response=OfferOutSchema)
 def create_offer(request, data: OfferCreateSchema):
     user = request.auth
     req = get_object_or_404(Request, id=data.request_id)
@@ -94,9 +242,9 @@ def create_offer(request, data: OfferCreateSchema):
     if Offer.objects.filter(mechanic=user, request=req).exists():
         raise HttpError(409, "Ви вже надіслали пропозицію")
 
-    offer = Offer.objects.create(mechanic=user, request=req, price=data.price, comment=data.comment)
+    offer = workflow.create_offer(req, user, data.price, data.comment)
     
-    dist = calculate_distance(req.location.x, req.location.y, station.location.x, station.location.y)
+    dist, minutes = station_distance(req, station)
 
     return {
         "id": offer.id,
@@ -107,25 +255,32 @@ def create_offer(request, data: OfferCreateSchema):
         "is_accepted": offer.is_accepted,
         "station_address": station.address,
         "distance_km": round(dist, 1),
+        "travel_minutes": round(minutes) if minutes is not None else None,
         "station_lat": station.location.y,
         "station_lng": station.location.x
     }
 
-@router.get("/requests/{request_id}/offers", auth=JWTAuth(), response=List[OfferOutSchema])
+@router.get("/requests/{request_id}/offers", auth=CachedJWTAuth(), response=List[OfferOutSchema])
 def get_offers_for_request(request, request_id: int):
-    offers = Offer.objects.filter(request_id=request_id).select_related('mechanic')
+    offers = list(Offer.objects.filter(request_id=request_id).select_related('mechanic'))
     req = get_object_or_404(Request, id=request_id)
-    
+
+    # Одне СТО на майстра (перше за id) - одним запитом, а не запитом на кожен офер
+    stations = {}
+    for station in ServiceStation.objects.filter(owner_id__in={o.mechanic_id for o in offers}).order_by('-id'):
+        stations[station.owner_id] = station
+    located = [station for station in stations.values() if station.location]
+    distances = dict(zip((station.id for station in located), stations_distances(req, located)))
+
     result = []
     for o in offers:
-        station = ServiceStation.objects.filter(owner=o.mechanic).first()
-        dist = None
+        station = stations.get(o.mechanic_id)
+        dist, minutes = distances.get(station.id, (None, None)) if station else (None, None)
         addr = "Адреса не вказана"
         lat, lng = None, None
         
         if station and station.location:
             addr = station.address
-            dist = calculate_distance(req.location.x, req.location.y, station.location.x, station.location.y)
             lat, lng = station.location.y, station.location.x
 
         result.append({
@@ -137,18 +292,19 @@ def get_offers_for_request(request, request_id: int):
             "is_accepted": o.is_accepted,
             "station_address": addr,
             "distance_km": round(dist, 1) if dist else None,
+            "travel_minutes": round(minutes) if minutes is not None else None,
             "station_lat": lat,
             "station_lng": lng
         })
     return result
 
-@router.post("/offers/{offer_id}/accept", auth=JWTAuth())
+@router.post("/offers/{offer_id}/accept", auth=CachedJWTAuth())
 def accept_offer(request, offer_id: int):
-    offer = get_object_or_404(Offer, id=offer_id)
-    if offer.request.client.id != request.auth.id:
+    offer = get_object_or_404(Offer.objects.select_related('request'), id=offer_id)
+    if offer.request.client_id != request.auth.id:
             raise HttpError(403, "Це не ваша заявка")
-    offer.is_accepted = True
-    offer.save()
-    offer.request.status = 'active'
-    offer.request.save()
+    try:
+        workflow.accept_offer(offer)
+    except workflow.InvalidTransition as e:
+        raise HttpError(409, str(e))
     return {"success": True}
\ No newline at end of file
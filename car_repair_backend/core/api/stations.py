@@ -1,11 +1,20 @@
-from typing import List
+from typing import List, Optional
 from ninja import Router, UploadedFile, File
+from ninja.errors import HttpError
 from django.shortcuts import get_object_or_404
 from django.contrib.gis.geos import Point
 from django.contrib.gis.measure import D
-from ninja_jwt.authentication import JWTAuth
-from core.models import ServiceStation, StationPhoto
+from django.db.models import Prefetch
+from django.http import HttpResponse
+from core.authentication import CachedJWTAuth
+from core.models import ServiceStation, StationPhoto, ServiceCategory
+from core.categories import parse_services_list, category_subtree_ids
 from core.schemas import StationOutSchema, PhotoOutSchema, StationIn
+from core.search import search_stations
+from core.api.projection import light_response, STATION_OUT_COLUMNS, STATION_LIGHT_FIELDS
+from core.api.renderers import dumps
+from core import geo_cache
+from core.geocoding import geocode
 
 # Роутер для власника СТО (приватний)
 station_router = Router()
@@ -13,10 +22,16 @@ station_router = Router()
 # Роутер для пошуку та перегляду (публічний)
 geo_router = Router()
 
-@station_router.post("/my-station", auth=JWTAuth(), response=StationOutSchema)
+@station_router.post("/my-station", auth=CachedJWTAuth(), response=StationOutSchema)
 def create_or_update_station(request, data: StationIn):
     user = request.auth
-    
+
+    if data.lat is None or data.lng is None:
+        found = geocode(data.address)
+        if not found:
+            raise HttpError(400, "Не вдалося знайти адресу - вкажіть точку на мапі")
+        data.lat, data.lng = found["lat"], found["lng"]
+
     # postgis Point потребує (lng, lat)
     location = Point(data.lng, data.lat)
 
@@ -31,20 +46,25 @@ def create_or_update_station(request, data: StationIn):
             "location": location
         }
     )
+
+    if data.category_ids is not None:
+        station.categories.set(ServiceCategory.objects.filter(id__in=data.category_ids))
+    else:
+        station.categories.set(parse_services_list(data.services_list))
     return station
 
 # --- КАБІНЕТ ВЛАСНИКА СТО ---
 
 
-@station_router.get("/my-station", auth=JWTAuth(), response=StationOutSchema)
+@station_router.get("/my-station", auth=CachedJWTAuth(), response=StationOutSchema)
 def get_my_station(request):
     # .prefetch_related('photos') завантажує фото разом зі станцією
-    station = ServiceStation.objects.filter(owner=request.auth).prefetch_related('photos').first()
+    station = ServiceStation.objects.filter(owner=request.auth).prefetch_related('photos', 'categories').first()
     if not station:
         return 204, None
     return station
 
-@station_router.post("/my-station/photos", auth=JWTAuth(), response=PhotoOutSchema)
+@station_router.post("/my-station/photos", auth=CachedJWTAuth(), response=PhotoOutSchema)
 def upload_station_photo(request, file: UploadedFile = File(...)):
     user = request.auth
     # Шукаємо станцію користувача
@@ -54,7 +74,7 @@ def upload_station_photo(request, file: UploadedFile = File(...)):
     photo = StationPhoto.objects.create(station=station, image=file)
     return photo
 
-@station_router.delete("/my-station/photos/{photo_id}", auth=JWTAuth())
+@station_router.delete("/my-station/photos/{photo_id}", auth=CachedJWTAuth())
 def delete_station_photo(request, photo_id: int):
     user = request.auth
     # Видаляємо тільки якщо фото належить станції цього юзера
@@ -65,23 +85,67 @@ def delete_station_photo(request, photo_id: int):
 
 # --- ПУБЛІЧНИЙ ПОШУК ---
 
+def for_station_out(queryset):
+    """
+    Тільки колонки StationOutSchema (без search_vector тощо) + фото і категорії одним prefetch.
+    """
+    return queryset.only(*STATION_OUT_COLUMNS).prefetch_related(
+        Prefetch('photos', queryset=StationPhoto.objects.only('id', 'station_id', 'image')),
+        Prefetch('categories', queryset=ServiceCategory.objects.only('id')),
+    )
+
 @geo_router.get("/nearby", response=List[StationOutSchema]) 
-def get_nearby_stations(request, lat: float, lng: float, radius_km: int = 20):
+def get_nearby_stations(request, lat: float, lng: float, radius_km: int = 20, category_id: Optional[int] = None,
+                        fields: Optional[str] = None):
+    # Центр прив'язуємо до сітки (~500 м), щоб сусіди ділили одну закешовану відповідь
+    lat, lng = geo_cache.snap(lat, lng)
+    cache_key = geo_cache.nearby_key(lat, lng, radius_km, category_id, fields)
+    if cache_key is not None:
+        body = geo_cache.station_cache.get(cache_key)
+        if body is not None:
+            return HttpResponse(body, content_type='application/json')
+
     user_location = Point(lng, lat)
     
-    # Шукаємо станції в радіусі + завантажуємо їх фото
+    # Шукаємо станції в радіусі
     stations = ServiceStation.objects.filter(
         location__distance_lte=(user_location, D(km=radius_km))
-    ).prefetch_related('photos')
-    
-    return stations
+    )
+
+    # Фільтр по категорії разом з під-категоріями (JOIN через M2M)
+    if category_id:
+        stations = stations.filter(categories__in=category_subtree_ids(category_id)).distinct()
+
+    # ?fields=id,location - легка проєкція для пінів на мапі
+    if fields:
+        response = light_response(stations, fields, STATION_LIGHT_FIELDS)
+    else:
+        # + завантажуємо їх фото; серіалізуємо самі, щоб закешувати готові байти
+        response = HttpResponse(
+            dumps([StationOutSchema.from_orm(st).model_dump() for st in for_station_out(stations)]),
+            content_type='application/json',
+        )
+
+    if cache_key is not None:
+        geo_cache.station_cache.set(cache_key, response.content, geo_cache.entry_ttl())
+    return response
+
+@geo_router.get("/search", response=List[StationOutSchema])
+def search_nearby_stations(request, q: str, lat: float, lng: float, radius_km: int = 20, limit: int = 20):
+    # Пошук по назві та послугах ("розвал-сходження") в радіусі.
+    # PostgreSQL: FTS + триграми (GIN), SQLite: інвертований індекс в пам'яті
+    user_location = Point(lng, lat)
+    stations = for_station_out(ServiceStation.objects.filter(
+        location__distance_lte=(user_location, D(km=radius_km))
+    ))
+    return search_stations(stations, q, limit=min(limit, 100))
 
 @geo_router.get("/{station_id}", response=StationOutSchema)
 def get_station_details(request, station_id: int):
     # Додаємо prefetch_related('owner__received_reviews')
     # owner__received_reviews - це зв'язок від User до Review (related_name='received_reviews')
     
-    station = get_object_or_404(ServiceStation.objects.prefetch_related('photos'), id=station_id)
+    station = get_object_or_404(ServiceStation.objects.prefetch_related('photos', 'categories'), id=station_id)
     
     # Мануально дістаємо відгуки про власника цього СТО
     # Бо модель Review прив'язана до User (mechanic), а не до Station напряму
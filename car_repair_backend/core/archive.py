@@ -0,0 +1,80 @@
+# car_repair_backend/core/archive.py
+"""
+Гаряча/архівна таблиці заявок.
+
+Закриті (done/canceled) заявки старші за ARCHIVE_AFTER переносяться в
+ArchivedRequest/ArchivedOffer, а з Request/Offer видаляються. Історія
+розсилки (RequestDispatch/DispatchNotice) зберігається JSON-ом в ArchivedRequest.
+Стрічка, індекси і vacuum гарячих таблиць тоді працюють тільки з живими
+заявками, а історія (my-requests, my-offers) читає обидві таблиці.
+
+Декларативне партиціонування PostgreSQL тут не підходить: первинний ключ
+партиціонованої таблиці мусить містити created_at, а на Request посилаються
+Offer, Review, RequestAttachment тощо.
+"""
+
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import (
+    Request, Offer, Review, ClientReview, RequestAttachment, RequestDispatch, DispatchNotice,
+    ArchivedRequest, ArchivedOffer,
+)
+
+ARCHIVE_AFTER = getattr(settings, 'REQUEST_ARCHIVE_AFTER', timedelta(days=90))
+CLOSED_STATUSES = ('done', 'canceled')
+
+
+def archivable(older_than=None):
+    cutoff = timezone.now() - (older_than or ARCHIVE_AFTER)
+    # done/canceled - кінцеві статуси, тож заявка вже не зміниться, поки ми її переносимо
+    return Request.objects.filter(status__in=CLOSED_STATUSES, updated_at__lt=cutoff)
+
+
+def archive_batch(ids):
+    """
+    Переносить одну пачку заявок (з оферами) в архів однією транзакцією.
+    """
+    with transaction.atomic():
+        requests = list(Request.objects.filter(id__in=ids, status__in=CLOSED_STATUSES))
+        ids = [req.id for req in requests]
+        reviewed = set(Review.objects.filter(request_id__in=ids).values_list('request_id', flat=True))
+        client_reviewed = set(ClientReview.objects.filter(request_id__in=ids).values_list('request_id', flat=True))
+        attachments = {}
+        for row in RequestAttachment.objects.filter(request_id__in=ids).values('id', 'request_id', 'file', 'file_type'):
+            attachments.setdefault(row.pop('request_id'), []).append(row)
+        # Стан розсилки і кому її відправили - в JSON архівної заявки
+        history = {
+            row.pop('request_id'): {**row, 'notices': []}
+            for row in RequestDispatch.objects.filter(request_id__in=ids).values('request_id', 'wave', 'created_at')
+        }
+        notices = DispatchNotice.objects.filter(request_id__in=ids)\
+            .values('request_id', 'station_id', 'wave', 'score', 'created_at').order_by('request_id', 'wave', 'id')
+        for row in notices:
+            history.setdefault(row.pop('request_id'), {'notices': []})['notices'].append(row)
+
+        ArchivedRequest.objects.bulk_create([
+            ArchivedRequest(
+                id=req.id, client_id=req.client_id, category_id=req.category_id, car_id=req.car_id,
+                car_model=req.car_model, vehicle_model_id=req.vehicle_model_id, description=req.description,
+                location=req.location, status=req.status, is_sos=req.is_sos, search_vector=req.search_vector,
+                created_at=req.created_at, updated_at=req.updated_at,
+                has_review=req.id in reviewed, has_client_review=req.id in client_reviewed,
+                attachment_files=attachments.get(req.id, []),
+                dispatch_history=history.get(req.id, {}),
+            )
+            for req in requests
+        ])
+        ArchivedOffer.objects.bulk_create([
+            ArchivedOffer(
+                id=offer.id, request_id=offer.request_id, mechanic_id=offer.mechanic_id, price=offer.price,
+                comment=offer.comment, is_accepted=offer.is_accepted, created_at=offer.created_at,
+            )
+            for offer in Offer.objects.filter(request_id__in=ids)
+        ])
+        # Каскадом йдуть офери, вкладення (тільки рядки - файли лишаються) і стан розсилки
+        # (вже скопійовані вище); відгуки лишаються з request=NULL
+        Request.objects.filter(id__in=ids).delete()
+    return len(ids)
+
@@ -0,0 +1,137 @@
+# car_repair_backend/core/authentication.py
+
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from ninja_jwt.authentication import JWTAuth
+from ninja_jwt.settings import api_settings
+from core.caching import cache_is_shared
+
+# Поля користувача, які кладемо в кеш. Все інше на інстансі буде "deferred"
+# і догрузиться з БД тільки якщо ендпоінт реально до нього звернеться.
+USER_PROJECTION_FIELDS = (
+    'id', 'username', 'role', 'phone', 'telegram_id',
+    'is_active', 'is_staff', 'is_superuser',
+)
+
+TOKEN_KEY = "jwt_auth:{user_id}:{jti}"
+VERSION_KEY = "jwt_auth_ver:{user_id}"
+
+
+def _token_key(user_id, jti):
+    return TOKEN_KEY.format(user_id=user_id, jti=jti)
+
+
+def _version_key(user_id):
+    return VERSION_KEY.format(user_id=user_id)
+
+
+def invalidate_user_auth_cache(user_id):
+    """
+    Скидає всі закешовані проєкції юзера (по всіх його токенах).
+    Замість пошуку всіх jti просто міняємо "версію" юзера -
+    старі записи в кеші стають невалідними і самі протухнуть по TTL.
+    Без спільного кешу версія міняється тільки в поточному процесі -
+    інші воркери побачать зміни через AUTH_CACHE_LOCAL_TTL (див. cache_ttl).
+    """
+    cache.set(_version_key(user_id), uuid.uuid4().hex, None)
+
+
+def cache_ttl(validated_token):
+    """
+    Скільки тримати проєкцію в кеші: до кінця життя токена, якщо кеш
+    спільний (інвалідація бачна всім воркерам). Інакше - коротко, щоб
+    is_active і role перечитувались з БД.
+    """
+    timeout = int(validated_token.get('exp', 0) - time.time())
+    if not cache_is_shared():
+        timeout = min(timeout, settings.AUTH_CACHE_LOCAL_TTL)
+    return timeout
+
+
+def build_user_projection(user):
+    """
+    Збирає легку проєкцію юзера (id, роль, id СТО...) для кешу.
+    """
+    from core.models import ServiceStation
+
+    projection = {field: getattr(user, field) for field in USER_PROJECTION_FIELDS}
+    projection['station_id'] = (
+        ServiceStation.objects.filter(owner_id=user.id).values_list('id', flat=True).first()
+    )
+    return projection
+
+
+def user_from_projection(projection):
+    """
+    Відновлює інстанс User з проєкції без запиту до БД.
+    """
+    User = get_user_model()
+    user = User.from_db(
+        None,
+        list(USER_PROJECTION_FIELDS),
+        [projection[field] for field in USER_PROJECTION_FIELDS],
+    )
+    user.station_id = projection['station_id']
+    return user
+
+
+class CachedJWTAuth(JWTAuth):
+    """
+    JWTAuth, який кешує перевіреного юзера по jti токена на весь залишок
+    його життя (зі спільним кешем; інакше - на AUTH_CACHE_LOCAL_TTL).
+    Для "теплого" токена - нуль запитів до БД на авторизацію.
+    """
+
+    def get_cached_user(self, validated_token):
+        """
+        Повертає юзера з кешу або None. Ніколи не ходить в БД, але клієнт
+        кешу синхронний - з async-коду викликати через sync_to_async.
+        """
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        jti = validated_token.get(api_settings.JTI_CLAIM)
+        if user_id is None or jti is None:
+            return None
+
+        token_key = _token_key(user_id, jti)
+        version_key = _version_key(user_id)
+        cached = cache.get_many([token_key, version_key])
+
+        entry = cached.get(token_key)
+        if entry is not None and entry['version'] == cached.get(version_key):
+            return user_from_projection(entry['user'])
+        return None
+
+    def get_user(self, validated_token):
+        user = self.get_cached_user(validated_token)
+        if user is not None:
+            return user
+
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        jti = validated_token.get(api_settings.JTI_CLAIM)
+        if user_id is None or jti is None:
+            return super().get_user(validated_token)
+
+        token_key = _token_key(user_id, jti)
+        version_key = _version_key(user_id)
+        version = cache.get(version_key)
+
+        # Холодний шлях: звичайна перевірка (юзер існує і активний)
+        user = super().get_user(validated_token)
+        projection = build_user_projection(user)
+        user.station_id = projection['station_id']
+
+        if version is None:
+            version = uuid.uuid4().hex
+            # add, а не set - щоб не перетерти версію, яку щойно змінили.
+            # Якщо версію вже хтось поставив (інвалідація) - просто не кешуємо.
+            if not cache.add(version_key, version, None):
+                return user
+
+        timeout = cache_ttl(validated_token)
+        if timeout > 0:
+            cache.set(token_key, {'version': version, 'user': projection}, timeout)
+        return user
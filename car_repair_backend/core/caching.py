@@ -0,0 +1,18 @@
+# car_repair_backend/core/caching.py
+"""
+Чи Django-кеш спільний для всіх воркерів.
+
+LocMemCache (фолбек без REDIS_URL) живе в пам'яті одного процесу: інвалідація,
+зроблена в одному воркері, до інших не доходить. Модулі, яким це критично,
+перевіряють cache_is_shared() і без спільного кешу тримають записи коротко.
+"""
+
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+PROCESS_LOCAL_BACKENDS = (LocMemCache, DummyCache)
+
+
+def cache_is_shared(alias='default'):
+    return not isinstance(caches[alias], PROCESS_LOCAL_BACKENDS)
@@ -0,0 +1,237 @@
+# car_repair_backend/core/categories.py
+
+import heapq
+import re
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from django.db import connection
+from django.db.models.functions import Lower, Trim
+from .models import ServiceCategory
+from .search import VersionedIndex, is_postgres
+
+SEARCH_LIMIT = 10
+MAX_EXPANSION = 64      # скільки слів словника може розгорнути один префікс
+PATH_WEIGHT = 0.5       # слово з назви предка ("ГРМ" для "Заміна ременя") важить менше
+PREFIX_WEIGHT = 0.8     # "рем" -> "ременя": префікс трохи гірший за ціле слово
+PHRASE_BONUS = 1.0      # назва починається з усього запиту
+TIE_BREAK = 1e-6
+MAX_DEPTH = 32          # захист від циклу в кривих даних (parent_id по колу)
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def parse_services_list(services_list):
+    """
+    "Заміна мастила, Розвал-сходження" -> id категорій з такими назвами
+    (без урахування регістру й пробілів по краях).
+    """
+    names = {part.strip().lower() for part in (services_list or '').split(',') if part.strip()}
+    if not names:
+        return []
+    if is_postgres():
+        # Тільки потрібні назви, по функціональному індексу
+        return list(
+            ServiceCategory.objects.annotate(name_norm=Lower(Trim('name')))
+            .filter(name_norm__in=names).values_list('id', flat=True)
+        )
+    # LOWER у SQLite знає тільки ASCII - для розробки порівнюємо в Python
+    return [
+        cat['id'] for cat in ServiceCategory.objects.values('id', 'name')
+        if cat['name'].strip().lower() in names
+    ]
+
+
+def category_ancestors(category_id):
+    """
+    [(id, назва)] категорії та її предків від листа до кореня - одним запитом
+    (рекурсивний CTE, працює і на PostgreSQL, і на SQLite).
+    """
+    if not category_id:
+        return []
+    table = connection.ops.quote_name(ServiceCategory._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            WITH RECURSIVE chain(id, name, parent_id, depth) AS (
+                SELECT id, name, parent_id, 0 FROM {table} WHERE id = %s
+                UNION ALL
+                SELECT c.id, c.name, c.parent_id, chain.depth + 1
+                FROM {table} c JOIN chain ON c.id = chain.parent_id
+                WHERE chain.depth < %s
+            )
+            SELECT id, name FROM chain ORDER BY depth
+        """, [category_id, MAX_DEPTH])
+        return cursor.fetchall()
+
+
+def _subtree(roots_sql, params):
+    """
+    id коренів (roots_sql - SELECT id ...) разом з усіма нащадками, рекурсивним CTE.
+    """
+    table = connection.ops.quote_name(ServiceCategory._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(f"""
+            WITH RECURSIVE subtree(id, depth) AS (
+                {roots_sql}
+                UNION ALL
+                SELECT c.id, subtree.depth + 1
+                FROM {table} c JOIN subtree ON c.parent_id = subtree.id
+                WHERE subtree.depth < %s
+            )
+            SELECT id FROM subtree
+        """, [*params, MAX_DEPTH])
+        return {row[0] for row in cursor.fetchall()}
+
+
+def category_subtree_ids(root_ids):
+    """
+    id категорій разом з усіма нащадками (одним запитом до БД).
+    """
+    if isinstance(root_ids, int):
+        root_ids = [root_ids]
+    root_ids = list(root_ids)
+    if not root_ids:
+        return set()
+    table = connection.ops.quote_name(ServiceCategory._meta.db_table)
+    placeholders = ', '.join(['%s'] * len(root_ids))
+    return _subtree(f"SELECT id, 0 FROM {table} WHERE id IN ({placeholders})", root_ids)
+
+
+def station_served_category_ids(station_id):
+    """
+    Всі категорії, які обслуговує СТО: обрані + їх піддерева
+    ("Двигун" означає і всі послуги всередині нього). Один запит.
+    """
+    Link = ServiceCategory.stations.through
+    link_table = connection.ops.quote_name(Link._meta.db_table)
+    return _subtree(
+        f"SELECT servicecategory_id, 0 FROM {link_table} WHERE servicestation_id = %s", [station_id],
+    )
+
+
+# --- ПОШУК ПО ДЕРЕВУ ---
+
+def name_tokens(text):
+    text = (text or '').lower().replace("'", '').replace('’', '').replace('ʼ', '').replace('ё', 'е')
+    return WORD_RE.findall(text)
+
+
+class CategoryIndex:
+    """
+    Дерево категорій у плоских масивах: номер вузла -> id, номер батька, назва.
+    Слова з назви вузла і з назв усіх його предків (breadcrumb) - у
+    відсортованому словнику з постингами в масивах, тож запит - це bisect
+    по словнику і перетин постингів, без БД.
+    """
+
+    def __init__(self, rows):
+        rows = list(rows)
+        position = {row['id']: i for i, row in enumerate(rows)}
+        self.ids = array('l', (row['id'] for row in rows))
+        self.parents = array('l', (position.get(row['parent_id'], -1) for row in rows))
+        self.names = [row['name'] for row in rows]
+        self.phrases = [' '.join(name_tokens(name)) for name in self.names]
+
+        postings = defaultdict(dict)
+        for i, name in enumerate(self.names):
+            for token in name_tokens(name):
+                postings[token][i] = 1.0
+            for ancestor in self.ancestors(i):
+                for token in name_tokens(self.names[ancestor]):
+                    postings[token].setdefault(i, PATH_WEIGHT)
+
+        # Слово k -> вузли members[starts[k]:starts[k + 1]] з вагами weights[...].
+        # Від ваги віднято крихту за довжину назви: при рівному скорі вище коротша
+        # (точніше відповідає запиту), і сортувати можна просто за скором
+        self.vocabulary = sorted(postings)
+        self.starts, self.members, self.weights = array('l', [0]), array('l'), array('d')
+        for token in self.vocabulary:
+            for i, weight in sorted(postings[token].items()):
+                self.members.append(i)
+                self.weights.append(weight - len(self.names[i]) * TIE_BREAK)
+            self.starts.append(len(self.members))
+        # Відсортовані нормалізовані назви - для бонусу "назва починається з запиту"
+        self.phrase_order = sorted(range(len(rows)), key=lambda i: self.phrases[i])
+        self.sorted_phrases = [self.phrases[i] for i in self.phrase_order]
+
+    def __len__(self):
+        return len(self.ids)
+
+    def ancestors(self, i):
+        """
+        Номери предків від батька до кореня.
+        """
+        result = []
+        parent = self.parents[i]
+        while parent != -1 and len(result) < MAX_DEPTH:
+            result.append(parent)
+            parent = self.parents[parent]
+        return result
+
+    def _expand(self, term):
+        start = bisect_left(self.vocabulary, term)
+        for k in range(start, min(start + MAX_EXPANSION, len(self.vocabulary))):
+            token = self.vocabulary[k]
+            if not token.startswith(term):
+                break
+            yield k, 1.0 if token == term else PREFIX_WEIGHT
+
+    def search(self, q, limit=SEARCH_LIMIT):
+        """
+        Найкращі limit категорій: кожне слово запиту має знайтись (цілим словом
+        або префіксом) у назві або в назві предка.
+        """
+        terms = name_tokens(q)
+        if not terms:
+            return []
+        starts, members, weights = self.starts, self.members, self.weights
+        scores = None
+        for term in terms:
+            term_scores = {}
+            for k, match in self._expand(term):
+                a, b = starts[k], starts[k + 1]
+                if not term_scores:
+                    term_scores = (dict(zip(members[a:b], weights[a:b])) if match == 1.0 else
+                                   {i: weight * match for i, weight in zip(members[a:b], weights[a:b])})
+                    continue
+                for i, weight in zip(members[a:b], weights[a:b]):
+                    weight *= match
+                    if weight > term_scores.get(i, 0):
+                        term_scores[i] = weight
+            if scores is None:
+                scores = term_scores
+            else:
+                smaller, larger = (scores, term_scores) if len(scores) < len(term_scores) else (term_scores, scores)
+                scores = {i: score + larger[i] for i, score in smaller.items() if i in larger}
+            if not scores:
+                return []
+
+        phrase = ' '.join(terms)
+        start = bisect_left(self.sorted_phrases, phrase)
+        for position in range(start, len(self.sorted_phrases)):
+            if not self.sorted_phrases[position].startswith(phrase):
+                break
+            i = self.phrase_order[position]
+            if i in scores:
+                scores[i] += PHRASE_BONUS
+        best = heapq.nlargest(limit, scores, key=scores.__getitem__)
+        return [self.result(i, scores[i]) for i in best]
+
+    def result(self, i, score):
+        path = [{"id": self.ids[a], "name": self.names[a]} for a in reversed(self.ancestors(i))]
+        return {
+            "id": self.ids[i],
+            "name": self.names[i],
+            "path": path,
+            "breadcrumb": ' -> '.join([item['name'] for item in path] + [self.names[i]]),
+            "score": round(score, 3),
+        }
+
+
+category_index = VersionedIndex(
+    'service_categories', lambda: CategoryIndex(ServiceCategory.objects.values('id', 'name', 'parent_id')),
+)
+
+
+def search_categories(q, limit=SEARCH_LIMIT):
+    return category_index.get().search(q, limit)
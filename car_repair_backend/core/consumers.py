@@ -1,36 +1,67 @@
 import json
+import time
+from urllib.parse import parse_qs
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
+from . import metrics
+from .notifications import get_missed_events, parse_cursor, stream_heads, SOS_STREAM, SOS_LATENCY_BUDGET
 
 class NotificationConsumer(AsyncWebsocketConsumer):
+    REPLAY_HANDLERS = ('send_notification', 'send_sos')
+
     async def connect(self):
+        # user / role / station_id кладе JWTAuthMiddleware, без запитів до БД
         self.user = self.scope["user"]
-        
+        self.groups_joined = []
+
         if self.user.is_anonymous:
             await self.close()
             return
 
         # Підписуємо юзера на його особистий канал (user_1, user_2...)
         self.room_group_name = f"user_{self.user.id}"
+        self.groups_joined.append(self.room_group_name)
 
-        await self.channel_layer.group_add(
-            self.room_group_name,
-            self.channel_name
-        )
+        # Якщо у юзера є СТО, підписуємо на розсилку нових заявок і SOS
+        if self.scope.get("station_id") is not None:
+            self.groups_joined += ["mechanics", SOS_STREAM]
 
-        # Якщо це майстер, підписуємо на розсилку нових заявок
-        # (Тут спрощено, в ідеалі перевіряти роль)
-        if hasattr(self.user, 'station'): 
-             await self.channel_layer.group_add("mechanics", self.channel_name)
+        for group in self.groups_joined:
+            await self.channel_layer.group_add(group, self.channel_name)
 
         await self.accept()
 
+        # Після реконекту клієнт передає ?since=user_5:12,mechanics:40 (останній seq
+        # кожного stream) - дочитуємо пропущене. Без курсора - віддаємо поточний.
+        query = parse_qs(self.scope.get("query_string", b"").decode())
+        cursor = parse_cursor((query.get("since") or [''])[0])
+        if cursor:
+            # stream, про які клієнт ще не знає (щойно став майстром) - з нуля
+            await self.replay_missed({group: cursor.get(group, 0) for group in self.groups_joined})
+        else:
+            await self.send_cursor('cursor')
+
+    async def send_cursor(self, message_type):
+        heads = await database_sync_to_async(stream_heads)(self.groups_joined)
+        await self.send(text_data=json.dumps({'type': message_type, 'cursor': heads}))
+
+    async def replay_missed(self, cursor):
+        events, truncated = await database_sync_to_async(get_missed_events)(cursor)
+
+        if truncated:
+            # Пропущено забагато - клієнту дешевше перезавантажити стрічку
+            # і продовжити з поточного курсора
+            await self.send_cursor('resync')
+            return
+
+        for event in events:
+            # Тим самим хендлером, що й наживо: SOS дочитується як 'sos'
+            handler = event['handler'] if event['handler'] in self.REPLAY_HANDLERS else 'send_notification'
+            await getattr(self, handler)({**event, 'type': handler, 'replay': True})
+
     async def disconnect(self, close_code):
-        await self.channel_layer.group_discard(
-            self.room_group_name,
-            self.channel_name
-        )
-        if hasattr(self.user, 'station'):
-            await self.channel_layer.group_discard("mechanics", self.channel_name)
+        for group in getattr(self, "groups_joined", []):
+            await self.channel_layer.group_discard(group, self.channel_name)
 
     # Отримання повідомлення від групи і відправка на фронтенд
     async def send_notification(self, event):
@@ -39,6 +70,23 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         
         await self.send(text_data=json.dumps({
             'type': event['type'], # 'new_request', 'new_offer', 'request_updated'
+            'stream': event.get('stream'),
+            'seq': event.get('seq'),
             'message': message,
-            'data': data
-        }))
\ No newline at end of file
+            'data': data,
+            'replay': event.get('replay', False)
+        }))
+
+    # SOS: той самий формат, але окремий тип і замір латентності доставки
+    async def send_sos(self, event):
+        await self.send(text_data=json.dumps({
+            'type': 'sos',
+            'stream': event.get('stream'),
+            'seq': event.get('seq'),
+            'message': event['message'],
+            'data': event.get('data', {}),
+            'replay': event.get('replay', False)
+        }))
+        # Дочитані події без sent_at - в латентність доставки не потрапляють
+        if event.get('sent_at'):
+            metrics.latency('sos_delivery', SOS_LATENCY_BUDGET).record(time.time() - event['sent_at'])
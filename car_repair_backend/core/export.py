@@ -0,0 +1,264 @@
+# car_repair_backend/core/export.py
+"""
+Потоковий експорт заявок, оферів і відгуків у CSV / NDJSON / Parquet.
+
+Рядки читаються через values(...).iterator(chunk_size) - на PostgreSQL це
+серверний курсор, тож пам'ять не залежить від розміру таблиці. Формат пише
+рядки пачками і віддає байти генератором - його споживає і StreamingHttpResponse,
+і management-команда export_data. Під ASGI (daphne) синхронний генератор
+StreamingHttpResponse спершу збирає в список, тому там його обгортає as_async.
+"""
+
+import csv
+import io
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from itertools import islice
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+from .api.renderers import dumps
+from . import metrics
+from .models import Request, Offer, Review, ClientReview, ArchivedRequest, ArchivedOffer
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Parquet опційний: CSV і NDJSON працюють без pyarrow
+    pyarrow = None
+
+CHUNK_SIZE = 2000
+FORMATS = ('csv', 'ndjson', 'parquet')
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+
+REQUEST_FIELDS = ('id', 'client_id', 'category_id', 'car_id', 'car_model', 'description',
+                  'status', 'is_sos', 'created_at', 'updated_at', 'location')
+OFFER_FIELDS = ('id', 'request_id', 'mechanic_id', 'price', 'comment', 'is_accepted', 'created_at')
+REVIEW_FIELDS = ('id', 'request_id', 'author_id', 'mechanic_id', 'rating', 'comment', 'created_at')
+CLIENT_REVIEW_FIELDS = ('id', 'request_id', 'author_id', 'client_id', 'rating', 'comment', 'created_at')
+
+# dataset -> (моделі-джерела: гаряча таблиця + архів, колонки, поле статусу для фільтра)
+DATASETS = {
+    'requests': ((Request, ArchivedRequest), REQUEST_FIELDS, 'status'),
+    'offers': ((Offer, ArchivedOffer), OFFER_FIELDS, 'request__status'),
+    'reviews': ((Review,), REVIEW_FIELDS, None),
+    'client_reviews': ((ClientReview,), CLIENT_REVIEW_FIELDS, None),
+}
+
+
+class ExportLog:
+    """
+    Останні експорти з пропускною здатністю (rows/s) - для /api/metrics/.
+    """
+
+    def __init__(self, size=20):
+        self.runs = deque(maxlen=size)
+        self.lock = threading.Lock()
+
+    def record(self, **run):
+        with self.lock:
+            self.runs.append(run)
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.runs)
+
+
+export_log = metrics.register('exports', ExportLog())
+
+
+def columns(dataset):
+    models, fields, _ = DATASETS[dataset]
+    # location -> lat/lng; archived - звідки рядок (гаряча таблиця чи архів)
+    result = [name for name in fields if name != 'location']
+    if 'location' in fields:
+        result += ['lat', 'lng']
+    if len(models) > 1:
+        result.append('archived')
+    return result
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.combine(day, datetime.min.time()))
+
+
+def iter_rows(dataset, date_from=None, date_to=None, status=None):
+    """
+    Словники рядків (вже з lat/lng) з усіх джерел датасету, один за одним.
+    """
+    models, fields, status_field = DATASETS[dataset]
+    for model in models:
+        queryset = model.objects.all()
+        # Межі діб, а не created_at__date: каст колонки не дав би використати індекс
+        if date_from:
+            queryset = queryset.filter(created_at__gte=_day_start(date_from))
+        if date_to:
+            queryset = queryset.filter(created_at__lt=_day_start(date_to + timedelta(days=1)))
+        if status:
+            queryset = queryset.filter(**{status_field: status})
+        archived = model in (ArchivedRequest, ArchivedOffer)
+        # order_by('id') - стабільний порядок по первинному ключу
+        for row in queryset.order_by('id').values(*fields).iterator(chunk_size=CHUNK_SIZE):
+            if 'location' in row:
+                point = row.pop('location')
+                row['lat'], row['lng'] = (point.y, point.x) if point else (None, None)
+            if len(models) > 1:
+                row['archived'] = archived
+            yield row
+
+
+def _chunks(rows):
+    while True:
+        chunk = list(islice(rows, CHUNK_SIZE))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _csv(rows, header):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=header)
+    writer.writeheader()
+    for chunk in _chunks(rows):
+        writer.writerows(chunk)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _ndjson(rows, header):
+    for chunk in _chunks(rows):
+        yield b''.join(_as_bytes(dumps(row)) + b'\n' for row in chunk)
+
+
+def _as_bytes(data):
+    return data if isinstance(data, bytes) else data.encode()
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    Файл для ParquetWriter, з якого після кожної row group забираємо байти.
+    """
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def take(self):
+        data, self.parts = b''.join(self.parts), []
+        return data
+
+
+def _arrow_type(field):
+    internal_type = field.get_internal_type()
+    if internal_type == 'BooleanField':
+        return pyarrow.bool_()
+    if internal_type == 'DateTimeField':
+        return pyarrow.timestamp('us', tz='UTC')
+    # Decimal -> float: ціни в аналітиці не потребують точної арифметики
+    if internal_type in ('DecimalField', 'FloatField'):
+        return pyarrow.float64()
+    if internal_type in ('CharField', 'TextField'):
+        return pyarrow.string()
+    return pyarrow.int64()
+
+
+def _arrow_schema(dataset):
+    """
+    Схема з полів моделі (а не з першого чанку), щоб колонка з самих NULL не зламала типи.
+    """
+    models, fields, _ = DATASETS[dataset]
+    meta = models[0]._meta
+    # get_field('client_id') теж працює (attname) - ForeignKey стає int64
+    types = {name: _arrow_type(meta.get_field(name)) for name in fields if name != 'location'}
+    types.update(lat=pyarrow.float64(), lng=pyarrow.float64(), archived=pyarrow.bool_())
+    return pyarrow.schema([(name, types[name]) for name in columns(dataset)])
+
+
+def _parquet(rows, schema):
+    sink = _ChunkSink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema)
+    for chunk in _chunks(rows):
+        for row in chunk:
+            if row.get('price') is not None:
+                row['price'] = float(row['price'])
+        writer.write_table(pyarrow.Table.from_pylist(chunk, schema=schema))
+        yield sink.take()
+    writer.close()
+    yield sink.take()
+
+
+WRITERS = {'csv': _csv, 'ndjson': _ndjson, 'parquet': _parquet}
+
+
+def export(dataset, fmt, **filters):
+    """
+    Генератор байтів експорту. Після останнього чанку пише пропускну здатність в export_log.
+    """
+    if dataset not in DATASETS:
+        raise ValueError(f"Невідомий датасет. Доступні: {', '.join(DATASETS)}")
+    if fmt not in WRITERS:
+        raise ValueError(f"Невідомий формат. Доступні: {', '.join(FORMATS)}")
+    if fmt == 'parquet' and pyarrow is None:
+        raise ValueError("Для Parquet потрібен pyarrow (pip install pyarrow)")
+    # Перевіряємо до початку стріму - потім помилку вже не віддати статусом відповіді
+    if filters.get('status') and not DATASETS[dataset][2]:
+        raise ValueError(f"Фільтр по статусу недоступний для {dataset}")
+
+    rows = iter_rows(dataset, **filters)
+    stats = {"rows": 0}
+
+    def counted():
+        for row in rows:
+            stats['rows'] += 1
+            yield row
+
+    def stream():
+        started = time.perf_counter()
+        header = _arrow_schema(dataset) if fmt == 'parquet' else columns(dataset)
+        yield from WRITERS[fmt](counted(), header)
+        seconds = time.perf_counter() - started
+        export_log.record(
+            dataset=dataset, format=fmt, rows=stats['rows'], seconds=round(seconds, 3),
+            rows_per_second=round(stats['rows'] / seconds) if seconds else None,
+        )
+        stats['seconds'] = seconds
+
+    return stream(), stats
+
+
+async def as_async(chunks):
+    """
+    Асинхронний ітератор над генератором експорту: кожен наступний чанк
+    рахується в sync-потоці (thread_sensitive - той самий потік і з'єднання
+    з серверним курсором), тож у пам'яті лише один чанк.
+    """
+    done = object()
+    next_chunk = sync_to_async(next, thread_sensitive=True)
+    try:
+        while True:
+            chunk = await next_chunk(chunks, done)
+            if chunk is done:
+                return
+            yield chunk
+    finally:
+        # Клієнт відключився посеред стріму - закриваємо курсор у тому ж потоці
+        await sync_to_async(chunks.close, thread_sensitive=True)()
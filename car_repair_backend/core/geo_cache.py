@@ -0,0 +1,165 @@
+# car_repair_backend/core/geo_cache.py
+"""
+Кеш відповідей публічного /stations/nearby.
+
+Координати запиту прив'язуються до сітки (SNAP_DEG), тому сусіди в межах
+клітинки отримують ту саму відповідь. Точність інвалідації дає друга,
+грубіша сітка (VERSION_CELL_DEG): у кожної її клітинки є версія в спільному
+Django-кеші, і ключ відповіді містить версії всіх клітинок, які накриває коло
+пошуку. Зміна СТО бампить версію тільки своєї клітинки - відповіді, до яких
+вона не могла потрапити, лишаються в кеші.
+
+Самі тіла відповідей лежать в LRU в пам'яті процесу з лімітом по байтах і
+TTL. Версії клітинок спільні для воркерів тільки зі спільним кешем (REDIS_URL);
+без нього бамп бачить лише свій процес, тому записи живуть LOCAL_TTL_SECONDS.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from . import metrics
+from .caching import cache_is_shared
+
+SNAP_DEG = 0.005            # ~500 м: точність, з якою центр пошуку ділиться між юзерами
+VERSION_CELL_DEG = 0.1      # ~11 км: клітинки, по яких скидаємо кеш
+MAX_CACHED_RADIUS_KM = 50   # ширші запити накривають забагато клітинок - не кешуємо
+MAX_BYTES = getattr(settings, 'STATION_CACHE_MAX_BYTES', 16 * 1024 * 1024)
+TTL_SECONDS = getattr(settings, 'STATION_CACHE_TTL', 300)
+LOCAL_TTL_SECONDS = getattr(settings, 'STATION_CACHE_LOCAL_TTL', 30)
+
+KM_PER_DEG = 111.32
+
+
+class ResponseLRU:
+    """
+    LRU тіл відповідей (bytes) з обмеженням сумарного розміру і TTL
+    + лічильники для метрик.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (body, expires_at)
+        self.size = 0
+        self.hits = self.misses = self.evictions = self.expired = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] <= time.monotonic():
+                del self.entries[key]
+                self.size -= len(entry[0])
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, body, ttl):
+        if len(body) > self.max_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.size -= len(old[0])
+            self.entries[key] = (body, time.monotonic() + ttl)
+            self.size += len(body)
+            while self.size > self.max_bytes:
+                _, (evicted, _) = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.evictions += 1
+
+    def snapshot(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+                "entries": len(self.entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+                "expired": self.expired,
+            }
+
+
+station_cache = metrics.register('stations_nearby_cache', ResponseLRU(MAX_BYTES))
+
+
+def entry_ttl():
+    return TTL_SECONDS if cache_is_shared() else LOCAL_TTL_SECONDS
+
+
+# --- СІТКА ---
+
+def snap(lat, lng):
+    """
+    Центр клітинки SNAP_DEG, в яку потрапляє точка.
+    """
+    return (
+        (math.floor(lat / SNAP_DEG) + 0.5) * SNAP_DEG,
+        (math.floor(lng / SNAP_DEG) + 0.5) * SNAP_DEG,
+    )
+
+
+def version_cell(lat, lng):
+    return math.floor(lat / VERSION_CELL_DEG), math.floor(lng / VERSION_CELL_DEG)
+
+
+def cells_in_radius(lat, lng, radius_km):
+    """
+    Клітинки версій, які накриває bbox кола пошуку.
+    """
+    dlat = radius_km / KM_PER_DEG
+    dlng = radius_km / (KM_PER_DEG * max(math.cos(math.radians(lat)), 0.01))
+    row_min, col_min = version_cell(lat - dlat, lng - dlng)
+    row_max, col_max = version_cell(lat + dlat, lng + dlng)
+    return [(r, c) for r in range(row_min, row_max + 1) for c in range(col_min, col_max + 1)]
+
+
+def _version_key(cell):
+    return f"stations_cell_ver:{cell[0]}:{cell[1]}"
+
+
+def _versions(cells):
+    keys = [_version_key(cell) for cell in cells]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            # Версія могла бути витіснена з кешу - нова мітка часу гарантує,
+            # що старі відповіді з "нульовою" версією не оживуть
+            cache.add(key, time.time_ns(), None)
+            versions[key] = cache.get(key)
+    return tuple(versions[key] for key in keys)
+
+
+# --- ВХІД ДЛЯ API ---
+
+def nearby_key(lat, lng, radius_km, *params):
+    """
+    Ключ відповіді для вже прив'язаного до сітки центру, або None, якщо запит не кешуємо.
+    """
+    if radius_km > MAX_CACHED_RADIUS_KM:
+        return None
+    return (round(lat, 6), round(lng, 6), radius_km, *params, _versions(cells_in_radius(lat, lng, radius_km)))
+
+
+def invalidate_location(point):
+    invalidate_locations([point])
+
+
+def invalidate_locations(points):
+    """
+    Бамп версій клітинок, де стоять (стояли) СТО. Після коміту - див. tiles.invalidate_points.
+    """
+    keys = {_version_key(version_cell(point.y, point.x)) for point in points if point is not None}
+    if keys:
+        transaction.on_commit(lambda: cache.set_many(dict.fromkeys(keys, time.time_ns()), None))
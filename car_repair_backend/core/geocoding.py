@@ -0,0 +1,207 @@
+# car_repair_backend/core/geocoding.py
+"""
+Локальний геокодер без зовнішніх сервісів.
+
+Газетир - CSV з колонками name, lat, lng, kind, parent (напр. вивантаження
+з OSM: населені пункти й вулиці, parent - місто вулиці). Завантажується один
+раз на процес (при старті воркера - див. config/asgi.py) у компактний індекс:
+- масиви координат + сітка (клітинка CELL_DEG -> номери точок) для
+  reverse-геокодування: найближче місце перебором кілець сусідніх клітинок;
+- відсортований словник нормалізованих назв для forward-геокодування:
+  точний збіг або префікс через bisect.
+"""
+
+import csv
+import logging
+import math
+import re
+import threading
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+GAZETTEER_PATH = getattr(settings, 'GAZETTEER_PATH', None)
+CELL_DEG = 0.02          # ~2 км
+MAX_RING = 10            # далі ~20 км шукати "найближче місце" вже немає сенсу
+PREFIX_LIMIT = 20
+
+# Службові слова адреси, які не входять у назву з газетира
+STOP_WORDS = {
+    'вул', 'вулиця', 'просп', 'проспект', 'пр', 'пров', 'провулок', 'бул', 'бульвар',
+    'пл', 'площа', 'шосе', 'наб', 'набережна', 'м', 'місто', 'смт', 'с', 'село',
+    'обл', 'область', 'р', 'н', 'район', 'буд', 'будинок', 'україна',
+}
+# Вулиця в правильному місті важливіша за місто, а місто - за випадкову вулицю
+KIND_WEIGHTS = {'street': 1.0, 'city': 0.9, 'town': 0.85, 'village': 0.8}
+WORD_RE = re.compile(r"[^\W\d_]+|\d+\S*", re.UNICODE)
+
+
+def normalize(text):
+    """
+    "вул. Т. Шевченка" -> "т шевченка": нижній регістр, без апострофів і службових слів.
+    """
+    text = (text or '').lower().replace('’', '').replace('ʼ', '').replace("'", '').replace('`', '')
+    words = [w for w in WORD_RE.findall(text) if w not in STOP_WORDS and not w[0].isdigit()]
+    return ' '.join(words)
+
+
+class Gazetteer:
+    def __init__(self, rows):
+        self.names, self.kinds, self.parents = [], [], []
+        self.lats, self.lngs = array('d'), array('d')
+        self.grid = defaultdict(lambda: array('l'))
+        by_name = defaultdict(list)
+
+        for row in rows:
+            try:
+                lat, lng = float(row['lat']), float(row['lng'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            idx = len(self.names)
+            self.names.append(row.get('name') or '')
+            self.kinds.append(row.get('kind') or '')
+            self.parents.append(row.get('parent') or '')
+            self.lats.append(lat)
+            self.lngs.append(lng)
+            self.grid[self._cell(lat, lng)].append(idx)
+            key = normalize(row.get('name'))
+            if key:
+                by_name[key].append(idx)
+
+        self.grid = dict(self.grid)
+        self.by_name = dict(by_name)
+        self.vocabulary = sorted(self.by_name)
+
+    def __len__(self):
+        return len(self.names)
+
+    @staticmethod
+    def _cell(lat, lng):
+        return math.floor(lat / CELL_DEG), math.floor(lng / CELL_DEG)
+
+    def label(self, idx):
+        name, parent = self.names[idx], self.parents[idx]
+        return f"{name}, {parent}" if parent and parent != name else name
+
+    # --- REVERSE ---
+
+    def nearest(self, lat, lng):
+        """
+        (номер, відстань у км) найближчого місця або None.
+        Обходимо кільця клітинок навколо точки. Клітинка по довготі вужча в км
+        у cos(lat) разів, тому кільце ring не ближче за (ring - 1) * CELL_DEG * cos(lat):
+        зупиняємось, коли це вже далі за знайдене - результат точний, не наближений.
+        """
+        row, col = self._cell(lat, lng)
+        scale = math.cos(math.radians(lat))
+        best, best_d2 = None, None
+        for ring in range(MAX_RING + 1):
+            if best is not None and ((ring - 1) * CELL_DEG * scale) ** 2 > best_d2:
+                break
+            for r in range(row - ring, row + ring + 1):
+                for c in range(col - ring, col + ring + 1):
+                    if max(abs(r - row), abs(c - col)) != ring:
+                        continue
+                    for idx in self.grid.get((r, c), ()):
+                        dy = self.lats[idx] - lat
+                        dx = (self.lngs[idx] - lng) * scale
+                        d2 = dx * dx + dy * dy
+                        if best_d2 is None or d2 < best_d2:
+                            best, best_d2 = idx, d2
+        if best is None:
+            return None
+        return best, math.sqrt(best_d2) * 111.32
+
+    # --- FORWARD ---
+
+    def _lookup(self, key):
+        """
+        {номер: оцінка збігу}: точна назва - 1.0, префікс - 0.7.
+        """
+        matches = {idx: 1.0 for idx in self.by_name.get(key, ())}
+        start = bisect_left(self.vocabulary, key)
+        for name in self.vocabulary[start:start + PREFIX_LIMIT]:
+            if not name.startswith(key):
+                break
+            for idx in self.by_name[name]:
+                matches.setdefault(idx, 0.7)
+        return matches
+
+    def geocode(self, address):
+        """
+        Найкращий збіг для адреси "вул. Хрещатик, 22, Київ" або None.
+        Частини адреси шукаються окремо; вулиця, чий parent є серед частин, виграє.
+        """
+        keys = [key for key in (normalize(part) for part in (address or '').split(',')) if key]
+        if not keys:
+            return None
+        best, best_score = None, 0.0
+        for key in keys:
+            for idx, score in self._lookup(key).items():
+                parent = normalize(self.parents[idx])
+                if parent and parent in keys:
+                    score += 0.5
+                score *= KIND_WEIGHTS.get(self.kinds[idx], 0.7)
+                if score > best_score:
+                    best, best_score = idx, score
+        return best
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def load_gazetteer(path):
+    try:
+        with open(path, encoding='utf-8-sig', newline='') as f:
+            return Gazetteer(csv.DictReader(f))
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, TypeError, csv.Error) as e:
+        # Битий файл (кодування, права, криві рядки CSV) - не валимо запити, а пишемо в лог
+        logger.warning("Газетир %s не завантажено: %s", path, e)
+    # Без газетира геокодер просто нічого не знаходить
+    return Gazetteer([])
+
+
+def get_gazetteer():
+    global _gazetteer
+    # Подвійна перевірка: після завантаження читачі не чекають на лок
+    gazetteer = _gazetteer
+    if gazetteer is not None:
+        return gazetteer
+    with _gazetteer_lock:
+        if _gazetteer is None:
+            _gazetteer = load_gazetteer(GAZETTEER_PATH)
+        return _gazetteer
+
+
+# --- ЗАГАЛЬНИЙ ВХІД ---
+
+def geocode(address):
+    """
+    {"lat", "lng", "label", "kind"} для адреси або None.
+    """
+    gazetteer = get_gazetteer()
+    idx = gazetteer.geocode(address)
+    if idx is None:
+        return None
+    return {
+        "lat": gazetteer.lats[idx], "lng": gazetteer.lngs[idx],
+        "label": gazetteer.label(idx), "kind": gazetteer.kinds[idx],
+    }
+
+
+def reverse_geocode(lat, lng):
+    """
+    {"label", "kind", "distance_km"} найближчого місця або None.
+    """
+    gazetteer = get_gazetteer()
+    found = gazetteer.nearest(lat, lng)
+    if found is None:
+        return None
+    idx, distance = found
+    return {"label": gazetteer.label(idx), "kind": gazetteer.kinds[idx], "distance_km": round(distance, 2)}
@@ -0,0 +1,203 @@
+# car_repair_backend/core/importer.py
+"""
+Масовий імпорт СТО з таблиці партнера (CSV / XLSX).
+
+Кожен рядок - власник (User, роль mechanic) + його ServiceStation. Всі рядки
+спершу валідуються (включно з унікальністю username/телефону і в файлі, і в БД),
+потім валідні створюються bulk_create-ами в одній транзакції (якщо між перевіркою
+і вставкою хтось зайняв username/телефон - IntegrityError, валідуємо і пробуємо
+ще раз, до IMPORT_ATTEMPTS разів). Сигнали при
+bulk_create не працюють, тому пошуковий індекс, категорії та кеші мапи
+оновлюються тут явно - одним проходом на всю пачку.
+"""
+
+import csv
+import io
+import time
+from django.contrib.auth.hashers import make_password
+from django.contrib.gis.geos import Point
+from django.db import IntegrityError, transaction
+from .models import User, ServiceStation, ServiceCategory
+from .search import is_postgres, station_search_vector, invalidate_station_index
+from . import tiles, geo_cache
+
+try:
+    import openpyxl
+except ImportError:  # XLSX опційний: CSV працює без openpyxl
+    openpyxl = None
+
+COLUMNS = ('username', 'phone', 'email', 'name', 'address', 'lat', 'lng',
+           'description', 'services_list', 'station_phone')
+REQUIRED = ('username', 'name', 'address', 'lat', 'lng')
+MAX_LENGTHS = {'username': 150, 'phone': 20, 'name': 255, 'address': 255, 'station_phone': 20}
+BATCH_SIZE = 2000
+IMPORT_ATTEMPTS = 3
+
+
+def read_rows(file, filename):
+    """
+    Рядки таблиці як словники (ключі - назви колонок у нижньому регістрі).
+    """
+    if filename.lower().endswith('.xlsx'):
+        if openpyxl is None:
+            raise ValueError("Для XLSX потрібен openpyxl (pip install openpyxl)")
+        sheet = openpyxl.load_workbook(file, read_only=True, data_only=True).active
+        rows = sheet.iter_rows(values_only=True)
+        header = [str(cell or '').strip().lower() for cell in next(rows, [])]
+        for values in rows:
+            yield {name: '' if value is None else str(value).strip() for name, value in zip(header, values)}
+    else:
+        reader = csv.DictReader(io.TextIOWrapper(file, encoding='utf-8-sig'))
+        reader.fieldnames = [name.strip().lower() for name in reader.fieldnames or []]
+        for row in reader:
+            yield {name: (value or '').strip() for name, value in row.items() if name}
+
+
+def _existing(field, values):
+    found = set()
+    values = list(values)
+    for start in range(0, len(values), BATCH_SIZE):
+        found.update(User.objects.filter(**{f"{field}__in": values[start:start + BATCH_SIZE]})
+                     .values_list(field, flat=True))
+    return found
+
+
+def validate(rows):
+    """
+    (валідні рядки, помилки). Помилка - {'line': номер рядка у файлі, 'errors': текст}.
+    """
+    valid, errors = [], []
+    usernames, phones = {}, {}
+    for line, row in enumerate(rows, start=2):  # 1 - заголовок
+        problems = [f"{name}: обов'язкове поле" for name in REQUIRED if not row.get(name)]
+        problems += [
+            f"{name}: довше за {limit} символів"
+            for name, limit in MAX_LENGTHS.items() if len(row.get(name) or '') > limit
+        ]
+        try:
+            lat, lng = float(row.get('lat', '').replace(',', '.')), float(row.get('lng', '').replace(',', '.'))
+            if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+                problems.append("lat/lng поза межами")
+        except ValueError:
+            if row.get('lat') and row.get('lng'):
+                problems.append("lat/lng мають бути числами")
+            lat = lng = None
+
+        username, phone = row.get('username'), row.get('phone') or None
+        if username and username in usernames:
+            problems.append(f"username повторюється (рядок {usernames[username]})")
+        if phone and phone in phones:
+            problems.append(f"телефон повторюється (рядок {phones[phone]})")
+
+        if problems:
+            errors.append({'line': line, 'errors': '; '.join(problems)})
+            continue
+        usernames[username] = line
+        if phone:
+            phones[phone] = line
+        valid.append({**row, 'line': line, 'lat': lat, 'lng': lng, 'phone': phone})
+
+    # Унікальність в БД - кількома IN-запитами на весь файл
+    taken_usernames = _existing('username', usernames)
+    taken_phones = _existing('phone', phones)
+    result = []
+    for row in valid:
+        problems = []
+        if row['username'] in taken_usernames:
+            problems.append("username вже зайнятий")
+        if row['phone'] and row['phone'] in taken_phones:
+            problems.append("телефон вже зареєстрований")
+        if problems:
+            errors.append({'line': row['line'], 'errors': '; '.join(problems)})
+        else:
+            result.append(row)
+    errors.sort(key=lambda error: error['line'])
+    return result, errors
+
+
+def _category_ids(services_list, names):
+    return {
+        names[part.strip().lower()]
+        for part in (services_list or '').split(',') if part.strip().lower() in names
+    }
+
+
+def import_stations(rows, dry_run=False):
+    """
+    Валідує та створює власників і СТО. Повертає статистику з помилками по рядках.
+    dry_run - все те саме, але транзакція відкочується.
+    """
+    started = time.perf_counter()
+    rows = list(rows)  # при конфлікті валідуємо ще раз - генератор вже був би вичерпаний
+    names = {name.strip().lower(): cat_id for cat_id, name in ServiceCategory.objects.values_list('id', 'name')}
+
+    for attempt in range(1, IMPORT_ATTEMPTS + 1):
+        valid, errors = validate(rows)
+        try:
+            stations = _create(valid, names, dry_run)
+            break
+        except IntegrityError:
+            # Паралельна реєстрація зайняла username/телефон після validate():
+            # повторна валідація перенесе такі рядки в помилки
+            if attempt == IMPORT_ATTEMPTS:
+                raise
+
+    return {
+        'created': len(stations),
+        'errors': errors,
+        'seconds': time.perf_counter() - started,
+        'dry_run': dry_run,
+        'attempts': attempt,
+    }
+
+
+def _create(valid, names, dry_run):
+    with transaction.atomic():
+        owners = User.objects.bulk_create([
+            User(
+                username=row['username'], phone=row['phone'], email=row.get('email') or '',
+                role='mechanic',
+                # Без пароля: власник встановить його сам (скидання пароля)
+                password=make_password(None),
+            )
+            for row in valid
+        ], batch_size=BATCH_SIZE)
+
+        stations = ServiceStation.objects.bulk_create([
+            ServiceStation(
+                owner=owner, name=row['name'], address=row['address'],
+                description=row.get('description') or '', services_list=row.get('services_list') or '',
+                phone=row.get('station_phone') or row['phone'] or '',
+                location=Point(row['lng'], row['lat'], srid=4326),
+            )
+            for owner, row in zip(owners, valid)
+        ], batch_size=BATCH_SIZE)
+
+        Through = ServiceStation.categories.through
+        Through.objects.bulk_create([
+            Through(servicestation_id=station.id, servicecategory_id=cat_id)
+            for station, row in zip(stations, valid)
+            for cat_id in _category_ids(row.get('services_list'), names)
+        ], batch_size=BATCH_SIZE)
+
+        # Те, що для одиночного save() роблять сигнали
+        ids = [station.id for station in stations]
+        if is_postgres():
+            for start in range(0, len(ids), BATCH_SIZE):
+                ServiceStation.objects.filter(id__in=ids[start:start + BATCH_SIZE])\
+                    .update(search_vector=station_search_vector())
+        locations = [station.location for station in stations]
+        tiles.invalidate_points('stations', locations)
+        geo_cache.invalidate_locations(locations)
+        # Бамп версії в цій же транзакції - dry_run відкотить і його
+        invalidate_station_index()
+
+        if dry_run:
+            transaction.set_rollback(True)
+    return stations
+
+
+def write_error_report(errors, out):
+    writer = csv.DictWriter(out, fieldnames=['line', 'errors'])
+    writer.writeheader()
+    writer.writerows(errors)
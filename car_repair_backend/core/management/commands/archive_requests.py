@@ -0,0 +1,31 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from core.archive import archivable, archive_batch, ARCHIVE_AFTER
+
+class Command(BaseCommand):
+    help = 'Переносить старі закриті заявки (done/canceled) з оферами в архівні таблиці'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=ARCHIVE_AFTER.days,
+                            help='Архівувати заявки, закриті раніше ніж N днів тому')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--dry-run', action='store_true', help='Тільки порахувати')
+
+    def handle(self, *args, **options):
+        older_than = timedelta(days=options['days'])
+        if options['dry_run']:
+            self.stdout.write(f"До архівації: {archivable(older_than).count()}")
+            return
+
+        total = 0
+        while True:
+            ids = list(archivable(older_than).order_by('id').values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            started = time.perf_counter()
+            moved = archive_batch(ids)
+            total += moved
+            self.stdout.write(f"Пачка: {moved} заявок за {time.perf_counter() - started:.2f} с")
+
+        self.stdout.write(self.style.SUCCESS(f'Заархівовано заявок: {total}'))
@@ -0,0 +1,41 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.http import HttpRequest
+from django.test.utils import CaptureQueriesContext
+from ninja_jwt.authentication import JWTAuth
+from ninja_jwt.tokens import AccessToken
+from core.authentication import CachedJWTAuth
+from core.models import User
+
+class Command(BaseCommand):
+    help = 'Порівнює кількість запитів до БД на авторизацію: JWTAuth vs CachedJWTAuth'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+
+        # Все робимо в транзакції і відкочуємо, щоб не смітити в БД
+        with transaction.atomic():
+            user = User.objects.create(username='__bench_auth__', role='mechanic')
+            token = str(AccessToken.for_user(user))
+
+            for auth in (JWTAuth(), CachedJWTAuth()):
+                # Прогріваємо (для кешу це перший "холодний" запит)
+                auth.authenticate(HttpRequest(), token)
+
+                with CaptureQueriesContext(connection) as ctx:
+                    started = time.perf_counter()
+                    for _ in range(iterations):
+                        auth.authenticate(HttpRequest(), token)
+                    elapsed = time.perf_counter() - started
+
+                self.stdout.write(
+                    f"{auth.__class__.__name__}: "
+                    f"{len(ctx.captured_queries) / iterations:.2f} запитів/виклик, "
+                    f"{elapsed / iterations * 1e6:.1f} мкс/виклик"
+                )
+
+            transaction.set_rollback(True)
@@ -0,0 +1,59 @@
+import random
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.models import VehicleMake
+from core.vehicles import catalog_index, load_catalog
+
+class Command(BaseCommand):
+    help = (
+        'Побудова індексу каталогу авто, латентність автодоповнення і нормалізації. '
+        'Якщо каталог порожній - фікстура вантажиться в транзакції, яку наприкінці відкочуємо'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lookups', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--keep', action='store_true', help='Не відкочувати завантажену фікстуру')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if not VehicleMake.objects.exists():
+                makes, models, _ = load_catalog()
+                self.stdout.write(f"Каталог порожній - завантажено фікстуру: марок {makes}, моделей {models}")
+            self.run(options['lookups'], options['seed'])
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def run(self, lookups, seed):
+        started = time.perf_counter()
+        index = catalog_index.build()
+        built = time.perf_counter() - started
+        self.stdout.write(f"Ключів: {len(index.vocabulary)}, побудова {built * 1000:.1f} мс")
+
+        rnd = random.Random(seed)
+        labels = [suggestion['label'] for suggestion in index.suggestions.values()]
+
+        # Префікси назв, як їх набирають у полі вводу
+        prefixes = []
+        for _ in range(lookups):
+            label = rnd.choice(labels)
+            prefixes.append(label[:rnd.randint(1, len(label))])
+        started = time.perf_counter()
+        for prefix in prefixes:
+            index.autocomplete(prefix)
+        self.stdout.write(f"Автодоповнення: {(time.perf_counter() - started) / lookups * 1e6:.1f} мкс/запит")
+
+        # Назви з однією опечаткою (пропущена літера) + "хвіст" з об'ємом двигуна
+        models = [suggestion['label'] for suggestion in index.suggestions.values() if suggestion['kind'] == 'model']
+        texts = []
+        for _ in range(lookups):
+            label = rnd.choice(models)
+            pos = rnd.randrange(len(label))
+            texts.append(f"{label[:pos]}{label[pos + 1:]} 1.6".upper())
+        started = time.perf_counter()
+        matched = sum(1 for text in texts if index.match(text))
+        self.stdout.write(
+            f"Нормалізація: {(time.perf_counter() - started) / lookups * 1e6:.1f} мкс/рядок, "
+            f"зіставлено {matched}/{lookups}"
+        )
@@ -0,0 +1,52 @@
+import io
+import random
+import time
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from core.categories import category_index, name_tokens
+from core.models import ServiceCategory
+
+class Command(BaseCommand):
+    help = (
+        'Побудова індексу дерева категорій і латентність пошуку /categories/search. '
+        'Якщо категорій немає - дерево з фікстури вантажиться в транзакції, яку наприкінці відкочуємо'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lookups', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--keep', action='store_true', help='Не відкочувати завантажене дерево')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if not ServiceCategory.objects.exists():
+                call_command('load_tree_json', stdout=io.StringIO())
+                self.stdout.write(f"Категорій не було - завантажено фікстуру: {ServiceCategory.objects.count()}")
+            self.run(options['lookups'], options['seed'])
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def run(self, lookups, seed):
+        started = time.perf_counter()
+        index = category_index.build()
+        built = time.perf_counter() - started
+        if not len(index):
+            raise CommandError("Категорій немає і фікстура не знайдена")
+        self.stdout.write(f"Категорій: {len(index)}, слів: {len(index.vocabulary)}, побудова {built * 1000:.1f} мс")
+
+        # Запити як з поля вводу: одне-два слова з назви, останнє недописане
+        rnd = random.Random(seed)
+        queries = []
+        for _ in range(lookups):
+            words = name_tokens(rnd.choice(index.names)) or ['а']
+            picked = words[:rnd.randint(1, min(2, len(words)))]
+            picked[-1] = picked[-1][:rnd.randint(1, len(picked[-1]))]
+            queries.append(' '.join(picked))
+
+        started = time.perf_counter()
+        found = sum(1 for q in queries if index.search(q))
+        seconds = time.perf_counter() - started
+        self.stdout.write(
+            f"Пошук: {seconds / len(queries) * 1e6:.1f} мкс/запит, з результатами {found}/{len(queries)}"
+        )
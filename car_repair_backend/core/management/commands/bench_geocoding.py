@@ -0,0 +1,36 @@
+import random
+import time
+from django.core.management.base import BaseCommand, CommandError
+from core.geocoding import get_gazetteer, GAZETTEER_PATH
+
+class Command(BaseCommand):
+    help = 'Завантаження газетира і латентність forward/reverse геокодування'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lookups', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        gazetteer = get_gazetteer()
+        loaded = time.perf_counter() - started
+        if not len(gazetteer):
+            raise CommandError(f"Газетир порожній або не знайдений: {GAZETTEER_PATH}")
+        self.stdout.write(f"Місць: {len(gazetteer)}, завантаження {loaded:.2f} с")
+
+        rnd = random.Random(options['seed'])
+        lookups = options['lookups']
+        lat_min, lat_max = min(gazetteer.lats), max(gazetteer.lats)
+        lng_min, lng_max = min(gazetteer.lngs), max(gazetteer.lngs)
+        points = [(rnd.uniform(lat_min, lat_max), rnd.uniform(lng_min, lng_max)) for _ in range(lookups)]
+        started = time.perf_counter()
+        for lat, lng in points:
+            gazetteer.nearest(lat, lng)
+        self.stdout.write(f"Reverse: {(time.perf_counter() - started) / lookups * 1e6:.1f} мкс/запит")
+
+        # Адреси з самого газетира: "назва, батьківське місто"
+        addresses = [gazetteer.label(rnd.randrange(len(gazetteer))) for _ in range(lookups)]
+        started = time.perf_counter()
+        for address in addresses:
+            gazetteer.geocode(address)
+        self.stdout.write(f"Forward: {(time.perf_counter() - started) / lookups * 1e6:.1f} мкс/запит")
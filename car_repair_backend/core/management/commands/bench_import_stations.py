@@ -0,0 +1,46 @@
+import random
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.importer import import_stations
+
+# Київ і околиці
+CENTER_LAT, CENTER_LNG, SPREAD = 50.45, 30.52, 0.3
+SERVICES = ['двигун', 'ходова', 'гальма', 'електрика', 'кузов', 'шиномонтаж', 'розвал-сходження']
+
+class Command(BaseCommand):
+    help = 'Бенчмарк імпорту СТО (синтетичні рядки, транзакція відкочується)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100000)
+        parser.add_argument('--invalid', type=float, default=0.01, help='Частка зіпсованих рядків')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        rows = []
+        for i in range(options['count']):
+            row = {
+                'username': f'bench_station_{i}',
+                'phone': f'+38099{i:07d}',
+                'name': f'СТО #{i}',
+                'address': f'вул. Тестова, {i}',
+                'lat': str(CENTER_LAT + rnd.uniform(-SPREAD, SPREAD)),
+                'lng': str(CENTER_LNG + rnd.uniform(-SPREAD, SPREAD)),
+                'services_list': ', '.join(rnd.sample(SERVICES, 3)),
+            }
+            if rnd.random() < options['invalid']:
+                row['lat'] = 'abc'
+            rows.append(row)
+
+        with transaction.atomic():
+            started = time.perf_counter()
+            result = import_stations(rows)
+            elapsed = time.perf_counter() - started
+            # Бенчмарк не лишає слідів у БД
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f"Рядків: {len(rows)}, створено: {result['created']}, помилок: {len(result['errors'])}\n"
+            f"Час: {elapsed:.2f} с ({len(rows) / elapsed:.0f} рядків/с)"
+        )
@@ -0,0 +1,99 @@
+import random
+import statistics
+import time
+from collections import defaultdict
+from decimal import Decimal
+from django.contrib.gis.geos import Point
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from core.matching import MATCHING, find_candidates, run_wave
+from core.models import User, ServiceCategory, ServiceStation, Request, RequestDispatch
+
+# Київ і околиці
+CENTER_LAT, CENTER_LNG, SPREAD = 50.45, 30.52, 0.3
+SERVICES = ['двигун', 'ходова', 'гальма', 'електрика', 'кузов', 'шиномонтаж', 'розвал-сходження']
+
+class Command(BaseCommand):
+    help = (
+        'Матчинг на реальних find_candidates/run_wave: латентність і кількість запитів по хвилях. '
+        'Дані сідяться в транзакції, яку наприкінці відкочуємо (--keep - залишити)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stations', type=int, default=2000)
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--keep', action='store_true', help='Не відкочувати згенеровані дані')
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        with transaction.atomic():
+            requests = self.seed(rnd, options['stations'], options['requests'])
+            self.run(requests)
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def seed(self, rnd, stations_count, requests_count):
+        # bulk_create без сигналів: сідінг не повинен запускати розсилки
+        parents = {name: ServiceCategory.objects.create(name=name.capitalize()) for name in SERVICES}
+        leaves = [
+            ServiceCategory.objects.create(name=f"{name.capitalize()}: діагностика", parent=parent)
+            for name, parent in parents.items()
+        ]
+
+        owners = User.objects.bulk_create([
+            User(username=f'__bench_match_{i}__', role='mechanic') for i in range(stations_count)
+        ])
+        stations = ServiceStation.objects.bulk_create([
+            ServiceStation(
+                owner=owner, name=f'СТО {i}', address='-',
+                location=Point(CENTER_LNG + rnd.uniform(-SPREAD, SPREAD), CENTER_LAT + rnd.uniform(-SPREAD, SPREAD)),
+                rating=Decimal(str(round(rnd.uniform(3, 5), 2))),
+                services_list=', '.join(rnd.sample(SERVICES, 3)),
+            )
+            for i, owner in enumerate(owners)
+        ])
+        # Половина СТО - з M2M-категоріями, решта матчиться по services_list
+        Link = ServiceStation.categories.through
+        Link.objects.bulk_create([
+            Link(servicestation_id=station.id, servicecategory_id=rnd.choice(list(parents.values())).id)
+            for station in stations[::2]
+        ])
+
+        client = User.objects.create(username='__bench_match_client__')
+        return Request.objects.bulk_create([
+            Request(
+                client=client, car_model='bench', description='bench', category=rnd.choice(leaves),
+                location=Point(CENTER_LNG + rnd.uniform(-SPREAD, SPREAD), CENTER_LAT + rnd.uniform(-SPREAD, SPREAD)),
+            )
+            for _ in range(requests_count)
+        ])
+
+    def run(self, requests):
+        latencies = defaultdict(list)
+        queries = defaultdict(list)
+        fanout = defaultdict(list)
+        candidates = defaultdict(list)
+
+        for req in requests:
+            dispatch = RequestDispatch.objects.create(request=req)
+            for wave in range(1, MATCHING['MAX_WAVES'] + 1):
+                radius_km = MATCHING['RADIUS_KM'] + MATCHING['RADIUS_STEP_KM'] * (wave - 1)
+                candidates[wave].append(len(find_candidates(req, radius_km)))
+
+                started = time.perf_counter()
+                with CaptureQueriesContext(connection) as ctx:
+                    notified = run_wave(dispatch, req)
+                latencies[wave].append((time.perf_counter() - started) * 1000)
+                queries[wave].append(len(ctx.captured_queries))
+                fanout[wave].append(notified)
+
+        for wave in sorted(latencies):
+            values = sorted(latencies[wave])
+            p95 = values[max(int(len(values) * 0.95) - 1, 0)]
+            self.stdout.write(
+                f"Хвиля {wave}: p50={statistics.median(values):.2f} мс, p95={p95:.2f} мс, "
+                f"запитів {max(queries[wave])}, кандидатів {statistics.mean(candidates[wave]):.0f}, "
+                f"розсилка в середньому {statistics.mean(fanout[wave]):.1f} СТО"
+            )
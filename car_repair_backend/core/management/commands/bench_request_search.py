@@ -0,0 +1,65 @@
+import random
+import statistics
+import time
+from django.contrib.gis.geos import Point
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.models import User, Request
+from core.search import search_requests, request_search_vector, is_postgres
+
+CARS = ['Toyota Camry', 'Volkswagen Passat', 'Skoda Octavia', 'Renault Megane', 'BMW X5', 'Daewoo Lanos']
+PROBLEMS = [
+    'стук у підвісці на ямах', 'не заводиться зранку', 'горить check engine',
+    'скрипять гальма', 'тече масло з двигуна', 'потрібна заміна ременя ГРМ',
+    'вібрація керма на швидкості', 'розвал-сходження після ремонту',
+]
+QUERIES = ['ГРМ', 'гальма скрип', 'Octavia', 'check engine', 'підвіска стук', 'Камрі']
+
+class Command(BaseCommand):
+    help = 'Сідить N заявок і міряє латентність пошуку (в транзакції, яку наприкінці відкочуємо)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--batch', type=int, default=10_000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--keep', action='store_true', help='Не відкочувати згенеровані дані')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.seed(options['rows'], options['batch'])
+            self.run(options['repeat'])
+            if not options['keep']:
+                transaction.set_rollback(True)
+
+    def seed(self, rows, batch):
+        rnd = random.Random(1)
+        client, _ = User.objects.get_or_create(username='__bench_search__')
+
+        started = time.perf_counter()
+        created = 0
+        while created < rows:
+            size = min(batch, rows - created)
+            # bulk_create не шле post_save - вектор рахуємо одним UPDATE нижче
+            Request.objects.bulk_create([
+                Request(
+                    client=client,
+                    car_model=rnd.choice(CARS),
+                    description=' '.join(rnd.sample(PROBLEMS, 2)),
+                    location=Point(30.5 + rnd.random() / 2, 50.4 + rnd.random() / 4),
+                    status=rnd.choice(['new', 'active', 'done', 'canceled']),
+                )
+                for _ in range(size)
+            ])
+            created += size
+        if is_postgres():
+            Request.objects.filter(client=client).update(search_vector=request_search_vector())
+        self.stdout.write(f"Згенеровано {created} заявок за {time.perf_counter() - started:.1f} с")
+
+    def run(self, repeat):
+        for q in QUERIES:
+            timings = []
+            for _ in range(repeat):
+                t = time.perf_counter()
+                list(search_requests(Request.objects.filter(status='done'), q)[:20])
+                timings.append((time.perf_counter() - t) * 1000)
+            self.stdout.write(f"'{q}': p50={statistics.median(timings):.1f} мс, max={max(timings):.1f} мс")
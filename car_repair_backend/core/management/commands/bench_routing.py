@@ -0,0 +1,46 @@
+import random
+import time
+from django.core.management.base import BaseCommand, CommandError
+from core.road_routing import get_graph, travel_to, route_cache, ROAD_GRAPH_PATH
+
+class Command(BaseCommand):
+    help = 'Завантаження дорожнього графа і латентність many-to-one (всі СТО -> заявка)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--stations', type=int, default=20, help='Скільки СТО на одну заявку')
+        parser.add_argument('--radius-deg', type=float, default=0.1, help='Розкид СТО навколо заявки')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        graph = get_graph()
+        loaded = time.perf_counter() - started
+        if not len(graph):
+            raise CommandError(f"Граф порожній або не знайдений: {ROAD_GRAPH_PATH}")
+        self.stdout.write(f"Вузлів: {len(graph)}, ребер: {graph.edge_count}, завантаження {loaded:.2f} с")
+
+        rnd = random.Random(options['seed'])
+        radius = options['radius_deg']
+        batches = []
+        for _ in range(options['queries']):
+            node = rnd.randrange(len(graph))
+            lat, lng = graph.lats[node], graph.lngs[node]
+            stations = [
+                (lat + rnd.uniform(-radius, radius), lng + rnd.uniform(-radius, radius))
+                for _ in range(options['stations'])
+            ]
+            batches.append(((lat, lng), stations))
+
+        # Другий прохід по тих самих заявках - з кешем пар
+        for label in ('Холодний кеш', 'Теплий кеш'):
+            started = time.perf_counter()
+            routed = 0
+            for target, stations in batches:
+                routed += sum(1 for route in travel_to(target, stations) if route)
+            seconds = time.perf_counter() - started
+            self.stdout.write(
+                f"{label}: {seconds / len(batches) * 1000:.2f} мс/заявку, "
+                f"маршрутів {routed}/{len(batches) * options['stations']}"
+            )
+        self.stdout.write(f"Кеш: {route_cache.snapshot()}")
@@ -0,0 +1,45 @@
+import json
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from ninja.responses import NinjaJSONEncoder
+from core.api.renderers import values_response, orjson
+from core.models import User, Car
+from core.schemas import CarOut
+
+class Command(BaseCommand):
+    help = 'Порівнює серіалізацію списку: моделі + pydantic + json vs values() + orjson'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('orjson не встановлено - швидкий шлях на stdlib json'))
+
+        with transaction.atomic():
+            owner = User.objects.create(username='__bench_serialization__')
+            Car.objects.bulk_create([
+                Car(owner=owner, license_plate=f'BS{i:06d}', brand_model='Skoda Octavia', year=2015,
+                    vin='TMBJJ7NE8F0000000', color='Сірий', fuel='Бензин', engine_volume='1.4')
+                for i in range(options['rows'])
+            ])
+            queryset = Car.objects.filter(owner=owner)
+            fields = list(CarOut.model_fields)
+
+            def schema_path():
+                data = [CarOut.from_orm(car).model_dump() for car in queryset]
+                return json.dumps(data, cls=NinjaJSONEncoder)
+
+            def fast_path():
+                return values_response(queryset, fields).content
+
+            for name, func in (('schema + json', schema_path), ('values + orjson', fast_path)):
+                started = time.perf_counter()
+                for _ in range(options['repeat']):
+                    func()
+                elapsed = (time.perf_counter() - started) / options['repeat'] * 1000
+                self.stdout.write(f"{name}: {elapsed:.2f} мс на {options['rows']} рядків")
+
+            transaction.set_rollback(True)
@@ -0,0 +1,22 @@
+import time
+from django.core.management.base import BaseCommand
+from core.matching import run_due_waves, MATCHING
+
+class Command(BaseCommand):
+    help = 'Розсилає наступні хвилі заявок (запускати по cron або з --loop)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Працювати постійно')
+        parser.add_argument('--limit', type=int, default=500)
+
+    def handle(self, *args, **options):
+        interval = max(MATCHING['WAVE_INTERVAL'].total_seconds() / 4, 5)
+        while True:
+            started = time.perf_counter()
+            processed = run_due_waves(limit=options['limit'])
+            elapsed = time.perf_counter() - started
+            if processed:
+                self.stdout.write(f"Хвиль розіслано: {processed} за {elapsed:.2f} с")
+            if not options['loop']:
+                break
+            time.sleep(interval)
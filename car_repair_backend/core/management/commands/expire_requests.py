@@ -0,0 +1,27 @@
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from core.workflow import expire_stale_requests, REQUEST_EXPIRE_AFTER
+
+class Command(BaseCommand):
+    help = 'Закриває покинуті відкриті заявки (запускати по cron або з --loop)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=int(REQUEST_EXPIRE_AFTER.total_seconds() // 3600),
+                            help='Закривати заявки, створені раніше ніж N годин тому')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--loop', action='store_true', help='Працювати постійно')
+        parser.add_argument('--interval', type=int, default=600, help='Пауза між прогонами в --loop, с')
+
+    def handle(self, *args, **options):
+        older_than = timedelta(hours=options['hours'])
+        while True:
+            batches = expire_stale_requests(older_than, batch_size=options['batch_size'])
+            for i, batch in enumerate(batches, 1):
+                self.stdout.write(f"Пачка {i}: {batch['rows']} заявок за {batch['seconds']:.3f} с")
+            if batches or not options['loop']:
+                total = sum(batch['rows'] for batch in batches)
+                self.stdout.write(self.style.SUCCESS(f'Закрито заявок: {total}'))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,35 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from core.export import export, DATASETS, FORMATS
+
+class Command(BaseCommand):
+    help = 'Потоковий експорт заявок/оферів/відгуків у CSV, NDJSON або Parquet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('dataset', choices=list(DATASETS))
+        parser.add_argument('--format', choices=FORMATS, default='csv')
+        parser.add_argument('--output', '-o', help='Файл (за замовчуванням - stdout)')
+        parser.add_argument('--date-from', help='YYYY-MM-DD')
+        parser.add_argument('--date-to', help='YYYY-MM-DD')
+        parser.add_argument('--status')
+
+    def handle(self, *args, **options):
+        try:
+            chunks, stats = export(
+                options['dataset'], options['format'],
+                date_from=options['date_from'], date_to=options['date_to'], status=options['status'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        out = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                out.write(chunk)
+        finally:
+            if options['output']:
+                out.close()
+
+        # Статистика - в stderr, щоб не змішувати з даними в stdout
+        rate = stats['rows'] / stats['seconds'] if stats['seconds'] else 0
+        self.stderr.write(f"Рядків: {stats['rows']} за {stats['seconds']:.2f} с ({rate:.0f} рядків/с)")
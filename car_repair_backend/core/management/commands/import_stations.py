@@ -0,0 +1,31 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from core.importer import read_rows, import_stations, write_error_report
+
+class Command(BaseCommand):
+    help = 'Масовий імпорт СТО з власниками з CSV/XLSX партнера'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV або XLSX з колонками username, phone, name, address, lat, lng, ...')
+        parser.add_argument('--dry-run', action='store_true', help='Перевірити і відкотити')
+        parser.add_argument('--errors', help='Куди записати звіт про помилки (CSV); за замовчуванням - stderr')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['path'], 'rb') as f:
+                result = import_stations(read_rows(f, options['path']), dry_run=options['dry_run'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if result['errors']:
+            if options['errors']:
+                with open(options['errors'], 'w', newline='', encoding='utf-8') as out:
+                    write_error_report(result['errors'], out)
+            else:
+                write_error_report(result['errors'], sys.stderr)
+
+        prefix = '[dry-run] ' if result['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}Створено СТО: {result['created']}, рядків з помилками: {len(result['errors'])}, "
+            f"{result['seconds']:.2f} с"
+        ))
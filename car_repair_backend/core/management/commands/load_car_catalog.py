@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from core.vehicles import load_catalog, CATALOG_PATH
+
+class Command(BaseCommand):
+    help = 'Завантажує каталог марок/моделей/поколінь (fixtures/car_catalog.json). Існуючі записи оновлюються, не видаляються'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=CATALOG_PATH)
+
+    def handle(self, *args, **options):
+        makes, models, generations = load_catalog(options['path'])
+        self.stdout.write(self.style.SUCCESS(f"Марок: {makes}, моделей: {models}, поколінь: {generations}"))
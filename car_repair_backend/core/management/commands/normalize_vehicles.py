@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from core.vehicles import normalize_existing, BATCH_SIZE
+
+class Command(BaseCommand):
+    help = "Зіставляє Car.brand_model і car_model заявок з каталогом авто (vehicle_model / покоління)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--redo', action='store_true', help='Перезіставити і вже зіставлені рядки')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        stats = normalize_existing(redo=options['redo'], batch_size=options['batch_size'])
+        for table, row in stats.items():
+            self.stdout.write(
+                f"{table}: переглянуто {row['scanned']}, зіставлено {row['matched']}, "
+                f"унікальних рядків {row['distinct']}"
+            )
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from core.notifications import prune_events
+
+class Command(BaseCommand):
+    help = 'Чистить журнал сповіщень (NotificationEvent) за віком та кількістю'
+
+    def handle(self, *args, **kwargs):
+        deleted = prune_events()
+        self.stdout.write(self.style.SUCCESS(f'Видалено подій: {deleted}'))
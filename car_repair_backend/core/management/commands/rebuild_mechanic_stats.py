@@ -0,0 +1,16 @@
+import time
+from django.core.management.base import BaseCommand
+from core.rollups import rebuild
+
+class Command(BaseCommand):
+    help = 'Перераховує аналітику майстрів (MechanicStats / MechanicDailyStats) з нуля'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mechanic', type=int, action='append', help='Тільки для цих майстрів (id)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        days = rebuild(options['mechanic'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Денних рядків: {days} за {time.perf_counter() - started:.2f} с'
+        ))
@@ -0,0 +1,13 @@
+import time
+from django.core.management.base import BaseCommand
+from core.pricing import rebuild
+
+class Command(BaseCommand):
+    help = 'Перебудовує скетчі цін (PriceSketch) з усіх оферів, включно з архівом'
+
+    def handle(self, *args, **kwargs):
+        started = time.perf_counter()
+        sketches = rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Скетчів: {sketches} за {time.perf_counter() - started:.2f} с'
+        ))
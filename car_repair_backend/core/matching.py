@@ -0,0 +1,249 @@
+# car_repair_backend/core/matching.py
+
+import heapq
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.gis.db.models.functions import Distance
+from django.contrib.gis.measure import D
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+from .categories import category_ancestors
+from .models import ServiceStation, RequestDispatch, DispatchNotice
+from .notifications import notify, notify_many, new_request_event
+
+try:
+    import numpy
+except ImportError:  # numpy опційний: без нього скор рахується списками
+    numpy = None
+
+MATCHING = {
+    'ENABLED': True,
+    'WAVE_SIZE': 5,          # скільки СТО в першій хвилі (далі подвоюється)
+    'WAVE_INTERVAL': timedelta(minutes=2),
+    'MAX_WAVES': 3,          # після останньої хвилі - broadcast всім механікам
+    'RADIUS_KM': 10,         # радіус першої хвилі
+    'RADIUS_STEP_KM': 10,    # на скільки розширюємо коло з кожною хвилею
+    'RESPONSE_WINDOW': timedelta(days=30),
+    'WEIGHTS': {'distance': 0.4, 'rating': 0.2, 'category': 0.25, 'response': 0.15},
+}
+MATCHING.update(getattr(settings, 'MATCHING', {}))
+
+# Для СТО без історії розсилок - нейтральна оцінка
+DEFAULT_RESPONSE_RATE = 0.5
+
+
+# --- СКОРИНГ ---
+
+def category_chain(category_id):
+    """
+    [(id, назва)] категорії та її предків (від листа до кореня), назви в нижньому регістрі.
+    """
+    return [(cat_id, name.lower()) for cat_id, name in category_ancestors(category_id)]
+
+
+def category_depths(chain):
+    """
+    {id категорії: глибина в ланцюжку} - щоб M2M-категорії СТО перевіряти без циклу по ланцюжку.
+    """
+    depths = {}
+    for depth, (cat_id, _) in enumerate(chain):
+        depths.setdefault(cat_id, depth)
+    return depths
+
+
+def category_match(candidate, chain, depths=None):
+    """
+    1.0 - СТО явно робить цю послугу, менше - тільки батьківську категорію.
+    Беремо M2M-категорії СТО, а якщо їх не вказано - шукаємо назву в services_list.
+    """
+    if not chain:
+        return 0.5
+    category_ids = candidate.get('category_ids')
+    if category_ids:
+        if depths is None:
+            depths = category_depths(chain)
+        hits = [depths[cat_id] for cat_id in category_ids if cat_id in depths]
+        return max(1.0 - 0.3 * min(hits), 0.1) if hits else 0.0
+    services = (candidate.get('services_list') or '').lower()
+    for depth, (_, name) in enumerate(chain):
+        if name in services:
+            return max(1.0 - 0.3 * depth, 0.1)
+    return 0.0
+
+
+def score_candidates(candidates, chain, response_rates, radius_km, limit=None):
+    """
+    Рахує скор для всіх кандидатів по колонках (з numpy - векторно) і повертає
+    limit найкращих [(скор, кандидат)] за спаданням; при рівному скорі - в порядку candidates.
+    candidates - словники з полями id, rating, services_list, category_ids, distance_km.
+    """
+    if not candidates:
+        return []
+    w = MATCHING['WEIGHTS']
+    depths = category_depths(chain)
+    distance = [c['distance_km'] for c in candidates]
+    rating = [float(c['rating'] or 0) for c in candidates]
+    category = [category_match(c, chain, depths) for c in candidates]
+    response = [response_rates.get(c['id'], DEFAULT_RESPONSE_RATE) for c in candidates]
+
+    if numpy is not None:
+        scores = (
+            w['distance'] * numpy.maximum(0.0, 1.0 - numpy.array(distance) / radius_km)
+            + w['rating'] * numpy.array(rating) / 5
+            + w['category'] * numpy.array(category)
+            + w['response'] * numpy.array(response)
+        )
+        order = numpy.argsort(-scores, kind='stable')[:limit]
+        return [(float(scores[i]), candidates[i]) for i in order]
+
+    scores = [
+        w['distance'] * max(0.0, 1.0 - d / radius_km) + w['rating'] * r / 5 + w['category'] * m + w['response'] * rr
+        for d, r, m, rr in zip(distance, rating, category, response)
+    ]
+    positions = range(len(candidates))
+    if limit is None:
+        order = sorted(positions, key=scores.__getitem__, reverse=True)
+    else:
+        order = heapq.nlargest(limit, positions, key=scores.__getitem__)
+    return [(scores[i], candidates[i]) for i in order]
+
+
+# --- ДАНІ З БД ---
+
+def find_candidates(req, radius_km, exclude_ids=()):
+    """
+    Просторовий префільтр: тільки СТО в радіусі (індекс по location).
+    """
+    rows = ServiceStation.objects.filter(
+        location__distance_lte=(req.location, D(km=radius_km))
+    ).exclude(id__in=exclude_ids).annotate(
+        distance=Distance('location', req.location)
+    ).values('id', 'owner_id', 'rating', 'services_list', 'distance')
+
+    candidates = []
+    for row in rows:
+        row['distance_km'] = row.pop('distance').km
+        row['category_ids'] = set()
+        candidates.append(row)
+
+    # Категорії всіх кандидатів одним запитом по M2M-таблиці
+    by_id = {c['id']: c for c in candidates}
+    links = ServiceStation.categories.through.objects.filter(
+        servicestation_id__in=list(by_id)
+    ).values_list('servicestation_id', 'servicecategory_id')
+    for station_id, category_id in links:
+        by_id[station_id]['category_ids'].add(category_id)
+    return candidates
+
+
+def response_rates(station_ids):
+    """
+    Частка розсилок за останній період, на які СТО відповіла офером.
+    """
+    since = timezone.now() - MATCHING['RESPONSE_WINDOW']
+    rows = DispatchNotice.objects.filter(
+        station_id__in=station_ids, created_at__gte=since
+    ).values('station_id').annotate(
+        # distinct - бо JOIN з оферами множить рядки
+        total=Count('id', distinct=True),
+        answered=Count(
+            'request__offers',
+            filter=Q(request__offers__mechanic_id=F('station__owner_id')),
+            distinct=True,
+        ),
+    )
+    return {row['station_id']: row['answered'] / row['total'] for row in rows}
+
+
+# --- ХВИЛІ ---
+
+def start_dispatch(req):
+    """
+    Викликається при створенні заявки: заводимо стан розсилки, а першу хвилю
+    шлемо вже після коміту - пошук кандидатів не тримає транзакцію збереження заявки.
+    next_wave_at=now: якщо відправка після коміту впаде, хвилю підбере run_due_waves.
+    """
+    dispatch = RequestDispatch.objects.create(request=req, next_wave_at=timezone.now())
+    transaction.on_commit(lambda: run_first_wave(dispatch.id), robust=True)
+    return dispatch
+
+
+def run_first_wave(dispatch_id):
+    """
+    Перша хвиля однієї розсилки. Блокування те саме, що в run_due_waves -
+    якщо воркер вже взяв цю розсилку, вдруге не шлемо.
+    """
+    with transaction.atomic():
+        dispatch = _lock_dispatch(id=dispatch_id, wave=0, request__status='new')
+        if dispatch is None:
+            return 0
+        return run_wave(dispatch, dispatch.request)
+
+
+def _lock_dispatch(**filters):
+    # skip_locked - щоб кілька воркерів не взяли одну й ту саму заявку
+    return RequestDispatch.objects.select_for_update(skip_locked=True, of=('self',)).filter(
+        **filters
+    ).select_related('request').order_by('next_wave_at').first()
+
+
+def run_wave(dispatch, req):
+    """
+    Наступна хвиля: ширше коло, більше СТО, без тих, кому вже відправили.
+    Повертає кількість сповіщених.
+    """
+    wave = dispatch.wave + 1
+    message, data = new_request_event(req)
+
+    if wave > MATCHING['MAX_WAVES']:
+        # Ніхто з найкращих не відгукнувся - показуємо заявку всім
+        notify("mechanics", message, data)
+        dispatch.wave = wave
+        dispatch.next_wave_at = None
+        dispatch.save(update_fields=['wave', 'next_wave_at'])
+        return 0
+
+    radius_km = MATCHING['RADIUS_KM'] + MATCHING['RADIUS_STEP_KM'] * (wave - 1)
+    size = MATCHING['WAVE_SIZE'] * 2 ** (wave - 1)
+
+    notified_ids = DispatchNotice.objects.filter(request=req).values_list('station_id', flat=True)
+    candidates = find_candidates(req, radius_km, exclude_ids=notified_ids)
+    rates = response_rates([c['id'] for c in candidates])
+    top = score_candidates(candidates, category_chain(req.category_id), rates, radius_km, limit=size)
+
+    DispatchNotice.objects.bulk_create([
+        DispatchNotice(request=req, station_id=c['id'], wave=wave, score=score)
+        for score, c in top
+    ])
+    notify_many([f"user_{c['owner_id']}" for _, c in top], message, {**data, "wave": wave})
+
+    dispatch.wave = wave
+    dispatch.next_wave_at = timezone.now() + MATCHING['WAVE_INTERVAL']
+    dispatch.save(update_fields=['wave', 'next_wave_at'])
+    return len(top)
+
+
+def run_due_waves(limit=500):
+    """
+    Обробляє всі розсилки, в яких настав час наступної хвилі.
+    Кожна хвиля - своя коротка транзакція: рядки NotificationStream (allocate_seq),
+    зокрема спільний "mechanics", блокуються на час однієї хвилі, а не всього прогону.
+    """
+    now = timezone.now()
+
+    # Заявки, які вже прийняли/скасували - розсилку просто закриваємо
+    RequestDispatch.objects.filter(next_wave_at__isnull=False).exclude(
+        request__status='new'
+    ).update(next_wave_at=None)
+
+    processed = 0
+    while processed < limit:
+        with transaction.atomic():
+            dispatch = _lock_dispatch(next_wave_at__lte=now, request__status='new')
+            if dispatch is None:
+                break
+            # run_wave переносить next_wave_at у майбутнє (або None) - вдруге не вибереться
+            run_wave(dispatch, dispatch.request)
+        processed += 1
+    return processed
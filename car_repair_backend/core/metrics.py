@@ -0,0 +1,77 @@
+# car_repair_backend/core/metrics.py
+
+import threading
+from collections import deque
+
+# Скільки останніх вимірів тримаємо на одну метрику
+WINDOW_SIZE = 1000
+
+
+class LatencyWindow:
+    """
+    Ковзне вікно останніх вимірів латентності (в секундах) + лічильники.
+    Живе в пам'яті процесу (того, де крутяться WebSocket-и).
+    """
+
+    def __init__(self, budget=None):
+        self.budget = budget
+        self.samples = deque(maxlen=WINDOW_SIZE)
+        self.total = 0
+        self.over_budget = 0
+        self.lock = threading.Lock()
+
+    def record(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+            self.total += 1
+            if self.budget is not None and seconds > self.budget:
+                self.over_budget += 1
+
+    def snapshot(self):
+        with self.lock:
+            values = sorted(self.samples)
+            total, over_budget = self.total, self.over_budget
+
+        def percentile(p):
+            if not values:
+                return None
+            return round(values[min(len(values) - 1, int(len(values) * p))] * 1000, 2)
+
+        return {
+            "count": total,
+            "over_budget": over_budget,
+            "budget_ms": self.budget * 1000 if self.budget is not None else None,
+            "p50_ms": percentile(0.5),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(values[-1] * 1000, 2) if values else None,
+        }
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def latency(name, budget=None):
+    """
+    Повертає (створює при першому зверненні) метрику латентності за ім'ям.
+    """
+    with _registry_lock:
+        if name not in _registry:
+            _registry[name] = LatencyWindow(budget)
+        return _registry[name]
+
+
+def register(name, source):
+    """
+    Реєструє довільне джерело метрик (будь-що з методом snapshot()), напр. кеш.
+    """
+    with _registry_lock:
+        _registry[name] = source
+    return source
+
+
+def snapshot_all():
+    with _registry_lock:
+        items = list(_registry.items())
+    return {name: source.snapshot() for name, source in items}
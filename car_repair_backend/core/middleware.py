@@ -0,0 +1,55 @@
+# car_repair_backend/core/middleware.py
+
+from urllib.parse import parse_qs
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from ninja_jwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from core.authentication import CachedJWTAuth
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Авторизація WebSocket по JWT замість сесій.
+    Токен передається в query string: ws://.../ws/notifications/?token=<access>
+
+    Кладе в scope:
+      - user: юзер (або AnonymousUser)
+      - role: 'client' / 'mechanic' / None
+      - station_id: id СТО юзера або None
+    """
+
+    def __init__(self, inner):
+        super().__init__(inner)
+        self.auth = CachedJWTAuth()
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        scope['user'] = AnonymousUser()
+        scope['role'] = None
+        scope['station_id'] = None
+
+        query = parse_qs(scope.get('query_string', b'').decode())
+        raw_token = (query.get('token') or [None])[0]
+
+        if raw_token:
+            user = await self.authenticate(raw_token)
+            if user is not None:
+                scope['user'] = user
+                scope['role'] = user.role
+                scope['station_id'] = user.station_id
+
+        return await super().__call__(scope, receive, send)
+
+    async def authenticate(self, raw_token):
+        # Кеш (Redis) і БД - синхронні клієнти: весь пошук юзера в потоці, не в event loop
+        return await database_sync_to_async(self.get_user)(raw_token)
+
+    def get_user(self, raw_token):
+        try:
+            # Перевірка підпису та терміну дії - чиста криптографія, без БД
+            validated_token = self.auth.get_validated_token(raw_token)
+            # Спершу кеш ("теплий" токен - юзер ходив в API), в БД - тільки якщо там нема
+            return self.auth.get_user(validated_token)
+        except (AuthenticationFailed, InvalidToken, TokenError):
+            return None
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.27 on 2026-10-19 10:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_request_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestDispatch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('wave', models.PositiveSmallIntegerField(default=0)),
+                ('next_wave_at', models.DateTimeField(blank=True, db_index=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('request', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='dispatch', to='core.request')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DispatchNotice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('wave', models.PositiveSmallIntegerField()),
+                ('score', models.FloatField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dispatch_notices', to='core.request')),
+                ('station', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='dispatch_notices', to='core.servicestation')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['station', 'created_at'], name='dispatch_station_time_idx')],
+                'unique_together': {('request', 'station')},
+            },
+        ),
+    ]
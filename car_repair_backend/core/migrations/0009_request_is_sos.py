@@ -0,0 +1,22 @@
+# Generated by Django 4.2.27 on 2026-10-19 10:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_requestdispatch_dispatchnotice'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='request',
+            name='is_sos',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(fields=['status', '-is_sos', '-created_at'], name='request_feed_sos_idx'),
+        ),
+    ]
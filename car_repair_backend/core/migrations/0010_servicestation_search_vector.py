@@ -0,0 +1,50 @@
+# Generated by Django 4.2.27 on 2026-10-19 11:00
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# FTS / триграмні індекси є тільки в PostgreSQL - на SQLite працює
+# інвертований індекс в пам'яті (core/search.py)
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS station_search_vector_gin ON core_servicestation USING gin (search_vector)",
+    "CREATE INDEX IF NOT EXISTS station_name_trgm_gin ON core_servicestation USING gin (name gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS station_services_trgm_gin ON core_servicestation USING gin (services_list gin_trgm_ops)",
+    """
+    UPDATE core_servicestation SET search_vector =
+        setweight(to_tsvector('simple', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(services_list, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(description, '')), 'C')
+    """,
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS station_search_vector_gin",
+    "DROP INDEX IF EXISTS station_name_trgm_gin",
+    "DROP INDEX IF EXISTS station_services_trgm_gin",
+]
+
+
+def run_postgres(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_request_is_sos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicestation',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(run_postgres(POSTGRES_FORWARD), run_postgres(POSTGRES_BACKWARD)),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 4.2.27 on 2026-10-19 11:30
+
+from django.db import migrations, models
+
+
+def backfill_categories(apps, schema_editor):
+    """
+    Розбираємо services_list ("А, Б, В") і прив'язуємо категорії з такими назвами.
+    """
+    ServiceStation = apps.get_model('core', 'ServiceStation')
+    ServiceCategory = apps.get_model('core', 'ServiceCategory')
+    Through = ServiceStation.categories.through
+
+    ids_by_name = {}
+    for cat_id, name in ServiceCategory.objects.values_list('id', 'name'):
+        ids_by_name.setdefault(name.strip().lower(), []).append(cat_id)
+
+    links = []
+    for station_id, services_list in ServiceStation.objects.values_list('id', 'services_list').iterator():
+        matched = set()
+        for part in (services_list or '').split(','):
+            matched.update(ids_by_name.get(part.strip().lower(), ()))
+        links.extend(
+            Through(servicestation_id=station_id, servicecategory_id=cat_id) for cat_id in matched
+        )
+    Through.objects.bulk_create(links, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_servicestation_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='servicestation',
+            name='categories',
+            field=models.ManyToManyField(blank=True, related_name='stations', to='core.servicecategory'),
+        ),
+        migrations.RunPython(backfill_categories, migrations.RunPython.noop),
+    ]
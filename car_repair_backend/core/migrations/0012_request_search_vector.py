@@ -0,0 +1,52 @@
+# Generated by Django 4.2.27 on 2026-10-19 12:00
+
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+# FTS / триграмні індекси тільки для PostgreSQL (як і в 0010)
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS request_search_vector_gin ON core_request USING gin (search_vector)",
+    "CREATE INDEX IF NOT EXISTS request_car_model_trgm_gin ON core_request USING gin (car_model gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS request_description_trgm_gin ON core_request USING gin (description gin_trgm_ops)",
+    """
+    UPDATE core_request SET search_vector =
+        setweight(to_tsvector('simple', coalesce(car_model, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+    """,
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS request_search_vector_gin",
+    "DROP INDEX IF EXISTS request_car_model_trgm_gin",
+    "DROP INDEX IF EXISTS request_description_trgm_gin",
+]
+
+
+def run_postgres(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_servicestation_categories'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='request',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(fields=['created_at'], name='request_created_idx'),
+        ),
+        migrations.RunPython(run_postgres(POSTGRES_FORWARD), run_postgres(POSTGRES_BACKWARD)),
+    ]
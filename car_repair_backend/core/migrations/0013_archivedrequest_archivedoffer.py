@@ -0,0 +1,65 @@
+# Generated by Django 4.2.27 on 2026-10-19 14:00
+
+from django.conf import settings
+import django.contrib.gis.db.models.fields
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_request_search_vector'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='review',
+            name='request',
+            field=models.OneToOneField(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='review', to='core.request'),
+        ),
+        migrations.AlterField(
+            model_name='clientreview',
+            name='request',
+            field=models.OneToOneField(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='client_review', to='core.request'),
+        ),
+        migrations.CreateModel(
+            name='ArchivedRequest',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('car_model', models.CharField(max_length=255)),
+                ('description', models.TextField()),
+                ('location', django.contrib.gis.db.models.fields.PointField(srid=4326)),
+                ('status', models.CharField(choices=[('new', 'Нова'), ('active', 'В роботі'), ('done', 'Виконана'), ('canceled', 'Скасована')], max_length=20)),
+                ('is_sos', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('has_review', models.BooleanField(default=False)),
+                ('has_client_review', models.BooleanField(default=False)),
+                ('attachment_files', models.JSONField(default=list, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('car', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_requests', to='core.car')),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='core.servicecategory')),
+                ('client', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_requests', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['client', '-created_at'], name='archived_req_client_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedOffer',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('comment', models.TextField(blank=True)),
+                ('is_accepted', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField()),
+                ('mechanic', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_offers', to=settings.AUTH_USER_MODEL)),
+                ('request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='offers', to='core.archivedrequest')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['mechanic', '-created_at'], name='archived_offer_mech_idx')],
+            },
+        ),
+    ]
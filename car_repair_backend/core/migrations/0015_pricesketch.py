@@ -0,0 +1,28 @@
+# Generated by Django 4.2.27 on 2026-10-19 16:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_mechanicstats_mechanicdailystats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceSketch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cell', models.CharField(max_length=32)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('centroids', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_sketches', to='core.servicecategory')),
+            ],
+            options={
+                'unique_together': {('category', 'cell')},
+            },
+        ),
+    ]
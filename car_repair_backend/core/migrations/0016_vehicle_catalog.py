@@ -0,0 +1,67 @@
+# Generated by Django 4.2.27 on 2026-10-19 18:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_pricesketch'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VehicleMake',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('aliases', models.JSONField(blank=True, default=list)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='VehicleModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('aliases', models.JSONField(blank=True, default=list)),
+                ('make', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='models', to='core.vehiclemake')),
+            ],
+            options={
+                'unique_together': {('make', 'name')},
+            },
+        ),
+        migrations.CreateModel(
+            name='VehicleGeneration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('year_from', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('year_to', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='generations', to='core.vehiclemodel')),
+            ],
+            options={
+                'unique_together': {('model', 'name')},
+            },
+        ),
+        migrations.AddField(
+            model_name='car',
+            name='vehicle_model',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cars', to='core.vehiclemodel'),
+        ),
+        migrations.AddField(
+            model_name='car',
+            name='vehicle_generation',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cars', to='core.vehiclegeneration'),
+        ),
+        migrations.AddField(
+            model_name='request',
+            name='vehicle_model',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='requests', to='core.vehiclemodel'),
+        ),
+        migrations.AddField(
+            model_name='archivedrequest',
+            name='vehicle_model',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='archived_requests', to='core.vehiclemodel'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.27 on 2026-10-19 20:30
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def backfill_seq(apps, schema_editor):
+    # Старі події: seq = id (всередині stream теж зростає), лічильник - з максимуму
+    NotificationEvent = apps.get_model('core', 'NotificationEvent')
+    NotificationStream = apps.get_model('core', 'NotificationStream')
+    NotificationEvent.objects.update(seq=models.F('id'))
+    heads = NotificationEvent.objects.values('stream').annotate(last_seq=Max('seq'))
+    NotificationStream.objects.bulk_create([
+        NotificationStream(name=head['stream'], last_seq=head['last_seq']) for head in heads
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_indexversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationStream',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_seq', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='notificationevent',
+            name='seq',
+            field=models.PositiveBigIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_seq, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='notificationevent',
+            name='notif_stream_seq_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='notificationevent',
+            constraint=models.UniqueConstraint(fields=('stream', 'seq'), name='notif_stream_seq_uniq'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.27 on 2026-10-19 21:00
+
+from django.db import migrations, models
+
+
+def mark_sos(apps, schema_editor):
+    # До цього поля SOS відрізнялись тільки stream-ом
+    NotificationEvent = apps.get_model('core', 'NotificationEvent')
+    NotificationEvent.objects.filter(stream='sos').update(handler='send_sos')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_notification_stream_seq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notificationevent',
+            name='handler',
+            field=models.CharField(default='send_notification', max_length=50),
+        ),
+        migrations.RunPython(mark_sos, migrations.RunPython.noop),
+    ]
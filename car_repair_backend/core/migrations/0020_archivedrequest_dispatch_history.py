@@ -0,0 +1,19 @@
+# Generated by Django 4.2.27 on 2026-10-19 22:00
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_notificationevent_handler'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedrequest',
+            name='dispatch_history',
+            field=models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder),
+        ),
+    ]
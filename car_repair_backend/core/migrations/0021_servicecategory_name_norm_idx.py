@@ -0,0 +1,18 @@
+# Generated by Django 4.2.27 on 2026-10-19 19:03
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_archivedrequest_dispatch_history'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='servicecategory',
+            index=models.Index(django.db.models.functions.text.Lower(django.db.models.functions.text.Trim('name')), name='category_name_norm_idx'),
+        ),
+    ]
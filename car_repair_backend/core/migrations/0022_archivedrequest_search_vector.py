@@ -0,0 +1,45 @@
+# Generated by Django 4.2.27 on 2026-10-19 12:00
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Ті самі індекси, що в 0012 для core_request - тільки PostgreSQL
+POSTGRES_FORWARD = [
+    "CREATE INDEX IF NOT EXISTS archived_request_search_vector_gin ON core_archivedrequest USING gin (search_vector)",
+    "CREATE INDEX IF NOT EXISTS archived_request_car_model_trgm_gin ON core_archivedrequest USING gin (car_model gin_trgm_ops)",
+    """
+    UPDATE core_archivedrequest SET search_vector =
+        setweight(to_tsvector('simple', coalesce(car_model, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+    """,
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS archived_request_search_vector_gin",
+    "DROP INDEX IF EXISTS archived_request_car_model_trgm_gin",
+]
+
+
+def run_postgres(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for sql in statements:
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0021_servicecategory_name_norm_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedrequest',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(run_postgres(POSTGRES_FORWARD), run_postgres(POSTGRES_BACKWARD)),
+    ]
@@ -1,9 +1,12 @@
 import uuid
 import os
 from django.db import models
+from django.db.models.functions import Lower, Trim
 from django.contrib.auth.models import AbstractUser
 from django.contrib.gis.db.models import PointField  # Для PostGIS
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, MaxValueValidator
+from django.core.serializers.json import DjangoJSONEncoder
 
 # --- HELPER FUNCTIONS ---
 
@@ -43,6 +46,12 @@ class ServiceCategory(models.Model):
     
     icon = models.CharField(max_length=50, blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Пошук категорій за назвою з services_list СТО (categories.parse_services_list)
+            models.Index(Lower(Trim('name')), name='category_name_norm_idx'),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.slug:
             from django.utils.text import slugify
@@ -63,6 +72,8 @@ class ServiceStation(models.Model):
     name = models.CharField(max_length=255, verbose_name="Назва СТО")
     description = models.TextField(blank=True, verbose_name="Опис")
     services_list = models.TextField(blank=True, help_text="Перелік послуг через кому")
+    # Нормалізовані послуги: по ним фільтруємо СТО і стрічку заявок (JOIN по індексах)
+    categories = models.ManyToManyField(ServiceCategory, blank=True, related_name='stations')
     
     address = models.CharField(max_length=255, verbose_name="Адреса словами")
     location = PointField(srid=4326, blank=True, null=True)
@@ -71,6 +82,10 @@ class ServiceStation(models.Model):
     rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.0)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Повнотекстовий індекс (name + services_list + description), оновлюється сигналом.
+    # GIN-індекси (FTS і триграми) створює міграція 0010 тільки на PostgreSQL.
+    search_vector = SearchVectorField(null=True, editable=False)
+
     def __str__(self):
         return self.name
 
@@ -86,6 +101,10 @@ class Car(models.Model):
     brand_model = models.CharField(max_length=100)
     year = models.IntegerField(null=True, blank=True)
     
+    # Нормалізована марка/модель з каталогу (brand_model лишається як ввели / як віддав парсер)
+    vehicle_model = models.ForeignKey('VehicleModel', on_delete=models.SET_NULL, null=True, blank=True, related_name='cars')
+    vehicle_generation = models.ForeignKey('VehicleGeneration', on_delete=models.SET_NULL, null=True, blank=True, related_name='cars')
+
     vin = models.CharField(max_length=50, null=True, blank=True)
     color = models.CharField(max_length=50, null=True, blank=True)
     type = models.CharField(max_length=50, null=True, blank=True)
@@ -112,11 +131,19 @@ class Request(models.Model):
     category = models.ForeignKey(ServiceCategory, on_delete=models.SET_NULL, null=True)
     
     car_model = models.CharField(max_length=255)
+    vehicle_model = models.ForeignKey('VehicleModel', on_delete=models.SET_NULL, null=True, blank=True, related_name='requests')
     description = models.TextField()
     
     location = PointField(srid=4326)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='new')
+    # Термінова заявка (SOS): окремий канал сповіщень і перше місце в стрічці
+    is_sos = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Повнотекстовий індекс (car_model + description) для пошуку по історії
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Маркер змін для дельта-синхронізації стрічки майстра.
+    # УВАГА: QuerySet.update() не чіпає auto_now - виставляй updated_at явно.
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     car = models.ForeignKey(
         'Car', 
@@ -126,6 +153,14 @@ class Request(models.Model):
         related_name='requests'
     )
 
+    class Meta:
+        indexes = [
+            # Стрічка майстра: відкриті заявки, SOS першими, потім найновіші
+            models.Index(fields=['status', '-is_sos', '-created_at'], name='request_feed_sos_idx'),
+            # Фільтр пошуку по даті
+            models.Index(fields=['created_at'], name='request_created_idx'),
+        ]
+
     def __str__(self):
         return f"Request {self.id} by {self.client}"
 
@@ -148,7 +183,8 @@ class Offer(models.Model):
 
 # 7. ВІДГУКИ ПРО СТО
 class Review(models.Model):
-    request = models.OneToOneField(Request, on_delete=models.CASCADE, related_name='review')
+    # SET_NULL: відгук (і рейтинг майстра) живе далі, коли заявку переносять в архів
+    request = models.OneToOneField(Request, on_delete=models.SET_NULL, null=True, related_name='review')
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='left_reviews')
     mechanic = models.ForeignKey(User, on_delete=models.CASCADE, related_name='received_reviews')
     
@@ -161,7 +197,7 @@ class Review(models.Model):
 
 # 8. ВІДГУКИ ПРО КЛІЄНТІВ
 class ClientReview(models.Model):
-    request = models.OneToOneField(Request, on_delete=models.CASCADE, related_name='client_review')
+    request = models.OneToOneField(Request, on_delete=models.SET_NULL, null=True, related_name='client_review')
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='left_client_reviews') # Майстер
     client = models.ForeignKey(User, on_delete=models.CASCADE, related_name='received_client_reviews') # Клієнт
     
@@ -170,4 +206,232 @@ class ClientReview(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return f"{self.rating}★ для клієнта {self.client.username}"
\ No newline at end of file
+        return f"{self.rating}★ для клієнта {self.client.username}"
+
+# 9. ЖУРНАЛ СПОВІЩЕНЬ (OUTBOX)
+class NotificationStream(models.Model):
+    """
+    Лічильник seq для одного stream. Рядок блокується (select_for_update)
+    до коміту транзакції, що пише подію, тож у межах stream seq комітяться
+    строго по зростанню - курсор клієнта не перескакує пізні коміти.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    last_seq = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} @{self.last_seq}"
+
+
+class NotificationEvent(models.Model):
+    """
+    Append-only журнал усього, що пішло в WebSocket.
+    seq - порядковий номер у межах stream: клієнт після реконекту
+    передає останній отриманий seq кожного stream і дочитує пропущене.
+    """
+    stream = models.CharField(max_length=50)  # "user_5", "mechanics"...
+    seq = models.PositiveBigIntegerField()
+    # Метод Consumer-а, яким подію доставили наживо (send_sos...) - ним же і дочитуємо
+    handler = models.CharField(max_length=50, default='send_notification')
+    message = models.TextField()
+    data = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['stream', 'seq'], name='notif_stream_seq_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.stream}#{self.seq}: {self.message}"
+
+
+# 10. ДИСПЕТЧЕРИЗАЦІЯ ЗАЯВОК (ХВИЛІ РОЗСИЛКИ)
+class RequestDispatch(models.Model):
+    """
+    Стан хвильової розсилки заявки: спочатку top-K найкращих СТО,
+    потім коло розширюється, поки хтось не відгукнеться.
+    """
+    request = models.OneToOneField(Request, on_delete=models.CASCADE, related_name='dispatch')
+    wave = models.PositiveSmallIntegerField(default=0)
+    # None = розсилку завершено
+    next_wave_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+class DispatchNotice(models.Model):
+    """
+    Кому і в якій хвилі відправили заявку. Звідси ж рахуємо response rate СТО.
+    """
+    request = models.ForeignKey(Request, on_delete=models.CASCADE, related_name='dispatch_notices')
+    station = models.ForeignKey(ServiceStation, on_delete=models.CASCADE, related_name='dispatch_notices')
+    wave = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('request', 'station')
+        indexes = [
+            models.Index(fields=['station', 'created_at'], name='dispatch_station_time_idx'),
+        ]
+
+
+# 11. АРХІВ ЗАКРИТИХ ЗАЯВОК
+class ArchivedRequest(models.Model):
+    """
+    Закрита (done/canceled) заявка, перенесена з гарячої таблиці Request
+    командою archive_requests. id той самий, що був у Request.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    client = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_requests')
+    category = models.ForeignKey(ServiceCategory, on_delete=models.SET_NULL, null=True)
+    car = models.ForeignKey('Car', on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_requests')
+
+    car_model = models.CharField(max_length=255)
+    vehicle_model = models.ForeignKey('VehicleModel', on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_requests')
+    description = models.TextField()
+    location = PointField(srid=4326)
+    status = models.CharField(max_length=20, choices=Request.STATUS_CHOICES)
+    is_sos = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    # Переноситься з Request як є - пошук по історії йде по обох таблицях
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    # Відгуки лишаються у своїх таблицях (request стає NULL) - тут тільки прапорці для історії
+    has_review = models.BooleanField(default=False)
+    has_client_review = models.BooleanField(default=False)
+    # [{id, file, file_type}] - файли нікуди не переносяться, зберігаємо тільки шляхи
+    attachment_files = models.JSONField(default=list, encoder=DjangoJSONEncoder)
+    # Історія хвильової розсилки (RequestDispatch/DispatchNotice видаляються каскадом):
+    # {wave, created_at, notices: [{station_id, wave, score, created_at}]}
+    dispatch_history = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['client', '-created_at'], name='archived_req_client_idx'),
+        ]
+
+    @property
+    def attachments(self):
+        # Та сама форма, що й Request.attachments - для RequestOutSchema
+        return [
+            RequestAttachment(id=item['id'], file=item['file'], file_type=item['file_type'])
+            for item in self.attachment_files
+        ]
+
+    def __str__(self):
+        return f"Archived request {self.id}"
+
+class ArchivedOffer(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    request = models.ForeignKey(ArchivedRequest, on_delete=models.CASCADE, related_name='offers')
+    mechanic = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_offers')
+
+    price = models.DecimalField(max_digits=10, decimal_places=2)
+    comment = models.TextField(blank=True)
+    is_accepted = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['mechanic', '-created_at'], name='archived_offer_mech_idx'),
+        ]
+
+
+# 12. АНАЛІТИКА МАЙСТРІВ (ROLLUPS)
+class MechanicStats(models.Model):
+    """
+    Накопичені підсумки майстра за весь час - /mechanic/stats читає один рядок.
+    Оновлюється інкрементно (core/rollups.py), перебудовується rebuild_mechanic_stats.
+    """
+    mechanic = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    offers_sent = models.PositiveIntegerField(default=0)
+    offers_accepted = models.PositiveIntegerField(default=0)
+    jobs_done = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    reviews_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    # Час від створення заявки до офера, в секундах (сума - для середнього)
+    response_seconds_sum = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+class MechanicDailyStats(models.Model):
+    """
+    Ті самі лічильники по днях (для графіків). День - дата офера / відгуку.
+    """
+    mechanic = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_stats')
+    day = models.DateField()
+    offers_sent = models.PositiveIntegerField(default=0)
+    offers_accepted = models.PositiveIntegerField(default=0)
+    jobs_done = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    reviews_count = models.PositiveIntegerField(default=0)
+    rating_sum = models.PositiveIntegerField(default=0)
+    response_seconds_sum = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('mechanic', 'day')
+
+
+# 13. СКЕТЧІ ЦІН (ОЦІНКА ВАРТОСТІ)
+class PriceSketch(models.Model):
+    """
+    t-digest цін оферів для (категорія, клітинка сітки) - див. core/pricing.py.
+    """
+    category = models.ForeignKey(ServiceCategory, on_delete=models.CASCADE, related_name='price_sketches')
+    cell = models.CharField(max_length=32)  # "рядок:стовпець" сітки pricing.CELL_DEG
+    count = models.PositiveIntegerField(default=0)
+    centroids = models.JSONField(default=list)  # [[середнє, вага], ...]
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('category', 'cell')
+
+
+# 14. КАТАЛОГ АВТО (МАРКА / МОДЕЛЬ / ПОКОЛІННЯ)
+class VehicleMake(models.Model):
+    """
+    Марка з каталогу (fixtures/car_catalog.json, команда load_car_catalog).
+    """
+    name = models.CharField(max_length=100, unique=True)
+    # Інші написання: "VW", "Фольксваген" - для автодоповнення і нормалізації
+    aliases = models.JSONField(default=list, blank=True)
+
+    def __str__(self):
+        return self.name
+
+class VehicleModel(models.Model):
+    make = models.ForeignKey(VehicleMake, on_delete=models.CASCADE, related_name='models')
+    name = models.CharField(max_length=100)
+    aliases = models.JSONField(default=list, blank=True)
+
+    class Meta:
+        unique_together = ('make', 'name')
+
+    def __str__(self):
+        return f"{self.make.name} {self.name}"
+
+class VehicleGeneration(models.Model):
+    model = models.ForeignKey(VehicleModel, on_delete=models.CASCADE, related_name='generations')
+    name = models.CharField(max_length=100)
+    year_from = models.PositiveSmallIntegerField(null=True, blank=True)
+    year_to = models.PositiveSmallIntegerField(null=True, blank=True)  # None - випускається досі
+
+    class Meta:
+        unique_together = ('model', 'name')
+
+    def __str__(self):
+        return f"{self.model} {self.name}"
+
+# 15. ВЕРСІЇ ІНДЕКСІВ У ПАМ'ЯТІ
+class IndexVersion(models.Model):
+    """
+    Версія індексу, який кожен процес тримає в пам'яті (search.VersionedIndex).
+    Бампиться UPDATE-ом у транзакції, що змінює дані, тому всі воркери
+    бачать нову версію рівно після коміту - без спільного кешу.
+    """
+    name = models.CharField(max_length=50, unique=True)
+    version = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.name} v{self.version}"
@@ -0,0 +1,204 @@
+# car_repair_backend/core/notifications.py
+
+import time
+from collections import defaultdict
+from datetime import timedelta
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from .models import NotificationEvent, NotificationStream
+
+# Скільки тримаємо події для дочитування після реконекту
+OUTBOX_MAX_AGE = getattr(settings, 'NOTIFICATION_OUTBOX_MAX_AGE', timedelta(hours=24))
+OUTBOX_MAX_PER_STREAM = getattr(settings, 'NOTIFICATION_OUTBOX_MAX_PER_STREAM', 500)
+# Якщо пропущено більше - просимо клієнта просто перезавантажити дані
+REPLAY_LIMIT = getattr(settings, 'NOTIFICATION_REPLAY_LIMIT', 200)
+
+# SOS: окрема група (черга) і бюджет на доставку
+SOS_STREAM = "sos"
+SOS_LATENCY_BUDGET = getattr(settings, 'SOS_LATENCY_BUDGET', 1.0)  # секунди
+
+
+def allocate_seq(counts):
+    """
+    Резервує seq для подій: counts - {stream: скільки подій}, повертає
+    {stream: перший seq}. Рядки NotificationStream лишаються заблокованими
+    до коміту транзакції, тому викликати тільки всередині atomic().
+    Блокуємо в порядку імен - два батчі з різними stream не дедлочать.
+    """
+    names = sorted(counts)
+    locked = NotificationStream.objects.select_for_update().filter(name__in=names).order_by('name')
+    rows = list(locked)
+    if len(rows) < len(names):
+        # Перша подія в stream - створюємо лічильник (паралельний INSERT не завадить)
+        NotificationStream.objects.bulk_create(
+            [NotificationStream(name=name) for name in names], ignore_conflicts=True,
+        )
+        rows = list(locked.all())
+    first = {}
+    for row in rows:
+        first[row.name] = row.last_seq + 1
+        row.last_seq += counts[row.name]
+    NotificationStream.objects.bulk_update(rows, ['last_seq'])
+    return first
+
+
+def stream_heads(streams):
+    """
+    Останній закомічений seq кожного stream - курсор, з якого клієнт
+    продовжує після resync.
+    """
+    heads = dict.fromkeys(streams, 0)
+    heads.update(NotificationStream.objects.filter(name__in=streams).values_list('name', 'last_seq'))
+    return heads
+
+
+def _payload(event):
+    return {
+        "type": event.handler,  # Метод, який має бути в Consumer
+        "stream": event.stream,
+        "seq": event.seq,
+        "message": event.message,
+        "data": event.data,
+        "sent_at": time.time(),  # для метрик латентності доставки
+    }
+
+
+def notify(stream, message, data, handler="send_notification"):
+    """
+    Записує подію в журнал і відправляє її в групу каналів.
+    Відправка - тільки після коміту транзакції, щоб клієнт не отримав
+    сповіщення про те, чого в БД ще (або вже) немає.
+    """
+    with transaction.atomic():
+        seq = allocate_seq({stream: 1})[stream]
+        event = NotificationEvent.objects.create(
+            stream=stream, seq=seq, handler=handler, message=message, data=data,
+        )
+    payload = _payload(event)
+    transaction.on_commit(
+        lambda: async_to_sync(get_channel_layer().group_send)(stream, payload)
+    )
+    return event
+
+
+def notify_many(streams, message, data):
+    """
+    Те саме, що notify(), але для багатьох отримувачів одним INSERT.
+    """
+    return notify_batch([(stream, message, data) for stream in streams])
+
+
+def notify_batch(items):
+    """
+    Різні повідомлення різним отримувачам одним INSERT: items - [(stream, message, data)].
+    """
+    counts = defaultdict(int)
+    for stream, _, _ in items:
+        counts[stream] += 1
+    with transaction.atomic():
+        next_seq = allocate_seq(counts)
+        events = []
+        for stream, message, data in items:
+            events.append(NotificationEvent(stream=stream, seq=next_seq[stream], message=message, data=data))
+            next_seq[stream] += 1
+        NotificationEvent.objects.bulk_create(events)
+
+    def send():
+        channel_layer = get_channel_layer()
+        for event in events:
+            async_to_sync(channel_layer.group_send)(event.stream, _payload(event))
+
+    transaction.on_commit(send)
+    return events
+
+
+def notify_sos(req):
+    """
+    Пріоритетний шлях для SOS: без хвиль матчингу і без затримок -
+    одразу всім майстрам через окрему групу "sos" і окремий хендлер.
+    """
+    message, data = new_request_event(req)
+    return notify(SOS_STREAM, f"🆘 {message}", data, handler="send_sos")
+
+
+def new_request_event(req):
+    """
+    (message, data) для події "нова заявка" - спільне для broadcast і хвиль.
+    """
+    # Безпечно отримуємо координати
+    lat = req.location.y if req.location else None
+    lng = req.location.x if req.location else None
+    return (
+        f"Нова заявка: {req.car_model}",
+        {
+            "event": "new_request",
+            "request_id": req.id,
+            "is_sos": req.is_sos, # Беремо з поля моделі
+            "lat": lat,
+            "lng": lng,
+            "description": req.description
+        }
+    )
+
+
+def parse_cursor(value):
+    """
+    "user_5:12,mechanics:40" -> {"user_5": 12, "mechanics": 40}. Криві пари пропускаємо.
+    """
+    cursor = {}
+    for part in (value or '').split(','):
+        stream, _, seq = part.rpartition(':')
+        if stream and seq.isdigit():
+            cursor[stream] = int(seq)
+    return cursor
+
+
+def get_missed_events(cursor):
+    """
+    Повертає (події, truncated) після курсора {stream: seq}.
+    truncated=True означає, що розрив більший за REPLAY_LIMIT.
+    """
+    if not cursor:
+        return [], False
+    cutoff = timezone.now() - OUTBOX_MAX_AGE
+    after = Q()
+    for stream, seq in cursor.items():
+        after |= Q(stream=stream, seq__gt=seq)
+    events = list(
+        NotificationEvent.objects
+        .filter(after, created_at__gte=cutoff)
+        .order_by('created_at', 'seq')
+        .values('stream', 'seq', 'handler', 'message', 'data')[:REPLAY_LIMIT + 1]
+    )
+    return events[:REPLAY_LIMIT], len(events) > REPLAY_LIMIT
+
+
+def prune_events():
+    """
+    Чистить журнал: старші за OUTBOX_MAX_AGE і понад OUTBOX_MAX_PER_STREAM
+    останніх подій у кожному stream. Повертає кількість видалених рядків.
+    """
+    cutoff = timezone.now() - OUTBOX_MAX_AGE
+    deleted, _ = NotificationEvent.objects.filter(created_at__lt=cutoff).delete()
+
+    overflowing = (
+        NotificationEvent.objects.values('stream')
+        .annotate(total=Count('id'))
+        .filter(total__gt=OUTBOX_MAX_PER_STREAM)
+        .values_list('stream', flat=True)
+    )
+    for stream in overflowing:
+        boundary = list(
+            NotificationEvent.objects.filter(stream=stream)
+            .order_by('-seq')
+            .values_list('seq', flat=True)[OUTBOX_MAX_PER_STREAM:OUTBOX_MAX_PER_STREAM + 1]
+        )
+        if boundary:
+            count, _ = NotificationEvent.objects.filter(stream=stream, seq__lte=boundary[0]).delete()
+            deleted += count
+
+    return deleted
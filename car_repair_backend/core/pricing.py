@@ -0,0 +1,172 @@
+# car_repair_backend/core/pricing.py
+"""
+Оцінка ціни: медіана і перцентилі цін оферів для категорії в районі клієнта.
+
+На кожну пару (категорія, клітинка сітки CELL_DEG) зберігається t-digest -
+стислий "скетч" розподілу цін. Скетчі можна зливати, тому запит бере кілька
+клітинок навколо клієнта і всі категорії піддерева, зливає їх і читає
+перцентилі - без жодного сканування оферів. Новий офер додається в свій
+скетч одразу (сигнал), а rebuild_price_sketches перебудовує все з нуля.
+"""
+
+import math
+from collections import defaultdict
+from django.db import transaction
+from .categories import category_subtree_ids
+from .models import Offer, ArchivedOffer, PriceSketch
+
+CELL_DEG = 0.25             # ~25 км: розмір клітинки для скетчів
+AREA_CELLS = 1              # скільки клітинок навколо клієнта беремо (1 -> 3x3)
+MIN_SAMPLES = 5             # менше - оцінка ненадійна, розширюємо до всієї країни
+COMPRESSION = 100
+QUANTILES = {'p10': 0.1, 'p25': 0.25, 'p50': 0.5, 'p75': 0.75, 'p90': 0.9}
+
+
+class TDigest:
+    """
+    Merging t-digest: відсортовані центроїди [середнє, вага]. Біля медіани
+    центроїди великі, на хвостах - маленькі, тож крайні перцентилі точні.
+    """
+
+    def __init__(self, centroids=None, compression=COMPRESSION):
+        self.compression = compression
+        self.centroids = [list(c) for c in centroids or []]
+        self.buffer = []
+
+    @property
+    def count(self):
+        return sum(w for _, w in self.centroids) + sum(w for _, w in self.buffer)
+
+    def add(self, value, weight=1):
+        self.buffer.append([float(value), weight])
+        if len(self.buffer) > self.compression * 5:
+            self.compress()
+
+    def merge(self, other):
+        self.buffer.extend(list(c) for c in other.centroids + other.buffer)
+        self.compress()
+
+    def compress(self):
+        points = sorted(self.centroids + self.buffer)
+        self.buffer = []
+        if not points:
+            return
+        total = sum(w for _, w in points)
+        merged = [points[0]]
+        before = 0  # вага всіх центроїдів лівіше за поточний
+        for mean, weight in points[1:]:
+            current = merged[-1]
+            q = (before + current[1] + weight / 2) / total
+            limit = 4 * total * q * (1 - q) / self.compression
+            if current[1] + weight <= max(limit, 1):
+                current[0] += (mean - current[0]) * weight / (current[1] + weight)
+                current[1] += weight
+            else:
+                before += current[1]
+                merged.append([mean, weight])
+        self.centroids = merged
+
+    def quantile(self, q):
+        if self.buffer:
+            self.compress()
+        centroids = self.centroids
+        if not centroids:
+            return None
+        target = q * sum(w for _, w in centroids)
+        cumulative = 0
+        for i, (mean, weight) in enumerate(centroids):
+            mid = cumulative + weight / 2
+            if target < mid:
+                if i == 0:
+                    return mean
+                prev_mean, prev_weight = centroids[i - 1]
+                prev_mid = cumulative - prev_weight / 2
+                return prev_mean + (mean - prev_mean) * (target - prev_mid) / (mid - prev_mid)
+            cumulative += weight
+        return centroids[-1][0]
+
+    def to_list(self):
+        self.compress()
+        return self.centroids
+
+
+# --- СІТКА ---
+
+def cell_key(lat, lng):
+    return f"{math.floor(lat / CELL_DEG)}:{math.floor(lng / CELL_DEG)}"
+
+
+def area_cells(lat, lng):
+    row, col = math.floor(lat / CELL_DEG), math.floor(lng / CELL_DEG)
+    return [
+        f"{r}:{c}"
+        for r in range(row - AREA_CELLS, row + AREA_CELLS + 1)
+        for c in range(col - AREA_CELLS, col + AREA_CELLS + 1)
+    ]
+
+
+# --- ОНОВЛЕННЯ ---
+
+def record_price(category_id, location, price):
+    """
+    Додає ціну нового офера в скетч його (категорії, клітинки).
+    """
+    if not category_id or location is None:
+        return
+    with transaction.atomic():
+        sketch, _ = PriceSketch.objects.select_for_update().get_or_create(
+            category_id=category_id, cell=cell_key(location.y, location.x),
+        )
+        digest = TDigest(sketch.centroids)
+        digest.add(price)
+        sketch.centroids = digest.to_list()
+        sketch.count += 1
+        sketch.save(update_fields=['centroids', 'count', 'updated_at'])
+
+
+@transaction.atomic
+def rebuild():
+    """
+    Перебудовує всі скетчі з Offer + ArchivedOffer. Повертає кількість скетчів.
+    """
+    digests = defaultdict(TDigest)
+    counts = defaultdict(int)
+    for model in (Offer, ArchivedOffer):
+        rows = model.objects.filter(request__category__isnull=False)\
+            .values_list('price', 'request__category_id', 'request__location')
+        for price, category_id, location in rows.iterator(chunk_size=5000):
+            key = (category_id, cell_key(location.y, location.x))
+            digests[key].add(price)
+            counts[key] += 1
+
+    PriceSketch.objects.all().delete()
+    PriceSketch.objects.bulk_create([
+        PriceSketch(category_id=category_id, cell=cell, count=counts[category_id, cell], centroids=digest.to_list())
+        for (category_id, cell), digest in digests.items()
+    ], batch_size=1000)
+    return len(digests)
+
+
+# --- ОЦІНКА ---
+
+def estimate(category_id, lat, lng):
+    """
+    {'count', 'scope', 'p10'...'p90'} або None, якщо даних немає зовсім.
+    scope='area' - по району клієнта, 'all' - район замалий, взяли всю країну.
+    """
+    categories = category_subtree_ids(category_id)
+    sketches = PriceSketch.objects.filter(category_id__in=categories)
+
+    for scope, queryset in (('area', sketches.filter(cell__in=area_cells(lat, lng))), ('all', sketches)):
+        digest = TDigest()
+        count = 0
+        for centroids, sketch_count in queryset.values_list('centroids', 'count'):
+            digest.merge(TDigest(centroids))
+            count += sketch_count
+        if count >= MIN_SAMPLES or (scope == 'all' and count):
+            return {
+                "count": count,
+                "scope": scope,
+                **{name: round(digest.quantile(q), 2) for name, q in QUANTILES.items()},
+            }
+    return None
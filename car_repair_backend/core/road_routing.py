@@ -0,0 +1,270 @@
+# car_repair_backend/core/road_routing.py
+"""
+Час у дорозі по дорожньому графу замість відстані по прямій.
+
+Граф - локальне вивантаження (напр. з OSM) у каталозі ROAD_GRAPH_PATH:
+- nodes.csv: id, lat, lng;
+- edges.csv: source, target, length_m, speed_kmh, oneway.
+Завантажується один раз на процес у CSR-масиви (offsets / heads / ваги)
+оберненого графа: для вузла v - всі ребра u -> v. Так один Дейкстра від
+точки заявки рахує час від кожної СТО до неї ("many-to-one") і зупиняється,
+щойно всі СТО знайдені.
+
+Пари (вузол СТО, вузол заявки) кешуються в LRU: СТО стоять на місці, а заявки
+з того самого району прив'язуються до того самого вузла графа.
+Без графа модуль повертає None - API лишається на haversine.
+"""
+
+import csv
+import heapq
+import math
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from django.conf import settings
+from . import metrics
+
+ROAD_GRAPH_PATH = getattr(settings, 'ROAD_GRAPH_PATH', None)
+CELL_DEG = 0.01            # ~1 км: сітка для прив'язки точки до вузла графа
+MAX_SNAP_KM = 2            # далі від доріг - точка поза графом, маршрут не рахуємо
+MAX_TRIP_SECONDS = 3 * 3600
+ACCESS_SPEED_KMH = 20      # швидкість на відрізку від точки до найближчого вузла
+DEFAULT_SPEED_KMH = 40
+CACHE_SIZE = getattr(settings, 'ROUTE_CACHE_SIZE', 200000)
+
+KM_PER_DEG = 111.32
+
+
+class RoadGraph:
+    def __init__(self, nodes, edges):
+        ids = {}
+        self.lats, self.lngs = array('d'), array('d')
+        for row in nodes:
+            try:
+                lat, lng = float(row['lat']), float(row['lng'])
+            except (KeyError, TypeError, ValueError):
+                continue
+            ids[row['id']] = len(self.lats)
+            self.lats.append(lat)
+            self.lngs.append(lng)
+
+        # Ребра спершу в плоскі масиви (обернені: хвіст - куди їдемо, голова - звідки)
+        tails, heads, seconds, meters = array('l'), array('l'), array('f'), array('f')
+        for row in edges:
+            try:
+                u, v = ids[row['source']], ids[row['target']]
+                length = float(row['length_m'])
+                speed = float(row.get('speed_kmh') or DEFAULT_SPEED_KMH) or DEFAULT_SPEED_KMH
+            except (KeyError, TypeError, ValueError):
+                continue
+            duration = length / (speed / 3.6)
+            pairs = ((u, v),) if (row.get('oneway') or '').lower() in ('1', 'true', 'yes') else ((u, v), (v, u))
+            for source, target in pairs:
+                tails.append(target)
+                heads.append(source)
+                seconds.append(duration)
+                meters.append(length)
+
+        # Сортування підрахунком у CSR: ребра вузла v - heads[offsets[v]:offsets[v + 1]]
+        count = len(self.lats)
+        self.offsets = array('l', [0]) * (count + 1)
+        for tail in tails:
+            self.offsets[tail + 1] += 1
+        for i in range(count):
+            self.offsets[i + 1] += self.offsets[i]
+        position = array('l', self.offsets[:count])
+        self.heads = array('l', [0]) * len(tails)
+        self.seconds = array('f', [0]) * len(tails)
+        self.meters = array('f', [0]) * len(tails)
+        for i, tail in enumerate(tails):
+            slot = position[tail]
+            position[tail] += 1
+            self.heads[slot], self.seconds[slot], self.meters[slot] = heads[i], seconds[i], meters[i]
+
+        grid = {}
+        for idx in range(count):
+            grid.setdefault(self._cell(self.lats[idx], self.lngs[idx]), array('l')).append(idx)
+        self.grid = grid
+
+    def __len__(self):
+        return len(self.lats)
+
+    @property
+    def edge_count(self):
+        return len(self.heads)
+
+    @staticmethod
+    def _cell(lat, lng):
+        return math.floor(lat / CELL_DEG), math.floor(lng / CELL_DEG)
+
+    def nearest(self, lat, lng):
+        """
+        (вузол, відстань у км) найближчого вузла в межах MAX_SNAP_KM або None.
+        Кільце ring не ближче за (ring - 1) * CELL_DEG * cos(lat) (клітинка вужча
+        по довготі) - зупиняємось, коли це далі за знайдене або за MAX_SNAP_KM.
+        """
+        row, col = self._cell(lat, lng)
+        scale = math.cos(math.radians(lat))
+        limit_d2 = (MAX_SNAP_KM / KM_PER_DEG) ** 2
+        best, best_d2 = None, None
+        ring = 0
+        while True:
+            bound = ((ring - 1) * CELL_DEG * scale) ** 2 if ring else 0.0
+            if bound > limit_d2 or (best is not None and bound > best_d2):
+                break
+            for r in range(row - ring, row + ring + 1):
+                for c in range(col - ring, col + ring + 1):
+                    if max(abs(r - row), abs(c - col)) != ring:
+                        continue
+                    for idx in self.grid.get((r, c), ()):
+                        dy = self.lats[idx] - lat
+                        dx = (self.lngs[idx] - lng) * scale
+                        d2 = dx * dx + dy * dy
+                        if best_d2 is None or d2 < best_d2:
+                            best, best_d2 = idx, d2
+            ring += 1
+        if best is None:
+            return None
+        distance = math.sqrt(best_d2) * KM_PER_DEG
+        return (best, distance) if distance <= MAX_SNAP_KM else None
+
+    def many_to_one(self, target, sources, max_seconds=MAX_TRIP_SECONDS):
+        """
+        {вузол-джерело: (секунди, метри)} до target одним Дейкстрою по оберненому графу.
+        Зупиняється, коли знайдені всі джерела або фронт пішов далі за max_seconds.
+        """
+        remaining = set(sources)
+        found = {}
+        best = {target: 0.0}
+        lengths = {target: 0.0}
+        heap = [(0.0, target)]
+        offsets, heads, seconds, meters = self.offsets, self.heads, self.seconds, self.meters
+        while heap and remaining:
+            time_here, node = heapq.heappop(heap)
+            if time_here > best[node]:
+                continue
+            if time_here > max_seconds:
+                break
+            if node in remaining:
+                remaining.discard(node)
+                found[node] = (time_here, lengths[node])
+            length_here = lengths[node]
+            for i in range(offsets[node], offsets[node + 1]):
+                neighbour = heads[i]
+                candidate = time_here + seconds[i]
+                if candidate < best.get(neighbour, math.inf):
+                    best[neighbour] = candidate
+                    lengths[neighbour] = length_here + meters[i]
+                    heapq.heappush(heap, (candidate, neighbour))
+        return found
+
+
+class RouteCache:
+    """
+    LRU пар (вузол СТО, вузол заявки) -> (секунди, метри) або None (недосяжно).
+    """
+
+    MISSING = object()
+
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key, self.MISSING)
+            if value is self.MISSING:
+                self.misses += 1
+            else:
+                self.entries.move_to_end(key)
+                self.hits += 1
+            return value
+
+    def set_many(self, items):
+        with self.lock:
+            for key, value in items:
+                self.entries[key] = value
+                self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def snapshot(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+                "entries": len(self.entries),
+                "max_entries": self.size,
+            }
+
+
+route_cache = metrics.register('route_cache', RouteCache(CACHE_SIZE))
+
+_graph = None
+_graph_lock = threading.Lock()
+
+
+def get_graph():
+    global _graph
+    with _graph_lock:
+        if _graph is None:
+            try:
+                with open(os.path.join(ROAD_GRAPH_PATH, 'nodes.csv'), encoding='utf-8-sig', newline='') as nodes, \
+                        open(os.path.join(ROAD_GRAPH_PATH, 'edges.csv'), encoding='utf-8-sig', newline='') as edges:
+                    _graph = RoadGraph(csv.DictReader(nodes), csv.DictReader(edges))
+            except (FileNotFoundError, TypeError):
+                # Без графа маршрути не рахуються - API лишається на відстані по прямій
+                _graph = RoadGraph([], [])
+        return _graph
+
+
+# --- ЗАГАЛЬНИЙ ВХІД ---
+
+def travel_to(target, origins):
+    """
+    Маршрути від кожної з origins до target одним викликом.
+    target і origins - (lat, lng); на виході для кожної origin
+    {"distance_km", "minutes"} або None (графа немає, точка поза графом, недосяжно).
+    """
+    graph = get_graph()
+    if not len(graph):
+        return [None] * len(origins)
+    snapped_target = graph.nearest(*target)
+    if snapped_target is None:
+        return [None] * len(origins)
+    target_node, target_access = snapped_target
+
+    snapped = [graph.nearest(*origin) if origin else None for origin in origins]
+    routes = {}
+    missing = set()
+    for item in snapped:
+        if item is None or item[0] in routes:
+            continue
+        cached = route_cache.get((item[0], target_node))
+        if cached is RouteCache.MISSING:
+            missing.add(item[0])
+        else:
+            routes[item[0]] = cached
+    if missing:
+        found = graph.many_to_one(target_node, missing)
+        computed = [(node, found.get(node)) for node in missing]
+        routes.update(computed)
+        route_cache.set_many(((node, target_node), route) for node, route in computed)
+
+    result = []
+    for item in snapped:
+        route = routes.get(item[0]) if item else None
+        if route is None:
+            result.append(None)
+            continue
+        seconds, meters = route
+        # Відрізки від СТО/заявки до найближчих вузлів графа
+        access_km = item[1] + target_access
+        seconds += access_km / ACCESS_SPEED_KMH * 3600
+        result.append({"distance_km": meters / 1000 + access_km, "minutes": seconds / 60})
+    return result
@@ -0,0 +1,131 @@
+# car_repair_backend/core/rollups.py
+"""
+Аналітика майстрів: лічильники в MechanicStats (весь час) і MechanicDailyStats (по днях).
+
+Оновлюються інкрементно, в тій самій транзакції, що й подія (офер, прийняття,
+завершення, відгук): UPDATE ... SET x = x + delta, а якщо рядка ще немає - INSERT.
+Всі офер-метрики прив'язані до дня створення офера, тому перебудова з нуля
+(rebuild) дає ті самі числа, що й інкрементні оновлення.
+"""
+
+from collections import defaultdict
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import Offer, ArchivedOffer, Review, MechanicStats, MechanicDailyStats
+
+COUNTERS = (
+    'offers_sent', 'offers_accepted', 'jobs_done', 'revenue',
+    'reviews_count', 'rating_sum', 'response_seconds_sum',
+)
+
+
+def _apply(model, lookup, deltas, **extra):
+    updates = {name: F(name) + value for name, value in deltas.items()}
+    if model.objects.filter(**lookup).update(**updates, **extra):
+        return
+    try:
+        # savepoint - щоб конфлікт з паралельним INSERT не зламав зовнішню транзакцію
+        with transaction.atomic():
+            model.objects.create(**lookup, **deltas)
+    except IntegrityError:
+        model.objects.filter(**lookup).update(**updates, **extra)
+
+
+def bump(mechanic_id, when, **deltas):
+    """
+    Додає deltas до підсумків майстра і до його дня (when - datetime події).
+    """
+    deltas = {name: value for name, value in deltas.items() if value}
+    if not deltas:
+        return
+    # update() не чіпає auto_now
+    _apply(MechanicStats, {'mechanic_id': mechanic_id}, deltas, updated_at=timezone.now())
+    _apply(MechanicDailyStats, {'mechanic_id': mechanic_id, 'day': timezone.localdate(when)}, deltas)
+
+
+# --- ПОДІЇ ---
+
+def offer_created(offer, request_created_at):
+    bump(
+        offer.mechanic_id, offer.created_at,
+        offers_sent=1,
+        response_seconds_sum=max(int((offer.created_at - request_created_at).total_seconds()), 0),
+    )
+
+
+def offer_accepted(offer):
+    bump(offer.mechanic_id, offer.created_at, offers_accepted=1, revenue=offer.price)
+
+
+def offer_unaccepted(offer):
+    # Прийняття скасоване (accept_offer прибрав "старе" подвійне прийняття)
+    bump(offer.mechanic_id, offer.created_at, offers_accepted=-1, revenue=-offer.price)
+
+
+def job_done(request_id):
+    offer = Offer.objects.filter(request_id=request_id, is_accepted=True)\
+        .values('mechanic_id', 'created_at').first()
+    if offer:
+        bump(offer['mechanic_id'], offer['created_at'], jobs_done=1)
+
+
+def review_created(review):
+    bump(review.mechanic_id, review.created_at, reviews_count=1, rating_sum=review.rating)
+
+
+# --- ПЕРЕБУДОВА ---
+
+@transaction.atomic
+def rebuild(mechanic_ids=None):
+    """
+    Перераховує все з Offer/ArchivedOffer/Review кількома GROUP BY.
+    Повертає кількість денних рядків.
+    """
+    daily = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+
+    def scoped(queryset):
+        return queryset.filter(mechanic_id__in=mechanic_ids) if mechanic_ids else queryset
+
+    response_time = ExpressionWrapper(F('created_at') - F('request__created_at'), output_field=DurationField())
+    accepted = Q(is_accepted=True)
+    for model in (Offer, ArchivedOffer):
+        rows = scoped(model.objects.all()).annotate(day=TruncDate('created_at')).values('mechanic_id', 'day').annotate(
+            sent=Count('id'),
+            accepted=Count('id', filter=accepted),
+            done=Count('id', filter=accepted & Q(request__status='done')),
+            revenue_sum=Sum('price', filter=accepted),
+            response=Sum(response_time),
+        ).order_by()
+        for row in rows:
+            day = daily[row['mechanic_id'], row['day']]
+            day['offers_sent'] += row['sent']
+            day['offers_accepted'] += row['accepted']
+            day['jobs_done'] += row['done']
+            day['revenue'] += row['revenue_sum'] or 0
+            day['response_seconds_sum'] += max(int(row['response'].total_seconds()), 0) if row['response'] else 0
+
+    rows = scoped(Review.objects.all()).annotate(day=TruncDate('created_at')).values('mechanic_id', 'day').annotate(
+        count=Count('id'), ratings=Sum('rating'),
+    ).order_by()
+    for row in rows:
+        day = daily[row['mechanic_id'], row['day']]
+        day['reviews_count'] += row['count']
+        day['rating_sum'] += row['ratings'] or 0
+
+    totals = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    for (mechanic_id, _), counters in daily.items():
+        for name, value in counters.items():
+            totals[mechanic_id][name] += value
+
+    scoped(MechanicDailyStats.objects.all()).delete()
+    scoped(MechanicStats.objects.all()).delete()
+    MechanicDailyStats.objects.bulk_create([
+        MechanicDailyStats(mechanic_id=mechanic_id, day=day, **counters)
+        for (mechanic_id, day), counters in daily.items()
+    ], batch_size=1000)
+    MechanicStats.objects.bulk_create([
+        MechanicStats(mechanic_id=mechanic_id, **counters) for mechanic_id, counters in totals.items()
+    ], batch_size=1000)
+    return len(daily)
@@ -3,6 +3,7 @@
 from ninja import Schema
 from typing import List, Optional
 from datetime import datetime
+from core.geocoding import reverse_geocode
 
 # Вкажи тут адресу свого бекенду
 BACKEND_URL = "http://127.0.0.1:8000"
@@ -32,6 +33,9 @@ class AttachmentOutSchema(Schema):
 class CarIn(Schema):
     license_plate: str
     brand_model: str
+    # З автодоповнення /car-catalog; якщо не передали - зіставимо brand_model з каталогом
+    vehicle_model_id: Optional[int] = None
+    vehicle_generation_id: Optional[int] = None
     year: Optional[int] = None
     vin: Optional[str] = None
     color: Optional[str] = None
@@ -45,6 +49,8 @@ class CarOut(Schema):
     id: int
     license_plate: str
     brand_model: str
+    vehicle_model_id: Optional[int] = None
+    vehicle_generation_id: Optional[int] = None
     year: Optional[int] = None
     vin: Optional[str] = None
     color: Optional[str] = None
@@ -54,16 +60,27 @@ class CarOut(Schema):
     engine_volume: Optional[str] = None
     weight: Optional[str] = None
 
+class VehicleSuggestionSchema(Schema):
+    kind: str  # make | model
+    id: int
+    make_id: int
+    make: str
+    model: Optional[str] = None
+    label: str
+
 # --- СТО (STATIONS) ---
 
 class StationIn(Schema):
     name: str
     address: str
     phone: str
-    lat: float
-    lng: float
+    # Якщо координат немає - визначаємо з address локальним геокодером
+    lat: Optional[float] = None
+    lng: Optional[float] = None
     description: str = ""
     services_list: str = ""
+    # Якщо не передали - визначаємо з services_list
+    category_ids: Optional[List[int]] = None
 
 class ReviewItemSchema(Schema):
     id: int
@@ -85,6 +102,7 @@ class StationOutSchema(Schema):
     name: str
     description: str
     services_list: Optional[str] = None
+    category_ids: List[int] = []
     rating: float
     
     address: str
@@ -95,6 +113,11 @@ class StationOutSchema(Schema):
     
     reviews: List[ReviewItemSchema] = []
 
+    @staticmethod
+    def resolve_category_ids(obj):
+        # Працює з prefetch_related('categories') без зайвих запитів
+        return [cat.id for cat in obj.categories.all()]
+
     @staticmethod
     def resolve_location(obj):
         if obj.location:
@@ -118,15 +141,28 @@ class RequestOutSchema(Schema):
     car_model: str
     description: str
     status: str
+    is_sos: bool = False
     created_at: datetime
     location: dict
     has_review: bool = False
     car_id: Optional[int] = None
+    # Найближчий населений пункт / вулиця замість голих координат
+    place: Optional[str] = None
     
     attachments: List[AttachmentOutSchema] = []
 
+    @staticmethod
+    def resolve_place(obj):
+        if obj.location:
+            found = reverse_geocode(obj.location.y, obj.location.x)
+            return found["label"] if found else None
+        return None
+
     @staticmethod
     def resolve_has_review(obj):
+        # Списки анотують review_exists (EXISTS у тому ж запиті) - без запиту на кожен рядок
+        if hasattr(obj, 'review_exists'):
+            return obj.review_exists
         return hasattr(obj, 'review')
 
     @staticmethod
@@ -135,6 +171,18 @@ class RequestOutSchema(Schema):
             return {"x": obj.location.x, "y": obj.location.y}
         return None
 
+class RequestSearchResultSchema(RequestOutSchema):
+    # Фрагмент опису з підсвіченими збігами (<mark>...</mark>)
+    snippet: Optional[str] = None
+
+class RequestFeedDeltaSchema(Schema):
+    # Курсор передається назад як since при наступному оновленні
+    cursor: datetime
+    # Нові/змінені відкриті заявки (клієнт робить upsert по id)
+    upserted: List[RequestOutSchema] = []
+    # Заявки, які закрили/прийняли/скасували - прибрати зі стрічки
+    removed: List[int] = []
+
 # --- ПРОПОЗИЦІЇ (OFFERS) ---
 
 class OfferCreateSchema(Schema):
@@ -152,6 +200,8 @@ class OfferOutSchema(Schema):
     
     station_address: Optional[str] = None
     distance_km: Optional[float] = None
+    # Час у дорозі по дорожньому графу; None - графа немає, distance_km тоді по прямій
+    travel_minutes: Optional[float] = None
     station_lat: Optional[float] = None
     station_lng: Optional[float] = None
 
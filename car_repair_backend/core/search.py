@@ -0,0 +1,309 @@
+# car_repair_backend/core/search.py
+
+import re
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.db.models.functions import Greatest
+from django.utils.html import escape
+from .models import IndexVersion, ServiceStation, Request
+
+# Словник 'simple': без стемінгу, зате однаково працює для укр/рос/лат
+SEARCH_CONFIG = 'simple'
+# Поріг схожості для нечіткого (триграмного) збігу
+TRIGRAM_THRESHOLD = 0.3
+# Як часто індекс у пам'яті звіряє свою версію з БД (IndexVersion)
+VERSION_CHECK_SECONDS = 5
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def is_postgres():
+    return connection.vendor == 'postgresql'
+
+
+def tokenize(text):
+    return TOKEN_RE.findall((text or '').lower())
+
+
+def trigrams(word):
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+# --- POSTGRESQL ---
+
+def station_search_vector():
+    from django.contrib.postgres.search import SearchVector
+    return (
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('services_list', weight='B', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def update_station_search_vector(station_id):
+    """
+    Оновлює search_vector після збереження СТО (тільки PostgreSQL).
+    """
+    if is_postgres():
+        ServiceStation.objects.filter(id=station_id).update(search_vector=station_search_vector())
+
+
+def _search_postgres(queryset, q):
+    from django.contrib.postgres.search import (
+        SearchQuery, SearchRank, TrigramSimilarity, TrigramWordSimilarity
+    )
+    query = SearchQuery(q, config=SEARCH_CONFIG, search_type='websearch')
+    # Фільтр - операторами @@, % і <% (їх обслуговують GIN-індекси з 0010),
+    # similarity рахуємо вже тільки для знайдених рядків - для сортування
+    return queryset.filter(
+        Q(search_vector=query) | Q(name__trigram_similar=q) | Q(services_list__trigram_word_similar=q)
+    ).annotate(
+        rank=SearchRank(F('search_vector'), query),
+        similarity=Greatest(
+            TrigramSimilarity('name', q),
+            TrigramWordSimilarity(q, 'services_list'),
+        ),
+    ).order_by('-rank', '-similarity')
+
+
+def set_trigram_thresholds(connection):
+    """
+    Оператори % і <% беруть поріг не з запиту, а з налаштувань pg_trgm
+    (за замовчуванням 0.3 і 0.6) - виставляємо обидва в TRIGRAM_THRESHOLD.
+    """
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT set_config('pg_trgm.similarity_threshold', %s, false),"
+            " set_config('pg_trgm.word_similarity_threshold', %s, false)",
+            [str(TRIGRAM_THRESHOLD), str(TRIGRAM_THRESHOLD)],
+        )
+
+
+# --- SQLITE: ІНВЕРТОВАНИЙ ІНДЕКС В ПАМ'ЯТІ ---
+
+class InvertedIndex:
+    """
+    Токен -> {id: вага}. Словник токенів відсортований, тому префіксний
+    пошук - це bisect, а для опечаток є триграмний збіг по словнику.
+    """
+
+    FIELD_WEIGHTS = (('name', 1.0), ('services_list', 0.6), ('description', 0.2))
+
+    def __init__(self, rows):
+        self.postings = defaultdict(dict)
+        for row in rows:
+            for field, weight in self.FIELD_WEIGHTS:
+                for token in tokenize(row[field]):
+                    posting = self.postings[token]
+                    posting[row['id']] = max(posting.get(row['id'], 0), weight)
+        self.vocabulary = sorted(self.postings)
+        self.vocabulary_trigrams = {token: trigrams(token) for token in self.vocabulary}
+
+    def _expand(self, term):
+        """
+        Токени словника, які відповідають терміну: префікс або нечіткий збіг.
+        """
+        start = bisect_left(self.vocabulary, term)
+        matches = {}
+        for token in self.vocabulary[start:]:
+            if not token.startswith(term):
+                break
+            matches[token] = 1.0
+        if matches:
+            return matches
+
+        term_trigrams = trigrams(term)
+        for token, token_trigrams in self.vocabulary_trigrams.items():
+            similarity = len(term_trigrams & token_trigrams) / len(term_trigrams | token_trigrams)
+            if similarity > TRIGRAM_THRESHOLD:
+                matches[token] = similarity
+        return matches
+
+    def search(self, q):
+        """
+        Повертає {id: скор}. Всі терміни запиту мають знайтись (AND).
+        """
+        scores = None
+        for term in tokenize(q):
+            term_scores = defaultdict(float)
+            for token, similarity in self._expand(term).items():
+                for station_id, weight in self.postings[token].items():
+                    term_scores[station_id] = max(term_scores[station_id], weight * similarity)
+            if scores is None:
+                scores = dict(term_scores)
+            else:
+                scores = {sid: s + term_scores[sid] for sid, s in scores.items() if sid in term_scores}
+        return scores or {}
+
+
+class VersionedIndex:
+    """
+    Індекс у пам'яті процесу, версія якого лежить у БД (IndexVersion).
+    Зміна даних (в будь-якому процесі: адмінка, management-команда) бампить
+    версію в тій самій транзакції, і кожен процес перебудує свій індекс при
+    наступному зверненні. Версію звіряємо не частіше ніж раз на
+    VERSION_CHECK_SECONDS, тож запит до індексу зазвичай не ходить в БД.
+    """
+
+    def __init__(self, name, build):
+        self.name = name
+        self.build = build
+        self.index = None
+        self.version = None
+        self.checked_at = 0.0
+        self.lock = threading.Lock()
+
+    def _current_version(self):
+        version = IndexVersion.objects.filter(name=self.name).values_list('version', flat=True).first()
+        return version or 0
+
+    def get(self):
+        now = time.monotonic()
+        with self.lock:
+            if self.index is None or now - self.checked_at > VERSION_CHECK_SECONDS:
+                version = self._current_version()
+                self.checked_at = now
+                if self.index is None or version != self.version:
+                    self.index = self.build()
+                    self.version = version
+            return self.index
+
+    def _bump(self):
+        return IndexVersion.objects.filter(name=self.name).update(version=F('version') + 1)
+
+    def invalidate(self):
+        if not self._bump():
+            _, created = IndexVersion.objects.get_or_create(name=self.name, defaults={'version': 1})
+            if not created:
+                self._bump()
+
+        def expire():
+            # Свій процес звіряє версію одразу, не чекаючи VERSION_CHECK_SECONDS
+            with self.lock:
+                self.checked_at = 0.0
+        transaction.on_commit(expire)
+
+
+station_index = VersionedIndex(
+    'stations', lambda: InvertedIndex(ServiceStation.objects.values('id', 'name', 'services_list', 'description')),
+)
+
+
+def invalidate_station_index():
+    # На PostgreSQL індекс у пам'яті не використовується - нема чого бампити
+    if not is_postgres():
+        station_index.invalidate()
+
+
+def get_station_index():
+    return station_index.get()
+
+
+# --- ЗАЯВКИ ---
+
+HIGHLIGHT_START, HIGHLIGHT_STOP = '<mark>', '</mark>'
+# SearchHeadline не екранує текст, тому Postgres ставить керуючі символи-маркери,
+# а <mark> підставляє escape_headline вже після escape()
+HEADLINE_START, HEADLINE_STOP = '\x02', '\x03'
+SNIPPET_WORDS = 20
+
+
+def request_search_vector():
+    from django.contrib.postgres.search import SearchVector
+    return (
+        SearchVector('car_model', weight='A', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='B', config=SEARCH_CONFIG)
+    )
+
+
+def update_request_search_vector(request_id):
+    if is_postgres():
+        Request.objects.filter(id=request_id).update(search_vector=request_search_vector())
+
+
+def _request_search_postgres(queryset, q):
+    from django.contrib.postgres.search import (
+        SearchQuery, SearchRank, SearchHeadline, TrigramWordSimilarity
+    )
+    query = SearchQuery(q, config=SEARCH_CONFIG, search_type='websearch')
+    return queryset.filter(
+        Q(search_vector=query) | Q(car_model__trigram_word_similar=q)
+    ).annotate(
+        rank=SearchRank(F('search_vector'), query),
+        similarity=TrigramWordSimilarity(q, 'car_model'),
+    ).annotate(
+        snippet=SearchHeadline(
+            'description', query, config=SEARCH_CONFIG,
+            start_sel=HEADLINE_START, stop_sel=HEADLINE_STOP,
+            max_words=SNIPPET_WORDS, min_words=SNIPPET_WORDS // 2,
+        ),
+    ).order_by('-rank', '-similarity', '-created_at')
+
+
+def escape_headline(headline):
+    """
+    Сирий SearchHeadline -> безпечний HTML того ж формату, що й make_snippet.
+    """
+    if not headline:
+        return headline
+    return (
+        escape(headline)
+        .replace(HEADLINE_START, HIGHLIGHT_START)
+        .replace(HEADLINE_STOP, HIGHLIGHT_STOP)
+    )
+
+
+def make_snippet(text, q):
+    """
+    Фолбек для SQLite: шматок тексту навколо першого збігу з <mark>.
+    """
+    words = (text or '').split()
+    terms = tokenize(q)
+    hit = next((i for i, w in enumerate(words) if any(t in w.lower() for t in terms)), 0)
+    start = max(0, hit - SNIPPET_WORDS // 2)
+    result = []
+    for word in words[start:start + SNIPPET_WORDS]:
+        word = escape(word)
+        if any(t in word.lower() for t in terms):
+            word = f"{HIGHLIGHT_START}{word}{HIGHLIGHT_STOP}"
+        result.append(word)
+    return ' '.join(result)
+
+
+def search_requests(queryset, q):
+    """
+    Пошук по заявках. Повертає queryset з анотаціями rank/snippet (PostgreSQL;
+    snippet сирий - пропустити через escape_headline) або queryset з icontains
+    (SQLite; сніпет тоді робить make_snippet).
+    """
+    if is_postgres():
+        return _request_search_postgres(queryset, q)
+
+    condition = Q()
+    for term in tokenize(q):
+        condition &= Q(description__icontains=term) | Q(car_model__icontains=term)
+    return queryset.filter(condition).order_by('-created_at')
+
+
+# --- ЗАГАЛЬНИЙ ВХІД ---
+
+def search_stations(queryset, q, limit=20):
+    """
+    Повнотекстовий + нечіткий пошук по СТО в межах queryset (напр. радіуса).
+    """
+    if is_postgres():
+        return list(_search_postgres(queryset, q)[:limit])
+
+    scores = get_station_index().search(q)
+    if not scores:
+        return []
+    stations = list(queryset.filter(id__in=list(scores)))
+    stations.sort(key=lambda st: scores[st.id], reverse=True)
+    return stations[:limit]
@@ -1,52 +1,45 @@
 # car_repair_backend/core/signals.py
 
-from django.db.models.signals import post_save
+from django.db.backends.signals import connection_created
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
 from django.dispatch import receiver
-from .models import Request, Offer
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from .models import Request, Offer, Review, User, ServiceStation, StationPhoto, Car, VehicleMake, VehicleModel, VehicleGeneration, ServiceCategory
+from .authentication import invalidate_user_auth_cache
+from .notifications import notify, notify_sos, new_request_event
+from . import matching, tiles, geo_cache, rollups, vehicles, categories
+from .search import (
+    update_station_search_vector, update_request_search_vector, invalidate_station_index, set_trigram_thresholds,
+)
 
 @receiver(post_save, sender=Request)
 def request_created_handler(sender, instance, created, **kwargs):
     """
     Сигнал при створенні або оновленні Заявки.
     """
-    channel_layer = get_channel_layer()
-    
-    if created:
-        # 1. СТВОРЕННЯ: Сповіщаємо всіх механіків (група "mechanics")
-        # Безпечно отримуємо координати
-        lat = instance.location.y if instance.location else None
-        lng = instance.location.x if instance.location else None
+    # Пошуковий індекс: тільки якщо міг змінитись текст
+    update_fields = kwargs.get('update_fields')
+    if created or update_fields is None or {'car_model', 'description'} & set(update_fields):
+        update_request_search_vector(instance.id)
 
-        async_to_sync(channel_layer.group_send)(
-            "mechanics",
-            {
-                "type": "send_notification", # Метод, який має бути в Consumer
-                "message": f"Нова заявка: {instance.car_model}",
-                "data": {
-                    "event": "new_request",
-                    "request_id": instance.id,
-                    "is_sos": instance.is_sos, # Беремо з поля моделі
-                    "lat": lat,
-                    "lng": lng,
-                    "description": instance.description
-                }
-            }
-        )
+    if created:
+        # 1. СТВОРЕННЯ: SOS - одразу всім, інакше найкращим СТО хвилями (або всім механікам)
+        if instance.is_sos:
+            notify_sos(instance)
+        elif matching.MATCHING['ENABLED']:
+            matching.start_dispatch(instance)
+        else:
+            message, data = new_request_event(instance)
+            notify("mechanics", message, data)
     else:
         # 2. ОНОВЛЕННЯ: Сповіщаємо водія про зміну статусу (група "user_{id}")
         if instance.client:
-            async_to_sync(channel_layer.group_send)(
+            notify(
                 f"user_{instance.client.id}",
+                f"Статус заявки змінено на: {instance.get_status_display()}", # Гарний текст статусу
                 {
-                    "type": "send_notification",
-                    "message": f"Статус заявки змінено на: {instance.get_status_display()}", # Гарний текст статусу
-                    "data": {
-                        "event": "request_status_update",
-                        "request_id": instance.id,
-                        "status": instance.status
-                    }
+                    "event": "request_status_update",
+                    "request_id": instance.id,
+                    "status": instance.status
                 }
             )
 
@@ -55,8 +48,6 @@ def offer_created_handler(sender, instance, created, **kwargs):
     """
     Сигнал при створенні або прийнятті Офера.
     """
-    channel_layer = get_channel_layer()
-    
     # 🔥 ВИПРАВЛЕННЯ 1: Безпечно отримуємо ім'я СТО через механіка
     mechanic_name = instance.mechanic.username # Дефолтне ім'я
     if hasattr(instance.mechanic, 'station') and instance.mechanic.station:
@@ -65,33 +56,151 @@ def offer_created_handler(sender, instance, created, **kwargs):
     if created:
         # 1. НОВИЙ ОФЕР: Сповіщаємо водія
         if instance.request.client:
-            async_to_sync(channel_layer.group_send)(
+            notify(
                 f"user_{instance.request.client.id}",
+                f"Пропозиція від {mechanic_name}: {instance.price} грн",
                 {
-                    "type": "send_notification",
-                    "message": f"Пропозиція від {mechanic_name}: {instance.price} грн",
-                    "data": {
-                        "event": "new_offer",
-                        "request_id": instance.request.id,
-                        "offer_id": instance.id,
-                        "price": instance.price,
-                        "mechanic_name": mechanic_name
-                    }
+                    "event": "new_offer",
+                    "request_id": instance.request.id,
+                    "offer_id": instance.id,
+                    "price": float(instance.price),
+                    "mechanic_name": mechanic_name
                 }
             )
             
     elif instance.is_accepted:
         # 2. ОФЕР ПРИЙНЯТО: Сповіщаємо майстра
         # 🔥 ВИПРАВЛЕННЯ 2: Шлемо прямо механіку, без station.owner
-        async_to_sync(channel_layer.group_send)(
+        notify(
             f"user_{instance.mechanic.id}", 
+            f"Вашу пропозицію на {instance.request.car_model} прийнято!",
             {
-                "type": "send_notification",
-                "message": f"Вашу пропозицію на {instance.request.car_model} прийнято!",
-                "data": {
-                    "event": "offer_accepted",
-                    "request_id": instance.request.id,
-                    "client_phone": instance.request.client.phone # Передаємо телефон клієнта
-                }
+                "event": "offer_accepted",
+                "request_id": instance.request.id,
+                "client_phone": instance.request.client.phone # Передаємо телефон клієнта
             }
-        )
\ No newline at end of file
+        )
+
+# --- ІНВАЛІДАЦІЯ КЕШУ АВТОРИЗАЦІЇ ---
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_auth_cache_handler(sender, instance, **kwargs):
+    """
+    Будь-яка зміна юзера (деактивація, зміна ролі...) скидає його кеш JWT.
+    """
+    invalidate_user_auth_cache(instance.id)
+
+@receiver(post_save, sender=ServiceStation)
+@receiver(post_delete, sender=ServiceStation)
+def station_auth_cache_handler(sender, instance, created=False, **kwargs):
+    """
+    Поява/видалення СТО змінює station_id у закешованій проєкції власника.
+    """
+    if created or kwargs.get('signal') is post_delete:
+        invalidate_user_auth_cache(instance.owner_id)
+
+# --- ПОШУКОВИЙ ІНДЕКС СТО ---
+
+@receiver(post_save, sender=ServiceStation)
+def station_search_index_handler(sender, instance, **kwargs):
+    update_station_search_vector(instance.id)
+    invalidate_station_index()
+
+@receiver(post_delete, sender=ServiceStation)
+def station_search_index_delete_handler(sender, instance, **kwargs):
+    invalidate_station_index()
+
+@receiver(connection_created)
+def trigram_threshold_handler(sender, connection, **kwargs):
+    # Пороги для триграмних операторів у фільтрах пошуку (тільки PostgreSQL)
+    set_trigram_thresholds(connection)
+
+# --- ТАЙЛИ МАПИ ---
+
+@receiver(post_save, sender=Request)
+@receiver(post_delete, sender=Request)
+def request_tiles_handler(sender, instance, **kwargs):
+    # Нова заявка, зміна статусу чи видалення - змінюється тільки тайл з цією точкою
+    tiles.invalidate_point('requests', instance.location)
+
+@receiver(pre_save, sender=ServiceStation)
+def station_remember_location(sender, instance, **kwargs):
+    # Стара точка потрібна, щоб при переїзді СТО скинути і тайл, з якого вона пішла
+    instance._old_location = None
+    if instance.pk:
+        instance._old_location = sender.objects.filter(pk=instance.pk).values_list('location', flat=True).first()
+
+@receiver(post_save, sender=ServiceStation)
+@receiver(post_delete, sender=ServiceStation)
+def station_tiles_handler(sender, instance, **kwargs):
+    old_location = getattr(instance, '_old_location', None)
+    if old_location is not None and old_location != instance.location:
+        tiles.invalidate_point('stations', old_location)
+        geo_cache.invalidate_location(old_location)
+    tiles.invalidate_point('stations', instance.location)
+    # Будь-яке збереження (рейтинг, назва, переїзд) міняє відповідь /stations/nearby
+    geo_cache.invalidate_location(instance.location)
+
+@receiver(post_save, sender=StationPhoto)
+@receiver(post_delete, sender=StationPhoto)
+def station_photo_cache_handler(sender, instance, **kwargs):
+    # Фото входять у відповідь /stations/nearby
+    location = ServiceStation.objects.filter(id=instance.station_id).values_list('location', flat=True).first()
+    geo_cache.invalidate_location(location)
+
+@receiver(m2m_changed, sender=ServiceStation.categories.through)
+def station_categories_cache_handler(sender, instance, action, **kwargs):
+    # Категорії - і в відповіді (category_ids), і в фільтрі ?category_id
+    if action in ('post_add', 'post_remove', 'post_clear') and isinstance(instance, ServiceStation):
+        geo_cache.invalidate_location(instance.location)
+
+# --- АНАЛІТИКА МАЙСТРІВ ---
+# Створення, прийняття і завершення оферів йдуть через workflow - там і рахуються (разом зі скетчами цін)
+
+@receiver(post_save, sender=Review)
+def review_rollup_handler(sender, instance, created, **kwargs):
+    if created:
+        rollups.review_created(instance)
+
+# --- КАТАЛОГ АВТО ---
+
+@receiver(pre_save, sender=Car)
+def car_vehicle_handler(sender, instance, **kwargs):
+    # Марку/модель з каталогу обрали в UI - тоді тільки покоління за роком
+    if instance.vehicle_model_id is None and instance.brand_model:
+        instance.vehicle_model_id, instance.vehicle_generation_id = vehicles.match_vehicle(instance.brand_model, instance.year)
+    elif instance.vehicle_model_id and instance.vehicle_generation_id is None and instance.year:
+        instance.vehicle_generation_id = vehicles.catalog_index.get().generation(instance.vehicle_model_id, instance.year)
+
+@receiver(pre_save, sender=Request)
+def request_vehicle_handler(sender, instance, update_fields=None, **kwargs):
+    # Матчимо тільки нову заявку або змінений car_model - не на кожне збереження
+    if instance._state.adding:
+        if instance.vehicle_model_id is None and instance.car_model:
+            instance.vehicle_model_id, _ = vehicles.match_vehicle(instance.car_model)
+        return
+    if update_fields is not None and 'car_model' not in update_fields:
+        return
+    old = sender.objects.filter(pk=instance.pk).values_list('car_model', 'vehicle_model_id').first()
+    # Модель з каталогу поміняли разом з текстом - її і лишаємо
+    if old and old[0] != instance.car_model and old[1] == instance.vehicle_model_id:
+        instance.vehicle_model_id, _ = vehicles.match_vehicle(instance.car_model) if instance.car_model else (None, None)
+
+@receiver(post_save, sender=VehicleMake)
+@receiver(post_delete, sender=VehicleMake)
+@receiver(post_save, sender=VehicleModel)
+@receiver(post_delete, sender=VehicleModel)
+@receiver(post_save, sender=VehicleGeneration)
+@receiver(post_delete, sender=VehicleGeneration)
+def vehicle_catalog_index_handler(sender, instance, **kwargs):
+    vehicles.catalog_index.invalidate()
+
+# --- ПОШУК ПО КАТЕГОРІЯХ ---
+
+@receiver(post_save, sender=ServiceCategory)
+@receiver(post_delete, sender=ServiceCategory)
+def category_index_handler(sender, instance, **kwargs):
+    # load_tree_json перезаливає все дерево - версію бампимо на кожен рядок, але
+    # індекс перебудується один раз: при першому запиті після зміни версії
+    categories.category_index.invalidate()
@@ -1,3 +1,1327 @@
-from django.test import TestCase
+import asyncio
+import csv
+import io
+import json
+import math
+import random
+import tempfile
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock, skipUnless
+from urllib.parse import urlencode
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.core.management import call_command
+from django.contrib.auth.models import Permission
+from django.contrib.gis.geos import Point
+from django.db import OperationalError, connection, transaction
+from django.db.utils import ConnectionHandler
+from django.test import AsyncClient, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from ninja.responses import NinjaJSONEncoder
+
+from core import archive, export, geo_cache, importer, matching, road_routing, rollups, search, vehicles, workflow
+from core.api import renderers
+from core.api.reviews import ReviewOutSchema
+from core.pricing import TDigest
+from core.authentication import CachedJWTAuth, cache_ttl
+from core.caching import cache_is_shared
+from core.consumers import NotificationConsumer
+from core.middleware import JWTAuthMiddleware
+from core.routing import websocket_urlpatterns
+from core.geo_cache import ResponseLRU
+from core.geocoding import Gazetteer, load_gazetteer
+from core.categories import (
+    CategoryIndex, category_subtree_ids, parse_services_list, search_categories, station_served_category_ids,
+)
+from core.models import (
+    ArchivedRequest, Car, ClientReview, DispatchNotice, IndexVersion, MechanicDailyStats, MechanicStats,
+    NotificationEvent, Offer, Request, RequestDispatch, Review, ServiceCategory, ServiceStation, User, VehicleGeneration,
+)
+from core.notifications import (
+    REPLAY_LIMIT, get_missed_events, notify, notify_batch, parse_cursor, stream_heads,
+)
+from core.schemas import CarOut, RequestOutSchema
+from core.search import HEADLINE_START, HEADLINE_STOP, VersionedIndex, escape_headline, make_snippet
+
+LOCMEM = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+REDIS = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://localhost:6379'}}
+
+
+class AuthCacheTTLTests(SimpleTestCase):
+    def test_local_cache_keeps_projection_short(self):
+        with override_settings(CACHES=LOCMEM, AUTH_CACHE_LOCAL_TTL=30):
+            self.assertFalse(cache_is_shared())
+            self.assertEqual(cache_ttl({'exp': time.time() + 3600}), 30)
+
+    def test_shared_cache_keeps_projection_for_token_lifetime(self):
+        with override_settings(CACHES=REDIS):
+            self.assertTrue(cache_is_shared())
+            self.assertGreater(cache_ttl({'exp': time.time() + 3600}), 3500)
+
+    def test_expired_token_is_not_cached(self):
+        with override_settings(CACHES=LOCMEM):
+            self.assertLessEqual(cache_ttl({'exp': time.time() - 10}), 0)
+
+
+def auth_header(user):
+    from ninja_jwt.tokens import RefreshToken
+    return {'HTTP_AUTHORIZATION': f'Bearer {RefreshToken.for_user(user).access_token}'}
+
+
+class MapAccessTests(TestCase):
+    url = '/api/map/clusters?bbox=30,50,31,51&zoom=8&layer='
+
+    def setUp(self):
+        self.client_user = User.objects.create_user('client', password='x', role='client')
+        self.mechanic = User.objects.create_user('mechanic', password='x', role='mechanic')
+
+    def test_anonymous_is_rejected(self):
+        self.assertEqual(self.client.get(self.url + 'stations').status_code, 401)
+
+    def test_requests_layer_only_for_mechanics(self):
+        self.assertEqual(self.client.get(self.url + 'requests', **auth_header(self.client_user)).status_code, 403)
+        self.assertEqual(self.client.get(self.url + 'requests', **auth_header(self.mechanic)).status_code, 200)
+        self.assertEqual(self.client.get(self.url + 'stations', **auth_header(self.client_user)).status_code, 200)
+
+
+class SnippetEscapingTests(SimpleTestCase):
+    def test_headline_is_escaped_before_marking(self):
+        raw = f'<script>x</script> {HEADLINE_START}гальма{HEADLINE_STOP} скриплять'
+        self.assertEqual(
+            escape_headline(raw),
+            '&lt;script&gt;x&lt;/script&gt; <mark>гальма</mark> скриплять',
+        )
+
+    def test_both_backends_return_same_format(self):
+        text = '<b>гальма</b> скриплять'
+        self.assertNotIn('<b>', make_snippet(text, 'гальма'))
+        self.assertIn('<mark>', make_snippet(text, 'гальма'))
+
+
+class VersionedIndexTests(TestCase):
+    def test_invalidation_reaches_other_processes(self):
+        builds = []
+        worker_a = VersionedIndex('test_index', lambda: builds.append('a') or len(builds))
+        worker_b = VersionedIndex('test_index', lambda: builds.append('b') or len(builds))
+        worker_a.get()
+        worker_b.get()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            worker_a.invalidate()
+        self.assertEqual(IndexVersion.objects.get(name='test_index').version, 1)
+
+        # Другий "процес" не отримує сигналу - тільки бачить нову версію в БД
+        worker_b.checked_at = 0.0
+        worker_b.get()
+        self.assertEqual(builds, ['a', 'b', 'b'])
+
+
+CATEGORY_ROWS = [
+    {'id': 1, 'name': 'Двигун', 'parent_id': None},
+    {'id': 2, 'name': 'ГРМ', 'parent_id': 1},
+    {'id': 3, 'name': 'Заміна ременя ГРМ', 'parent_id': 2},
+    {'id': 4, 'name': 'Ходова', 'parent_id': None},
+    {'id': 5, 'name': 'Заміна амортизаторів', 'parent_id': 4},
+]
+
+
+class CategoryIndexTests(SimpleTestCase):
+    def setUp(self):
+        self.index = CategoryIndex(CATEGORY_ROWS)
+
+    def test_prefix_matches_with_breadcrumb(self):
+        best = self.index.search('рем')[0]
+        self.assertEqual(best['id'], 3)
+        self.assertEqual(best['breadcrumb'], 'Двигун -> ГРМ -> Заміна ременя ГРМ')
+
+    def test_ancestor_names_narrow_the_search(self):
+        self.assertEqual([r['id'] for r in self.index.search('двигун заміна')], [3])
+
+    def test_phrase_prefix_ranks_first(self):
+        self.assertEqual(self.index.search('заміна а')[0]['id'], 5)
+
+    def test_no_match(self):
+        self.assertEqual(self.index.search('кондиціонер'), [])
+        self.assertEqual(self.index.search(''), [])
+
+
+class CategoryIndexVersionTests(TestCase):
+    def test_category_change_bumps_shared_version(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ServiceCategory.objects.create(name='Двигун')
+        self.assertEqual(IndexVersion.objects.get(name='service_categories').version, 1)
+        self.assertEqual(search_categories('двиг')[0]['name'], 'Двигун')
+
+
+class ResponseLRUTests(SimpleTestCase):
+    def test_entries_expire(self):
+        lru = ResponseLRU(1024)
+        lru.set('fresh', b'a', 60)
+        lru.set('stale', b'b', -1)
+        self.assertEqual(lru.get('fresh'), b'a')
+        self.assertIsNone(lru.get('stale'))
+        self.assertEqual(lru.snapshot()['expired'], 1)
+        self.assertEqual(lru.snapshot()['bytes'], 1)
+
+    def test_evicts_least_recent_by_bytes(self):
+        lru = ResponseLRU(4)
+        lru.set('a', b'aa', 60)
+        lru.set('b', b'bb', 60)
+        lru.get('a')
+        lru.set('c', b'cc', 60)
+        self.assertIsNone(lru.get('b'))
+        self.assertEqual(lru.get('a'), b'aa')
+
+    def test_short_ttl_without_shared_cache(self):
+        with override_settings(CACHES=LOCMEM):
+            self.assertEqual(geo_cache.entry_ttl(), geo_cache.LOCAL_TTL_SECONDS)
+        with override_settings(CACHES=REDIS):
+            self.assertEqual(geo_cache.entry_ttl(), geo_cache.TTL_SECONDS)
+
+
+class NotificationOutboxTests(TestCase):
+    def test_seq_is_per_stream(self):
+        notify('user_1', 'a', {})
+        notify('mechanics', 'b', {})
+        notify('sos', 's', {}, handler='send_sos')
+        notify_batch([('user_1', 'c', {}), ('user_2', 'd', {}), ('user_1', 'e', {})])
+        seqs = list(NotificationEvent.objects.order_by('id').values_list('stream', 'seq'))
+        self.assertEqual(seqs, [('user_1', 1), ('mechanics', 1), ('sos', 1), ('user_1', 2), ('user_2', 1), ('user_1', 3)])
+        self.assertEqual(stream_heads(['user_1', 'user_2', 'other']), {'user_1': 3, 'user_2': 1, 'other': 0})
+        self.assertEqual(get_missed_events({'sos': 0})[0][0]['handler'], 'send_sos')
+
+    def test_replay_after_cursor(self):
+        for message in 'abc':
+            notify('user_1', message, {})
+        notify('mechanics', 'm', {})
+        events, truncated = get_missed_events(parse_cursor('user_1:1,mechanics:0'))
+        self.assertFalse(truncated)
+        self.assertEqual([(e['stream'], e['seq']) for e in events], [('user_1', 2), ('user_1', 3), ('mechanics', 1)])
+
+    def test_truncated_replay(self):
+        notify_batch([('user_1', str(i), {}) for i in range(REPLAY_LIMIT + 1)])
+        events, truncated = get_missed_events({'user_1': 0})
+        self.assertTrue(truncated)
+        self.assertEqual(len(events), REPLAY_LIMIT)
+
+    def test_parse_cursor_skips_garbage(self):
+        self.assertEqual(parse_cursor('user_5:12,bad,mechanics:x,sos:3'), {'user_5': 12, 'sos': 3})
+        self.assertEqual(parse_cursor(''), {})
+
+
+class NotificationReplayTests(SimpleTestCase):
+    def replay(self, events):
+        consumer = NotificationConsumer()
+        sent = []
+
+        async def send(text_data):
+            sent.append(json.loads(text_data))
+        consumer.send = send
+        with mock.patch('core.consumers.get_missed_events', return_value=(events, False)):
+            async_to_sync(consumer.replay_missed)({'sos': 0})
+        return sent
+
+    def test_sos_is_replayed_as_sos(self):
+        sent = self.replay([
+            {'stream': 'sos', 'seq': 1, 'handler': 'send_sos', 'message': '🆘', 'data': {}},
+            {'stream': 'user_1', 'seq': 4, 'handler': 'send_notification', 'message': 'x', 'data': {}},
+        ])
+        self.assertEqual([(m['type'], m['seq'], m['replay']) for m in sent], [('sos', 1, True), ('send_notification', 4, True)])
+
+    def test_unknown_handler_falls_back(self):
+        sent = self.replay([{'stream': 'user_1', 'seq': 1, 'handler': 'close', 'message': 'x', 'data': {}}])
+        self.assertEqual(sent[0]['type'], 'send_notification')
+
+
+class WebSocketAuthTests(TransactionTestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('driver', password='x')
+        self.app = JWTAuthMiddleware(URLRouter(websocket_urlpatterns))
+
+    def connect(self, query=''):
+        async def run():
+            communicator = WebsocketCommunicator(self.app, f'/ws/notifications/{query}')
+            connected, _ = await communicator.connect()
+            message = await communicator.receive_json_from() if connected else None
+            await communicator.disconnect()
+            return connected, message
+        return async_to_sync(run)()
+
+    def token(self, **claims):
+        from ninja_jwt.tokens import AccessToken
+        token = AccessToken.for_user(self.user)
+        for name, value in claims.items():
+            token[name] = value
+        return str(token)
+
+    def test_valid_token(self):
+        get_cached_user = CachedJWTAuth.get_cached_user
+
+        def off_loop(auth, validated_token):
+            # Синхронний клієнт кешу не має викликатись з event loop
+            with self.assertRaises(RuntimeError):
+                asyncio.get_running_loop()
+            return get_cached_user(auth, validated_token)
+
+        with mock.patch.object(CachedJWTAuth, 'get_cached_user', autospec=True, side_effect=off_loop) as lookup:
+            connected, message = self.connect(f'?token={self.token()}')
+        self.assertTrue(connected)
+        self.assertTrue(lookup.called)
+        self.assertEqual(message, {'type': 'cursor', 'cursor': {f'user_{self.user.id}': 0}})
+        # Вдруге - з кешу
+        self.assertTrue(self.connect(f'?token={self.token()}')[0])
+
+    def test_expired_token(self):
+        self.assertFalse(self.connect(f'?token={self.token(exp=int(time.time()) - 10)}')[0])
+
+    def test_missing_or_garbage_token(self):
+        self.assertFalse(self.connect()[0])
+        self.assertFalse(self.connect('?token=abc')[0])
+
+
+class AcceptOfferConcurrencyTests(TransactionTestCase):
+    THREADS = 8
+
+    def test_exactly_one_offer_wins(self):
+        client = User.objects.create_user('client', password='x')
+        req = Request.objects.create(client=client, car_model='Skoda Octavia', description='x', location=Point(30.5, 50.45))
+        offers = Offer.objects.bulk_create([
+            Offer(request=req, mechanic=User.objects.create_user(f'mech{i}', password='x', role='mechanic'), price=100 + i)
+            for i in range(self.THREADS)
+        ])
+        barrier = threading.Barrier(self.THREADS)
+        results = []
+
+        def worker(offer):
+            barrier.wait()
+            try:
+                workflow.accept_offer(offer)
+                results.append('won')
+            except workflow.InvalidTransition:
+                results.append('lost')
+            except OperationalError:
+                # SQLite блокує всю БД на запис - там це теж програш
+                results.append('locked')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(offer,)) for offer in offers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        req.refresh_from_db()
+        self.assertEqual(results.count('won'), 1)
+        if connection.vendor != 'sqlite':
+            self.assertNotIn('locked', results)
+        self.assertEqual(Offer.objects.filter(request=req, is_accepted=True).count(), 1)
+        self.assertEqual(req.status, 'active')
+
+
+class NearbyChangesTests(TestCase):
+    def setUp(self):
+        self.mechanic = User.objects.create(username='mech', role='mechanic')
+        self.driver = User.objects.create(username='driver')
+        self.since = timezone.now() - timedelta(minutes=1)
+
+    def request(self, lng=30.52, updated_at=None, **fields):
+        req = Request.objects.create(client=self.driver, car_model='x', description='x', location=Point(lng, 50.45), **fields)
+        if updated_at:
+            Request.objects.filter(id=req.id).update(updated_at=updated_at)
+        return req.id
+
+    def changes(self, since=None):
+        params = {'lat': 50.45, 'lng': 30.52, 'radius_km': 10}
+        if since:
+            params['since'] = since.isoformat()
+        response = self.client.get(f'/api/requests/nearby/changes?{urlencode(params)}', **auth_header(self.mechanic))
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        return sorted(r['id'] for r in body['upserted']), sorted(body['removed']), body['cursor']
+
+    def test_delta_since_cursor(self):
+        old = self.request(updated_at=self.since - timedelta(minutes=5))
+        on_boundary = self.request(updated_at=self.since)
+        fresh = self.request()
+        far = self.request(lng=31.2)  # ~50 км - поза радіусом
+        accepted = self.request()
+        offer = workflow.create_offer(Request.objects.get(id=accepted), self.mechanic, 100)
+        workflow.accept_offer(offer)
+        stale = self.request(updated_at=self.since - timedelta(days=10))
+        Request.objects.filter(id=stale).update(created_at=timezone.now() - timedelta(days=10))
+        workflow.expire_stale_requests(timedelta(days=7))
+        far_closed = self.request(lng=31.2, status='canceled')
+
+        upserted, removed, _ = self.changes(self.since)
+        # since включно: рядок рівно на курсорі не губиться
+        self.assertEqual(upserted, sorted([on_boundary, fresh]))
+        # Прийняті і прострочені - до видалення зі стрічки; поза радіусом - взагалі не видно
+        self.assertEqual(removed, sorted([accepted, stale]))
+        self.assertNotIn(far, upserted)
+        self.assertNotIn(far_closed, removed)
+        self.assertNotIn(old, upserted + removed)
+
+        # Без since - повний знімок відкритих заявок у радіусі
+        upserted, removed, cursor = self.changes()
+        self.assertEqual(upserted, sorted([old, on_boundary, fresh]))
+        self.assertEqual(removed, [])
+        self.assertLess(datetime.fromisoformat(cursor.replace('Z', '+00:00')), timezone.now() - timedelta(seconds=4))
+
+
+class ExpireRequestsTests(TestCase):
+    def setUp(self):
+        self.clients = [User.objects.create_user(f'client{i}', password='x') for i in range(2)]
+
+    def request(self, client, age, status='new'):
+        req = Request.objects.create(client=client, car_model='Skoda', description='x', location=Point(30.5, 50.45))
+        Request.objects.filter(id=req.id).update(created_at=timezone.now() - age, status=status)
+        return req.id
+
+    def expired_events(self):
+        return list(
+            NotificationEvent.objects.filter(data__event='requests_expired').order_by('stream')
+            .values_list('stream', 'data')
+        )
+
+    def test_only_stale_new_requests_are_canceled(self):
+        first, second = self.clients
+        stale = [self.request(first, timedelta(days=8)) for _ in range(3)] + [self.request(second, timedelta(days=9))]
+        fresh = self.request(first, timedelta(days=1))
+        active = self.request(first, timedelta(days=8), status='active')
+        done = self.request(second, timedelta(days=8), status='done')
+
+        batches = workflow.expire_stale_requests(timedelta(days=7), batch_size=2)
+
+        statuses = dict(Request.objects.values_list('id', 'status'))
+        self.assertEqual({statuses[i] for i in stale}, {'canceled'})
+        self.assertEqual((statuses[fresh], statuses[active], statuses[done]), ('new', 'active', 'done'))
+        self.assertEqual([batch['rows'] for batch in batches], [2, 2])
+
+        # Одне зведене сповіщення на клієнта, хоч його заявки і розкидані по пачках
+        events = self.expired_events()
+        self.assertEqual([stream for stream, _ in events], [f'user_{first.id}', f'user_{second.id}'])
+        self.assertEqual(sorted(events[0][1]['request_ids']), stale[:3])
+        self.assertEqual(events[1][1]['request_ids'], stale[3:])
+
+        # Повторний прогін - нічого закривати і нікого сповіщати
+        self.assertEqual(workflow.expire_stale_requests(timedelta(days=7)), [])
+        self.assertEqual(len(self.expired_events()), 2)
+
+    def test_command(self):
+        for _ in range(3):
+            self.request(self.clients[0], timedelta(hours=30))
+        self.request(self.clients[0], timedelta(hours=10))
+        out = io.StringIO()
+        call_command('expire_requests', hours=24, batch_size=2, stdout=out)
+        self.assertIn('Пачка 2: 1 заявок', out.getvalue())
+        self.assertIn('Закрито заявок: 3', out.getvalue())
+        self.assertEqual(Request.objects.filter(status='new').count(), 1)
+        self.assertEqual(len(self.expired_events()), 1)
+
+
+@skipUnless(connection.features.has_select_for_update_skip_locked, 'потрібні блокування рядків (PostgreSQL)')
+class ExpireRequestsLockTests(TransactionTestCase):
+    def test_rows_locked_by_accept_are_skipped(self):
+        client = User.objects.create_user('client', password='x')
+        ids = []
+        for _ in range(3):
+            req = Request.objects.create(client=client, car_model='Skoda', description='x', location=Point(30.5, 50.45))
+            ids.append(req.id)
+        Request.objects.filter(id__in=ids).update(created_at=timezone.now() - timedelta(days=8))
+        locked, release = threading.Event(), threading.Event()
+
+        def accept():
+            # Те, що тримає accept_offer посеред транзакції: заблокований рядок заявки
+            try:
+                with transaction.atomic():
+                    Request.objects.select_for_update().get(id=ids[0])
+                    locked.set()
+                    release.wait(10)
+            finally:
+                connection.close()
+
+        thread = threading.Thread(target=accept)
+        thread.start()
+        try:
+            self.assertTrue(locked.wait(10))
+            batches = workflow.expire_stale_requests(timedelta(days=7))
+        finally:
+            release.set()
+            thread.join()
+
+        self.assertEqual(sum(batch['rows'] for batch in batches), 2)
+        statuses = dict(Request.objects.values_list('id', 'status'))
+        self.assertEqual([statuses[i] for i in ids], ['new', 'canceled', 'canceled'])
+        events = NotificationEvent.objects.filter(data__event='requests_expired')
+        self.assertEqual([sorted(event.data['request_ids']) for event in events], [ids[1:]])
+
+
+class AcceptOfferTests(TestCase):
+    def setUp(self):
+        self.client_user = User.objects.create_user('client', password='x')
+        self.req = Request.objects.create(client=self.client_user, car_model='Skoda', description='x', location=Point(30.5, 50.45))
+        self.mechanics = [User.objects.create_user(f'mech{i}', password='x', role='mechanic') for i in range(3)]
+        self.offers = [workflow.create_offer(self.req, m, 100 + i) for i, m in enumerate(self.mechanics)]
+
+    def events(self, event):
+        return list(NotificationEvent.objects.filter(data__event=event).order_by('stream').values_list('stream', flat=True))
+
+    def test_losing_offerers_are_notified(self):
+        url = f'/api/offers/{self.offers[1].id}/accept'
+        self.assertEqual(self.client.post(url, **auth_header(self.client_user)).status_code, 200)
+        self.assertEqual(self.events('offer_accepted'), [f'user_{self.mechanics[1].id}'])
+        self.assertEqual(self.events('offer_rejected'), sorted(f'user_{self.mechanics[i].id}' for i in (0, 2)))
+        # Повторне прийняття - 409, і нікого вдруге не сповіщаємо
+        self.assertEqual(self.client.post(url, **auth_header(self.client_user)).status_code, 409)
+        self.assertEqual(len(self.events('offer_rejected')), 2)
+
+    def test_only_client_finishes(self):
+        workflow.accept_offer(self.offers[0])
+        url = f'/api/requests/{self.req.id}/finish'
+        self.assertEqual(self.client.post(url, **auth_header(self.mechanics[0])).status_code, 403)
+        self.assertEqual(self.client.post(url, **auth_header(self.client_user)).status_code, 200)
+        self.req.refresh_from_db()
+        self.assertEqual(self.req.status, 'done')
+
+
+# Manifest-сховище WhiteNoise вимагає collectstatic - для рендеру шаблонів адмінки в тестах не треба
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class AdminChangelistQueryTests(TestCase):
+    """
+    Кількість запитів changelist не росте з кількістю рядків (N+1 через __str__/FK).
+    """
+    MODELS = [ServiceCategory, ServiceStation, Car, Request, Offer, Review, ClientReview, User]
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        root = ServiceCategory.objects.create(name='root')
+        self.leaf = ServiceCategory.objects.create(
+            name='leaf', parent=ServiceCategory.objects.create(name='mid', parent=root)
+        )
+        self.seeded = 0
+
+    def seed(self, count):
+        for n in range(self.seeded, self.seeded + count):
+            driver = User.objects.create(username=f'client{n}', phone=f'+380{n:09d}')
+            mechanic = User.objects.create(username=f'mech{n}', role='mechanic')
+            ServiceStation.objects.create(owner=mechanic, name=f'СТО {n}', address='-', location=Point(30.5, 50.4))
+            car = Car.objects.create(owner=driver, license_plate=f'AQ{n:06d}', brand_model='Test')
+            req = Request.objects.create(
+                client=driver, category=self.leaf, car=car, car_model='Test',
+                description='-', location=Point(30.5, 50.4), status='done',
+            )
+            Offer.objects.create(request=req, mechanic=mechanic, price=100, is_accepted=True)
+            Review.objects.create(request=req, author=driver, mechanic=mechanic, rating=5)
+            ClientReview.objects.create(request=req, author=mechanic, client=driver, rating=5)
+        self.seeded += count
+
+    def changelist(self, model):
+        response = self.client.get(reverse(f'admin:core_{model._meta.model_name}_changelist'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        # Обидва заміри вміщаються в одну сторінку changelist
+        self.seed(3)
+        small = {}
+        for model in self.MODELS:
+            with CaptureQueriesContext(connection) as queries:
+                self.changelist(model)
+            small[model] = len(queries)
+        self.seed(10)
+        for model in self.MODELS:
+            with self.subTest(model=model._meta.model_name), self.assertNumQueries(small[model]):
+                self.changelist(model)
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class StationImportAdminTests(TestCase):
+    url = '/admin/core/servicestation/import/'
+
+    def staff(self, *codenames):
+        user = User.objects.create_user(f"staff_{'_'.join(codenames)}", password='x', is_staff=True)
+        user.user_permissions.set(Permission.objects.filter(codename__in=codenames))
+        self.client.force_login(user)
+        return user
+
+    def xlsx(self, rows):
+        workbook = importer.openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(['username', 'phone', 'name', 'address', 'lat', 'lng'])
+        for row in rows:
+            sheet.append(row)
+        data = io.BytesIO()
+        workbook.save(data)
+        data.seek(0)
+        data.name = 'stations.xlsx'
+        return data
+
+    def test_view_only_staff_cannot_import(self):
+        self.staff('view_servicestation')
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.assertNotContains(self.client.get('/admin/core/servicestation/'), self.url)
+
+    def test_station_add_without_user_add_is_not_enough(self):
+        self.staff('view_servicestation', 'add_servicestation')
+        self.assertEqual(self.client.post(self.url, {'file': self.xlsx([])}).status_code, 403)
+
+    def test_xlsx_import(self):
+        self.staff('view_servicestation', 'add_servicestation', 'add_user')
+        self.assertContains(self.client.get('/admin/core/servicestation/'), self.url)
+        response = self.client.post(self.url, {'file': self.xlsx([['sto1', '+380500000001', 'СТО', '-', 50.45, 30.52]])})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ServiceStation.objects.get().owner.username, 'sto1')
+
+
+@override_settings(STATICFILES_STORAGE='django.contrib.staticfiles.storage.StaticFilesStorage')
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.driver = driver = User.objects.create(username='driver')
+        self.mechanic = mechanic = User.objects.create(username='mech', role='mechanic')
+        self.station = ServiceStation.objects.create(owner=mechanic, name='СТО', address='-', location=Point(30.5, 50.4))
+        self.req = Request.objects.create(
+            client=driver, car_model='Test', description='-', location=Point(30.5, 50.4), status='done',
+        )
+        # Стан розсилки вже завів сигнал створення заявки - фіксуємо значення
+        RequestDispatch.objects.filter(request=self.req).update(wave=2)
+        DispatchNotice.objects.update_or_create(request=self.req, station=self.station, defaults={'wave': 1, 'score': 0.75})
+        Offer.objects.create(request=self.req, mechanic=mechanic, price=100, is_accepted=True)
+
+    def test_dispatch_history_is_kept(self):
+        self.assertEqual(archive.archive_batch([self.req.id]), 1)
+        self.assertFalse(DispatchNotice.objects.exists())
+        history = ArchivedRequest.objects.get(id=self.req.id).dispatch_history
+        self.assertEqual(history['wave'], 2)
+        self.assertEqual(
+            [(n['station_id'], n['wave'], n['score']) for n in history['notices']], [(self.station.id, 1, 0.75)],
+        )
+
+    def test_admin_is_read_only(self):
+        archive.archive_batch([self.req.id])
+        self.client.force_login(User.objects.create_superuser('admin', password='x'))
+        url = reverse('admin:core_archivedrequest_change', args=[self.req.id])
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(self.client.post(url, {'status': 'new'}).status_code, 403)
+        self.assertEqual(ArchivedRequest.objects.get(id=self.req.id).status, 'done')
+
+    def test_history_search_includes_archive(self):
+        Request.objects.filter(id=self.req.id).update(description='стукає підвіска', created_at=timezone.now() - timedelta(days=200))
+        archive.archive_batch([self.req.id])
+        live = Request.objects.create(client=self.driver, car_model='Test', description='знову стукає підвіска',
+                                      location=Point(30.5, 50.4))
+        Request.objects.create(client=self.driver, car_model='Test', description='заміна масла', location=Point(30.5, 50.4))
+        url = '/api/requests/search?q=підвіска'
+
+        found = self.client.get(url, **auth_header(self.driver)).json()
+        # Нові першими, архів - там, де він за порядком
+        self.assertEqual([r['id'] for r in found], [live.id, self.req.id])
+        self.assertTrue(found[1]['has_review'] is False and '<mark>' in found[1]['snippet'])
+        page = self.client.get(f'{url}&limit=1&offset=1', **auth_header(self.driver)).json()
+        self.assertEqual([r['id'] for r in page], [self.req.id])
+
+        # Майстер бачить архівну заявку через свій архівний офер, чужий - ні
+        self.assertEqual([r['id'] for r in self.client.get(url, **auth_header(self.mechanic)).json()], [self.req.id])
+        stranger = User.objects.create(username='other', role='mechanic')
+        self.assertEqual(self.client.get(url, **auth_header(stranger)).json(), [])
+        self.assertEqual(self.client.get(f'{url}&status=new', **auth_header(self.driver)).json()[0]['id'], live.id)
+
+
+class MatchingScoreTests(SimpleTestCase):
+    chain = [(3, 'заміна ременя грм'), (2, 'грм'), (1, 'двигун')]
+    candidates = [
+        {'id': 1, 'rating': 5, 'services_list': '', 'category_ids': {1}, 'distance_km': 2.0},
+        {'id': 2, 'rating': 4, 'services_list': 'ГРМ, ходова', 'category_ids': set(), 'distance_km': 1.0},
+        {'id': 3, 'rating': 3, 'services_list': '', 'category_ids': {3, 9}, 'distance_km': 9.0},
+        {'id': 4, 'rating': None, 'services_list': 'шиномонтаж', 'category_ids': set(), 'distance_km': 12.0},
+    ]
+
+    def test_category_match_takes_closest_level(self):
+        self.assertEqual(matching.category_match(self.candidates[2], self.chain), 1.0)
+        self.assertAlmostEqual(matching.category_match(self.candidates[1], self.chain), 0.7)
+        self.assertAlmostEqual(matching.category_match(self.candidates[0], self.chain), 0.4)
+        self.assertEqual(matching.category_match(self.candidates[3], self.chain), 0.0)
+        self.assertEqual(matching.category_match(self.candidates[3], []), 0.5)
+
+    def test_numpy_and_list_scoring_agree(self):
+        rates = {1: 0.9}
+        vectorized = matching.score_candidates(self.candidates, self.chain, rates, 10, limit=3)
+        with mock.patch.object(matching, 'numpy', None):
+            plain = matching.score_candidates(self.candidates, self.chain, rates, 10, limit=3)
+        self.assertEqual([c['id'] for _, c in vectorized], [c['id'] for _, c in plain])
+        for (a, _), (b, _) in zip(vectorized, plain):
+            self.assertAlmostEqual(a, b)
+        self.assertEqual(len(matching.score_candidates(self.candidates, self.chain, rates, 10)), 4)
+
+
+class MatchingQueryTests(TestCase):
+    def test_category_chain_is_one_query(self):
+        root = ServiceCategory.objects.create(name='Двигун')
+        mid = ServiceCategory.objects.create(name='ГРМ', parent=root)
+        leaf = ServiceCategory.objects.create(name='Заміна ременя ГРМ', parent=mid)
+        with self.assertNumQueries(1):
+            chain = matching.category_chain(leaf.id)
+        self.assertEqual(chain, [(leaf.id, 'заміна ременя грм'), (mid.id, 'грм'), (root.id, 'двигун')])
+        self.assertEqual(matching.category_chain(None), [])
+
+    def test_first_wave_runs_after_commit(self):
+        owner = User.objects.create(username='mech', role='mechanic')
+        station = ServiceStation.objects.create(owner=owner, name='СТО', address='-', location=Point(30.52, 50.45))
+        client = User.objects.create(username='client')
+        with self.captureOnCommitCallbacks() as callbacks:
+            req = Request.objects.create(client=client, car_model='x', description='x', location=Point(30.52, 50.45))
+        # До коміту - тільки стан розсилки, кандидатів ще не шукали
+        self.assertEqual(RequestDispatch.objects.get(request=req).wave, 0)
+        self.assertFalse(DispatchNotice.objects.exists())
+
+        for callback in callbacks:
+            callback()
+        self.assertEqual(list(DispatchNotice.objects.values_list('station_id', flat=True)), [station.id])
+        self.assertEqual(RequestDispatch.objects.get(request=req).wave, 1)
+        # Воркер (чи повторний виклик) першу хвилю вдруге не шле
+        self.assertEqual(matching.run_first_wave(req.dispatch.id), 0)
+
+    def test_run_wave_notifies_best_stations(self):
+        category = ServiceCategory.objects.create(name='Ходова')
+        stations = []
+        for i, (lng, rating) in enumerate([(30.52, 5), (30.53, 3), (30.9, 5)]):
+            owner = User.objects.create(username=f'mech{i}', role='mechanic')
+            stations.append(ServiceStation.objects.create(
+                owner=owner, name=f'СТО {i}', address='-', location=Point(lng, 50.45), rating=rating,
+            ))
+        stations[1].categories.add(category)
+        client = User.objects.create(username='client')
+        with mock.patch.dict(matching.MATCHING, {'ENABLED': False, 'WAVE_SIZE': 2}):
+            req = Request.objects.create(
+                client=client, car_model='x', description='x', category=category, location=Point(30.52, 50.45),
+            )
+            dispatch = RequestDispatch.objects.create(request=req)
+            self.assertEqual(matching.run_wave(dispatch, req), 2)
+        notified = set(DispatchNotice.objects.filter(request=req).values_list('station_id', flat=True))
+        # Третя СТО за ~25 км - поза радіусом першої хвилі
+        self.assertEqual(notified, {stations[0].id, stations[1].id})
+
+
+class DueWavesTests(TransactionTestCase):
+    def test_each_wave_commits_separately(self):
+        client = User.objects.create(username='client')
+        owner = User.objects.create(username='mech', role='mechanic')
+        ServiceStation.objects.create(owner=owner, name='СТО', address='-', location=Point(30.52, 50.45))
+        with mock.patch.dict(matching.MATCHING, {'MAX_WAVES': 1}):
+            requests = [
+                Request.objects.create(client=client, car_model='x', description='x', location=Point(30.52, 50.45))
+                for _ in range(3)
+            ]
+            RequestDispatch.objects.update(next_wave_at=timezone.now() - timedelta(seconds=1))
+            committed, seen = [], []
+            run_wave = matching.run_wave
+
+            def wave(dispatch, req):
+                # Скільки попередніх хвиль вже закомічено на момент цієї
+                seen.append(len(committed))
+                transaction.on_commit(lambda: committed.append(req.id))
+                return run_wave(dispatch, req)
+
+            with mock.patch('core.matching.run_wave', side_effect=wave):
+                self.assertEqual(matching.run_due_waves(limit=2), 2)
+                self.assertEqual(matching.run_due_waves(), 1)
+                self.assertEqual(matching.run_due_waves(), 0)
+        self.assertEqual(seen, [0, 1, 2])
+        # Після першої хвилі - broadcast всім (MAX_WAVES=1), stream "mechanics" - по порядку
+        self.assertEqual(
+            sorted(NotificationEvent.objects.filter(stream='mechanics').values_list('seq', flat=True)), [1, 2, 3],
+        )
+        self.assertFalse(RequestDispatch.objects.filter(request__in=requests, next_wave_at__isnull=False).exists())
+
+
+class CategorySubtreeTests(TestCase):
+    def setUp(self):
+        self.engine = ServiceCategory.objects.create(name='Двигун')
+        self.timing = ServiceCategory.objects.create(name='ГРМ', parent=self.engine)
+        self.belt = ServiceCategory.objects.create(name='Заміна ременя ГРМ', parent=self.timing)
+        self.chassis = ServiceCategory.objects.create(name='Ходова')
+
+    def test_subtree_in_one_query(self):
+        with self.assertNumQueries(1):
+            ids = category_subtree_ids(self.engine.id)
+        self.assertEqual(ids, {self.engine.id, self.timing.id, self.belt.id})
+        self.assertEqual(category_subtree_ids([self.timing.id, self.chassis.id]), {self.timing.id, self.belt.id, self.chassis.id})
+        self.assertEqual(category_subtree_ids([]), set())
+
+    def test_station_served_categories(self):
+        owner = User.objects.create(username='mech', role='mechanic')
+        station = ServiceStation.objects.create(owner=owner, name='СТО', address='-', location=Point(30.5, 50.4))
+        station.categories.add(self.timing, self.chassis)
+        with self.assertNumQueries(1):
+            ids = station_served_category_ids(station.id)
+        self.assertEqual(ids, {self.timing.id, self.belt.id, self.chassis.id})
+
+    def test_parse_services_list(self):
+        ServiceCategory.objects.create(name='  ходова ')
+        ids = parse_services_list('ходова, заміна РЕМЕНЯ грм ,невідома')
+        self.assertEqual(set(ids), set(
+            ServiceCategory.objects.filter(name__in=['Ходова', '  ходова ', 'Заміна ременя ГРМ']).values_list('id', flat=True)
+        ))
+        self.assertEqual(parse_services_list(' , '), [])
+
+    def test_parse_services_list_on_postgres_filters_in_sql(self):
+        abs_ = ServiceCategory.objects.create(name='  ABS ')
+        oil = ServiceCategory.objects.create(name='Oil Change')
+        with mock.patch('core.categories.is_postgres', return_value=True), \
+                CaptureQueriesContext(connection) as ctx:
+            # Тільки латиниця: тут SQLite, а його LOWER не знає кирилиці
+            ids = parse_services_list('abs, OIL change, unknown')
+        self.assertEqual(len(ctx.captured_queries), 1)
+        self.assertIn('LOWER(TRIM(', ctx.captured_queries[0]['sql'].upper())
+        self.assertIn(' IN (', ctx.captured_queries[0]['sql'].upper())
+        self.assertEqual(set(ids), {abs_.id, oil.id})
+
+
+@override_settings(POSTGIS_VERSION=(3, 4, 0))
+class TrigramFilterSQLTests(SimpleTestCase):
+    """
+    Фільтр має йти операторами pg_trgm (% / %>), а не similarity > поріг -
+    інакше GIN-індекси з 0010/0012 не використовуються. БД не потрібна: тільки компіляція SQL.
+    """
+
+    def compile(self, queryset):
+        postgis = ConnectionHandler({'default': {'ENGINE': 'django.contrib.gis.db.backends.postgis', 'NAME': 'x'}})
+        sql, _ = queryset.order_by().values('id').query.get_compiler(connection=postgis['default']).as_sql()
+        return sql[sql.index(' WHERE '):]
+
+    def test_station_search_uses_index_operators(self):
+        where = self.compile(search._search_postgres(ServiceStation.objects.all(), 'розвал'))
+        self.assertIn('"name" %% %s', where)
+        self.assertIn('"services_list" %%> %s', where)
+        self.assertNotIn('SIMILARITY', where.upper())
+
+    def test_request_search_uses_index_operators(self):
+        where = self.compile(search._request_search_postgres(Request.objects.all(), 'octavia'))
+        self.assertIn('"car_model" %%> %s', where)
+        self.assertNotIn('SIMILARITY', where.upper())
+
+
+class StationIndexTests(TestCase):
+    def test_saved_station_is_searchable(self):
+        owner = User.objects.create(username='mech', role='mechanic')
+        with self.captureOnCommitCallbacks(execute=True):
+            station = ServiceStation.objects.create(
+                owner=owner, name='Розвал Центр', services_list='розвал-сходження', address='-', location=Point(30.5, 50.4),
+            )
+        self.assertEqual(search.search_stations(ServiceStation.objects.all(), 'розвал'), [station])
+        # Опечатка - нечіткий збіг по триграмах словника
+        self.assertEqual(search.search_stations(ServiceStation.objects.all(), 'розвл'), [station])
+
+
+class GazetteerTests(SimpleTestCase):
+    rows = [
+        {'name': 'Київ', 'lat': '50.4501', 'lng': '30.5234', 'kind': 'city', 'parent': ''},
+        {'name': 'вулиця Хрещатик', 'lat': '50.4474', 'lng': '30.5219', 'kind': 'street', 'parent': 'Київ'},
+        {'name': 'вулиця Хрещатик', 'lat': '48.9226', 'lng': '24.7111', 'kind': 'street', 'parent': 'Івано-Франківськ'},
+        {'name': 'Бровари', 'lat': '50.5110', 'lng': '30.7909', 'kind': 'city', 'parent': ''},
+        {'name': 'битий рядок', 'lat': 'x', 'lng': '30', 'kind': 'city', 'parent': ''},
+    ]
+
+    def test_geocode_prefers_street_in_named_city(self):
+        gazetteer = Gazetteer(self.rows)
+        self.assertEqual(len(gazetteer), 4)
+        self.assertEqual(gazetteer.label(gazetteer.geocode('вул. Хрещатик, 22, Київ')), 'вулиця Хрещатик, Київ')
+        self.assertEqual(gazetteer.names[gazetteer.geocode('м. Бровари')], 'Бровари')
+        self.assertIsNone(gazetteer.geocode('  '))
+
+    def test_nearest_matches_brute_force(self):
+        rnd = random.Random(7)
+        rows = [{'name': str(i), 'lat': 60 + rnd.uniform(0, 1), 'lng': 30 + rnd.uniform(0, 1)} for i in range(300)]
+        gazetteer = Gazetteer(rows)
+        scale_at = lambda lat: math.cos(math.radians(lat))
+        for _ in range(200):
+            lat, lng = 60 + rnd.uniform(0, 1), 30 + rnd.uniform(0, 1)
+            expected = min(
+                range(len(rows)),
+                key=lambda i: (gazetteer.lats[i] - lat) ** 2 + ((gazetteer.lngs[i] - lng) * scale_at(lat)) ** 2,
+            )
+            self.assertEqual(gazetteer.nearest(lat, lng)[0], expected)
+
+    def test_broken_file_gives_empty_gazetteer(self):
+        with tempfile.NamedTemporaryFile('wb', suffix='.csv') as f:
+            f.write(b'name,lat,lng\n\xff\xfe\x00broken')
+            f.flush()
+            with self.assertLogs('core.geocoding', 'WARNING'):
+                self.assertEqual(len(load_gazetteer(f.name)), 0)
+        self.assertEqual(len(load_gazetteer('/nonexistent/gazetteer.csv')), 0)
+
+
+class ImporterTests(TestCase):
+    def row(self, i, **extra):
+        return {
+            'username': f'sto{i}', 'phone': f'+38050000{i:04d}', 'name': f'СТО {i}', 'address': '-',
+            'lat': '50.45', 'lng': '30,52', **extra,
+        }
+
+    def test_validation_errors_by_line(self):
+        User.objects.create(username='taken', role='client')
+        rows = [
+            self.row(1),
+            self.row(2, name=''),
+            self.row(3, lat='91'),
+            self.row(4, lng='схід'),
+            self.row(5, username='sto1'),
+            self.row(6, username='taken'),
+        ]
+        result = importer.import_stations(rows)
+        self.assertEqual(result['created'], 1)
+        errors = {error['line']: error['errors'] for error in result['errors']}
+        self.assertEqual(set(errors), {3, 4, 5, 6, 7})
+        self.assertIn("name: обов'язкове поле", errors[3])
+        self.assertIn('поза межами', errors[4])
+        self.assertIn('мають бути числами', errors[5])
+        self.assertIn('повторюється (рядок 2)', errors[6])
+        self.assertIn('вже зайнятий', errors[7])
+        self.assertEqual(ServiceStation.objects.get().location.coords, (30.52, 50.45))
+
+    def test_dry_run_rolls_back(self):
+        result = importer.import_stations([self.row(1)], dry_run=True)
+        self.assertEqual(result['created'], 1)
+        self.assertFalse(User.objects.filter(username='sto1').exists())
+
+    def test_conflict_after_validation_is_revalidated(self):
+        real_validate = importer.validate
+        calls = []
+
+        def racing_validate(rows):
+            result = real_validate(rows)
+            if not calls:
+                # Паралельна реєстрація між перевіркою і вставкою
+                User.objects.create(username='sto2', role='client')
+            calls.append(1)
+            return result
+
+        with mock.patch.object(importer, 'validate', racing_validate):
+            result = importer.import_stations(iter([self.row(1), self.row(2)]))
+        self.assertEqual(result['attempts'], 2)
+        self.assertEqual(result['created'], 1)
+        self.assertEqual(result['errors'], [{'line': 3, 'errors': 'username вже зайнятий'}])
+        self.assertEqual(list(ServiceStation.objects.values_list('owner__username', flat=True)), ['sto1'])
+
+
+class TDigestTests(SimpleTestCase):
+    def setUp(self):
+        rnd = random.Random(3)
+        self.values = [rnd.lognormvariate(7, 0.6) for _ in range(20000)]
+        self.sorted = sorted(self.values)
+
+    def rank(self, value):
+        # Частка вибірки, не більша за value - похибку міряємо в рангах, а не в гривнях
+        return sum(1 for v in self.sorted if v <= value) / len(self.sorted)
+
+    def test_quantiles_after_merge(self):
+        left, right = TDigest(), TDigest()
+        for i, value in enumerate(self.values):
+            (left if i % 2 else right).add(value)
+        left.merge(right)
+        self.assertEqual(left.count, len(self.values))
+        for q in (0.01, 0.1, 0.5, 0.9, 0.99):
+            with self.subTest(q=q):
+                self.assertAlmostEqual(self.rank(left.quantile(q)), q, delta=0.005)
+        # Скетч стислий: центроїдів на порядки менше, ніж точок
+        self.assertLess(len(left.centroids), 10 * left.compression)
+
+    def test_serialized_sketch_keeps_quantiles(self):
+        digest = TDigest()
+        for value in self.values:
+            digest.add(value)
+        restored = TDigest(json.loads(json.dumps(digest.to_list())))
+        self.assertEqual(restored.quantile(0.5), digest.quantile(0.5))
+        self.assertEqual(restored.count, len(self.values))
+
+    def test_small_and_empty(self):
+        self.assertIsNone(TDigest().quantile(0.5))
+        digest = TDigest()
+        for value in (100, 200, 300):
+            digest.add(value)
+        self.assertEqual(digest.quantile(0), 100)
+        self.assertEqual(digest.quantile(0.5), 200)
+        self.assertEqual(digest.quantile(1), 300)
+
+
+class ProjectionResponseTests(TestCase):
+    """
+    values_response минає схеми відповіді - відповідь має бути тією ж, що дала б схема.
+    """
+
+    def setUp(self):
+        self.driver = User.objects.create(username='driver')
+        self.mechanic = User.objects.create(username='mech', role='mechanic')
+        self.cars = [
+            Car.objects.create(owner=self.driver, license_plate='AA0001AA', brand_model='Skoda Octavia', year=2015, vin='VIN1'),
+            Car.objects.create(owner=self.driver, license_plate='AA0002AA', brand_model='Трактор'),
+        ]
+        Car.objects.create(owner=self.mechanic, license_plate='AA0003AA', brand_model='Чужа')
+        self.requests = [
+            Request.objects.create(client=self.driver, car_model='Skoda', description='x', location=Point(30.52, 50.45),
+                                   car=self.cars[0], is_sos=True),
+            Request.objects.create(client=self.driver, car_model='Трактор', description='y', location=Point(30.53, 50.45)),
+        ]
+        for req, comment in zip(self.requests, ['Все добре', None]):
+            Review.objects.create(request=req, author=self.driver, mechanic=self.mechanic, rating=5, comment=comment)
+
+    def get(self, url, status=200):
+        response = self.client.get(url, **auth_header(self.driver))
+        self.assertEqual(response.status_code, status, response.content)
+        return response.json()
+
+    def schema_dump(self, schema, objects):
+        return json.loads(json.dumps([schema.from_orm(obj).model_dump() for obj in objects], cls=NinjaJSONEncoder))
+
+    def test_my_cars_match_schema(self):
+        expected = self.schema_dump(CarOut, sorted(self.cars, key=lambda car: car.created_at, reverse=True))
+        self.assertEqual(self.get('/api/my-cars'), expected)
+
+    def test_mechanic_reviews_match_schema(self):
+        reviews = self.get(f'/api/reviews/mechanic/{self.mechanic.id}')
+        self.assertEqual({tuple(sorted(row)) for row in reviews}, {tuple(sorted(ReviewOutSchema.model_fields))})
+        # NULL-коментар схема не пропустила б - швидкий шлях віддає порожній рядок
+        self.assertEqual(sorted(row['comment'] for row in reviews), ['', 'Все добре'])
+        with_comment = Review.objects.filter(comment__isnull=False).order_by('-created_at')
+        self.assertEqual([row for row in reviews if row['comment']], self.schema_dump(ReviewOutSchema, with_comment))
+
+    def test_projected_fields(self):
+        rows = self.get('/api/my-requests?fields=id, location,car_id')
+        self.assertEqual(rows, [
+            {'id': req.id, 'location': {'x': req.location.x, 'y': req.location.y}, 'car_id': req.car_id}
+            for req in reversed(self.requests)
+        ])
+        rows = self.get('/api/requests/nearby?lat=50.45&lng=30.52&fields=id,is_sos')
+        self.assertEqual(rows, [{'id': self.requests[0].id, 'is_sos': True}, {'id': self.requests[1].id, 'is_sos': False}])
+
+    def test_unknown_fields_rejected(self):
+        for fields in ('id,description', 'client__password', ' , '):
+            with self.subTest(fields=fields):
+                self.get(f'/api/my-requests?fields={fields}', status=400)
+        self.get('/api/requests/nearby?lat=50.45&lng=30.52&fields=search_vector', status=400)
+
+    def test_full_response_unchanged(self):
+        rows = self.get('/api/my-requests')
+        self.assertEqual(rows, self.schema_dump(RequestOutSchema, Request.objects.order_by('-created_at')))
+        self.assertEqual(set(rows[0]), set(RequestOutSchema.model_fields))
+        self.assertTrue(all(row['has_review'] for row in rows))
+
+
+class RendererTests(SimpleTestCase):
+    def test_same_wire_format_as_ninja(self):
+        moment = datetime(2026, 10, 19, 12, 30, 5, 123456, tzinfo=dt_timezone.utc)
+        data = {
+            'created_at': moment, 'day': date(2026, 10, 19), 'price': Decimal('199.90'),
+            'id': uuid.UUID(int=1), 'nested': [{'at': moment.replace(microsecond=0)}], 7: 'int key',
+        }
+        body = renderers.dumps(data)
+        # Ті самі значення, що дає стандартний рендерер ninja (DjangoJSONEncoder): мілісекунди і "Z"
+        self.assertEqual(json.loads(body), json.loads(json.dumps(data, cls=NinjaJSONEncoder)))
+        self.assertIn(b'"2026-10-19T12:30:05.123Z"', body)
+
+        request = RequestFactory().post('/', body, content_type='application/json')
+        parsed = renderers.ORJSONParser().parse_body(request)
+        self.assertEqual(parsed['created_at'], '2026-10-19T12:30:05.123Z')
+        self.assertEqual(parse_datetime(parsed['created_at']), moment.replace(microsecond=123000))
+        self.assertEqual(parsed['nested'][0]['at'], '2026-10-19T12:30:05Z')
+        self.assertEqual((parsed['day'], parsed['price'], parsed['7']), ('2026-10-19', '199.90', 'int key'))
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        driver = User.objects.create(username='driver')
+        self.mechanic = User.objects.create(username='mech', role='mechanic')
+        self.requests = [
+            Request.objects.create(
+                client=driver, car_model='Skoda Octavia', description=f'опис, "з лапками" {i}',
+                location=Point(30.5 + i, 50.4), status='done',
+            )
+            for i in range(3)
+        ]
+        for req in self.requests:
+            Offer.objects.create(request=req, mechanic=self.mechanic, price='1250.50')
+        archive.archive_batch([self.requests[0].id])
+
+    def body(self, dataset, fmt, **filters):
+        stream, stats = export.export(dataset, fmt, **filters)
+        return b''.join(stream), stats
+
+    def test_csv(self):
+        body, stats = self.body('requests', 'csv')
+        rows = list(csv.DictReader(io.StringIO(body.decode())))
+        self.assertEqual(stats['rows'], 3)
+        self.assertEqual([int(row['id']) for row in rows], [r.id for r in self.requests[1:]] + [self.requests[0].id])
+        self.assertEqual([row['archived'] for row in rows], ['False', 'False', 'True'])
+        self.assertEqual(rows[0]['description'], 'опис, "з лапками" 1')
+        self.assertEqual((float(rows[0]['lat']), float(rows[0]['lng'])), (50.4, 31.5))
+
+    def test_ndjson(self):
+        body, stats = self.body('offers', 'ndjson')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(rows), stats['rows'])
+        self.assertEqual(len(rows), 3)
+        self.assertEqual({row['mechanic_id'] for row in rows}, {self.mechanic.id})
+        self.assertEqual(sum(row['archived'] for row in rows), 1)
+
+    def test_parquet(self):
+        if export.pyarrow is None:
+            self.skipTest('pyarrow не встановлено')
+        body, _ = self.body('offers', 'parquet', status='done')
+        table = export.pyarrow.parquet.read_table(export.pyarrow.BufferReader(body))
+        self.assertEqual(table.num_rows, 3)
+        self.assertEqual(table.schema.field('price').type, export.pyarrow.float64())
+        self.assertEqual(set(table.column('price').to_pylist()), {1250.5})
+
+    def test_date_range_uses_day_bounds(self):
+        last_second = timezone.make_aware(datetime(2026, 3, 1, 23, 59, 59))
+        Request.objects.filter(id=self.requests[1].id).update(created_at=last_second)
+        Request.objects.filter(id=self.requests[2].id).update(created_at=last_second + timedelta(seconds=1))
+        rows = list(export.iter_rows('requests', date_from=date(2026, 3, 1), date_to=date(2026, 3, 1)))
+        self.assertEqual([row['id'] for row in rows], [self.requests[1].id])
+        sql = str(Request.objects.filter(created_at__gte=export._day_start(date(2026, 3, 1))).query)
+        self.assertNotIn('django_datetime_cast_date', sql)
+
+    def test_as_async_pulls_one_chunk_at_a_time(self):
+        pulled = []
+
+        def chunks():
+            for i in range(3):
+                pulled.append(i)
+                yield b'chunk'
+
+        async def first():
+            stream = export.as_async(chunks())
+            chunk = await stream.__anext__()
+            await stream.aclose()
+            return chunk
+
+        self.assertEqual(async_to_sync(first)(), b'chunk')
+        self.assertEqual(pulled, [0])
+
+    def test_endpoint_streams_asynchronously_under_asgi(self):
+        headers = {'Authorization': auth_header(User.objects.create(username='admin', is_staff=True))['HTTP_AUTHORIZATION']}
+
+        async def fetch():
+            response = await AsyncClient().get('/api/export/requests', headers=headers)
+            return response, b''.join([chunk async for chunk in response])
+
+        response, body = async_to_sync(fetch)()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        self.assertEqual(len(body.decode().splitlines()), 4)
+
+    def test_bad_arguments_fail_before_streaming(self):
+        with self.assertRaises(ValueError):
+            export.export('cars', 'csv')
+        with self.assertRaises(ValueError):
+            export.export('requests', 'xml')
+        with self.assertRaises(ValueError):
+            export.export('reviews', 'csv', status='done')
+
+
+class RoadGraphTests(SimpleTestCase):
+    def setUp(self):
+        rnd = random.Random(5)
+        self.nodes = [
+            {'id': str(i), 'lat': 50.4 + rnd.uniform(0, 0.05), 'lng': 30.5 + rnd.uniform(0, 0.05)} for i in range(60)
+        ]
+        self.edges = []
+        for _ in range(180):
+            u, v = rnd.sample(range(60), 2)
+            self.edges.append({
+                'source': str(u), 'target': str(v), 'length_m': str(rnd.uniform(100, 2000)),
+                'speed_kmh': str(rnd.choice([30, 50, 90])), 'oneway': rnd.choice(['', '1']),
+            })
+        self.graph = road_routing.RoadGraph(self.nodes, self.edges)
+
+    def reference(self, target):
+        """
+        Беллман-Форд по прямих ребрах: {вузол: (секунди, метри)} шляху вузол -> target.
+        """
+        edges = []
+        for row in self.edges:
+            u, v = int(row['source']), int(row['target'])
+            length = float(row['length_m'])
+            seconds = length / (float(row['speed_kmh']) / 3.6)
+            edges.append((u, v, seconds, length))
+            if not row['oneway']:
+                edges.append((v, u, seconds, length))
+        best = {target: (0.0, 0.0)}
+        for _ in range(len(self.nodes)):
+            for u, v, seconds, length in edges:
+                if v in best and best[v][0] + seconds < best.get(u, (math.inf,))[0]:
+                    best[u] = (best[v][0] + seconds, best[v][1] + length)
+        return best
+
+    def test_many_to_one_matches_reference(self):
+        for target in (0, 17, 42):
+            expected = self.reference(target)
+            found = self.graph.many_to_one(target, range(len(self.nodes)), max_seconds=math.inf)
+            self.assertEqual(set(found), set(expected))
+            for node, (seconds, meters) in expected.items():
+                # Ваги ребер у float32 - порівнюємо з відносною похибкою
+                self.assertAlmostEqual(found[node][0], seconds, delta=seconds * 1e-5 + 1e-3)
+                self.assertAlmostEqual(found[node][1], meters, delta=meters * 1e-5 + 1e-3)
+
+    def test_many_to_one_respects_oneway_and_cutoff(self):
+        nodes = [{'id': name, 'lat': 50.4, 'lng': 30.5 + i * 0.01} for i, name in enumerate('abc')]
+        edges = [
+            {'source': 'a', 'target': 'b', 'length_m': '1000', 'speed_kmh': '36', 'oneway': '1'},
+            {'source': 'b', 'target': 'c', 'length_m': '1000', 'speed_kmh': '36', 'oneway': ''},
+        ]
+        graph = road_routing.RoadGraph(nodes, edges)
+        a, b, c = 0, 1, 2
+        self.assertEqual(graph.many_to_one(c, [a, b]), {a: (200.0, 2000.0), b: (100.0, 1000.0)})
+        # c -> a тільки проти одностороннього руху
+        self.assertEqual(graph.many_to_one(a, [c]), {})
+        self.assertEqual(graph.many_to_one(c, [a, b], max_seconds=150), {b: (100.0, 1000.0)})
+
+    def test_nearest_matches_brute_force(self):
+        # Вузли рідші за клітинку сітки - саме тут "ще одне кільце" промахувалось
+        rnd = random.Random(7)
+        nodes = [{'id': str(i), 'lat': 60 + rnd.uniform(0, 0.2), 'lng': 30 + rnd.uniform(0, 0.2)} for i in range(150)]
+        graph = road_routing.RoadGraph(nodes, [])
+        for _ in range(500):
+            lat, lng = 60 + rnd.uniform(0, 0.2), 30 + rnd.uniform(0, 0.2)
+            scale = math.cos(math.radians(lat))
+            d2 = [(graph.lats[i] - lat) ** 2 + ((graph.lngs[i] - lng) * scale) ** 2 for i in range(len(nodes))]
+            expected = min(range(len(nodes)), key=d2.__getitem__)
+            if math.sqrt(d2[expected]) * road_routing.KM_PER_DEG > road_routing.MAX_SNAP_KM:
+                self.assertIsNone(graph.nearest(lat, lng))
+            else:
+                self.assertEqual(graph.nearest(lat, lng)[0], expected)
+        self.assertIsNone(graph.nearest(61, 31))
+
+
+class CatalogMatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        vehicles.load_catalog()
+
+    def setUp(self):
+        self.index = vehicles.catalog_index.build()
+
+    def label(self, text):
+        model_id = self.index.match(text)
+        return model_id and self.index.suggestions['model', model_id]['label']
+
+    def test_match_free_text(self):
+        cases = {
+            'Audi A4 Avant': 'Audi A4',                  # зайві слова після моделі
+            'vw golf': 'Volkswagen Golf',                # синонім марки
+            'BMW 320d': 'BMW 3 Series',                  # синонім моделі з опечаткою
+            'TOYTA CAMRY 2.5': 'Toyota Camry',           # опечатка в марці
+            'camri': 'Toyota Camry',                     # модель без марки з опечаткою
+            'Škoda Octavia A7': 'Skoda Octavia',         # діакритика
+            'фольксваген пассат': 'Volkswagen Passat',   # кирилиця -> транслітерація
+            'Мерс е 220': 'Mercedes-Benz E-Class',
+            'Land Rover Range Rover Sport': 'Land Rover Range Rover Sport',  # найдовший префікс
+        }
+        for text, expected in cases.items():
+            with self.subTest(text=text):
+                self.assertEqual(self.label(text), expected)
+
+    def test_no_match(self):
+        for text in ('', '   ', 'трактор Т-40'):
+            with self.subTest(text=text):
+                self.assertIsNone(self.index.match(text))
+
+    def test_generation_by_year(self):
+        a4 = self.index.match('Audi A4')
+        names = dict(VehicleGeneration.objects.filter(model_id=a4).values_list('id', 'name'))
+        # 2007 - і B7 (2004-2008), і B8 (2007-2015): береться новіше
+        self.assertEqual(names[self.index.generation(a4, 2007)], 'B8')
+        self.assertEqual(names[self.index.generation(a4, 2001)], 'B6')
+        self.assertIsNone(self.index.generation(a4, 1990))
+        self.assertIsNone(self.index.generation(a4, None))
+
+    def test_autocomplete_cyrillic_prefix(self):
+        labels = [item['label'] for item in self.index.autocomplete('фольксваген пас')]
+        self.assertEqual(labels[0], 'Volkswagen Passat')
+
+    def test_request_matched_on_create_and_car_model_change(self):
+        client = User.objects.create(username='client')
+        with mock.patch.object(vehicles.catalog_index, 'get', return_value=self.index), \
+                mock.patch('core.signals.vehicles.match_vehicle', wraps=vehicles.match_vehicle) as match:
+            req = Request.objects.create(client=client, car_model='vw golf', description='x', location=Point(30.5, 50.4))
+            golf = req.vehicle_model_id
+            self.assertEqual(self.index.suggestions['model', golf]['label'], 'Volkswagen Golf')
+            req.status = 'canceled'
+            req.save()
+            req.save(update_fields=['status'])
+            self.assertEqual(match.call_count, 1)
+
+            req.car_model = 'трактор Т-40'
+            req.save(update_fields=['car_model'])
+            self.assertEqual(match.call_count, 2)
+            self.assertIsNone(req.vehicle_model_id)
+
+            # Невпізнану заявку не матчимо заново на кожне збереження
+            req.description = 'y'
+            req.save()
+            self.assertEqual(match.call_count, 2)
+
+
+class MechanicRollupTests(TestCase):
+    """
+    Інкрементні лічильники після будь-якої послідовності подій = rebuild() з нуля.
+    """
+
+    def setUp(self):
+        self.driver = User.objects.create(username='driver')
+        self.m1, self.m2, self.m3 = [User.objects.create(username=f'm{i}', role='mechanic') for i in range(3)]
+
+    def request(self, seconds_ago):
+        req = Request.objects.create(client=self.driver, car_model='Test', description='-', location=Point(30.5, 50.4))
+        # Дробові секунди - щоб різниця між округленням кожного офера і суми дня була помітна
+        req.created_at = timezone.now() - timedelta(seconds=seconds_ago)
+        Request.objects.filter(id=req.id).update(created_at=req.created_at)
+        return req
+
+    def snapshot(self):
+        return (
+            sorted(MechanicStats.objects.values_list(
+                'mechanic_id', *rollups.COUNTERS)),
+            sorted(MechanicDailyStats.objects.values_list('mechanic_id', 'day', *rollups.COUNTERS)),
+        )
+
+    def test_incremental_matches_rebuild(self):
+        r1, r2, r3 = self.request(100.7), self.request(50.6), self.request(10.9)
+        o11 = workflow.create_offer(r1, self.m1, 1000)
+        workflow.create_offer(r1, self.m2, 900)
+        workflow.create_offer(r2, self.m2, 500)
+        o23 = workflow.create_offer(r2, self.m3, 450.5)
+        workflow.create_offer(r3, self.m1, 300)
+        workflow.accept_offer(o11)
+        workflow.finish_request(Request.objects.get(id=r1.id))
+        Review.objects.create(request=r1, author=self.driver, mechanic=self.m1, rating=4)
+        workflow.accept_offer(o23)
+        archive.archive_batch([r1.id])
+
+        incremental = self.snapshot()
+        rollups.rebuild()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_clearing_legacy_double_accept(self):
+        req = self.request(20.3)
+        legacy = workflow.create_offer(req, self.m2, 700)
+        winner = workflow.create_offer(req, self.m3, 650)
+        # "Старі" дані: два прийняті офери на одну заявку, лічильники перебудовані з них
+        Offer.objects.filter(id__in=[legacy.id, winner.id]).update(is_accepted=True)
+        rollups.rebuild()
+
+        workflow.accept_offer(winner)
+        self.assertFalse(Offer.objects.get(id=legacy.id).is_accepted)
+        incremental = self.snapshot()
+        rollups.rebuild()
+        self.assertEqual(incremental, self.snapshot())
+        self.assertEqual(MechanicStats.objects.get(mechanic=self.m2).offers_accepted, 0)
+        self.assertEqual(MechanicStats.objects.get(mechanic=self.m3).offers_accepted, 1)
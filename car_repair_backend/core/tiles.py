@@ -0,0 +1,192 @@
+# car_repair_backend/core/tiles.py
+"""
+Кластери для мапи по тайлах (z/x/y, Web Mercator).
+
+Кожен тайл ділиться на сітку CELLS_PER_TILE x CELLS_PER_TILE, точки в клітинці
+зливаються в один кластер (SnapToGrid + GROUP BY в БД). Сітка прив'язана до меж
+тайла, тому кластер ніколи не перетинає тайли - і кожен тайл можна кешувати
+окремо та скидати тільки його, коли в ньому змінилась СТО чи заявка.
+"""
+
+import math
+from django.conf import settings
+from django.contrib.gis.db.models import Collect
+from django.contrib.gis.db.models.functions import Centroid, SnapToGrid
+from django.contrib.gis.geos import Polygon
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Min
+from .models import ServiceStation, Request
+
+CELLS_PER_TILE = 8
+MAX_ZOOM = 20
+# Тайли глибше за цей зум не кешуємо (їх багато, а точок в кожному мало)
+MAX_CACHED_ZOOM = 16
+TILE_CACHE_TTL = getattr(settings, 'MAP_TILE_CACHE_TTL', 600)  # секунди
+# Скільки тайлів можна зібрати в одному bbox-запиті
+MAX_TILES_PER_QUERY = 64
+FORMATS = ('json', 'mvt')
+LAYERS = ('stations', 'requests')
+
+
+def _layer_queryset(layer):
+    if layer == 'stations':
+        return ServiceStation.objects.filter(location__isnull=False)
+    # На мапі водія/майстра - тільки відкриті заявки
+    return Request.objects.filter(status='new')
+
+
+# --- МАТЕМАТИКА ТАЙЛІВ ---
+
+def tile_bounds(z, x, y):
+    """
+    (west, south, east, north) тайла в градусах.
+    """
+    n = 2 ** z
+
+    def lat(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360 - 180, lat(y + 1), (x + 1) / n * 360 - 180, lat(y)
+
+
+def tile_for_point(lng, lat, z):
+    n = 2 ** z
+    lat = max(min(lat, 85.0511), -85.0511)
+    x = int((lng + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tiles_for_bbox(west, south, east, north, z):
+    x_min, y_min = tile_for_point(west, north, z)
+    x_max, y_max = tile_for_point(east, south, z)
+    return [(x, y) for x in range(x_min, x_max + 1) for y in range(y_min, y_max + 1)]
+
+
+def tile_cache_key(layer, fmt, z, x, y):
+    return f"map_tile:{layer}:{fmt}:{z}:{x}:{y}"
+
+
+# --- ПОБУДОВА ТАЙЛА ---
+
+def build_tile(layer, z, x, y):
+    """
+    [{lat, lng, count, id}] для тайла. id - тільки для одиночних точок.
+    """
+    west, south, east, north = tile_bounds(z, x, y)
+    envelope = Polygon.from_bbox((west, south, east, north))
+    envelope.srid = 4326
+    rows = _layer_queryset(layer).filter(location__intersects=envelope).annotate(
+        cell=SnapToGrid(
+            'location', (east - west) / CELLS_PER_TILE, (north - south) / CELLS_PER_TILE, west, south
+        ),
+    ).values('cell').annotate(
+        count=Count('id'),
+        center=Centroid(Collect('location')),
+        sample_id=Min('id'),
+    ).order_by()
+
+    return [
+        {
+            "lat": row['center'].y,
+            "lng": row['center'].x,
+            "count": row['count'],
+            "id": row['sample_id'] if row['count'] == 1 else None,
+        }
+        for row in rows
+    ]
+
+
+def build_tile_mvt(layer, z, x, y):
+    """
+    Той самий тайл, але як Mapbox Vector Tile (тільки PostGIS 3+).
+    """
+    west, south, east, north = tile_bounds(z, x, y)
+    points_sql, params = _layer_queryset(layer).values('id', 'location').query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT ST_AsMVT(tile, %s) FROM (
+                SELECT ST_AsMVTGeom(
+                           ST_Transform(ST_Centroid(ST_Collect(p.location)), 3857),
+                           ST_TileEnvelope(%s, %s, %s)
+                       ) AS geom,
+                       COUNT(*) AS count,
+                       CASE WHEN COUNT(*) = 1 THEN MIN(p.id) END AS id
+                FROM ({points_sql}) p
+                WHERE p.location && ST_MakeEnvelope(%s, %s, %s, %s, 4326)
+                GROUP BY ST_SnapToGrid(p.location, %s, %s, %s, %s)
+            ) tile
+            """,
+            [
+                layer, z, x, y, *params,
+                west, south, east, north,
+                west, south, (east - west) / CELLS_PER_TILE, (north - south) / CELLS_PER_TILE,
+            ],
+        )
+        return bytes(cursor.fetchone()[0] or b'')
+
+
+# --- КЕШ ---
+
+def get_tile(layer, z, x, y, fmt='json'):
+    build = build_tile_mvt if fmt == 'mvt' else build_tile
+    if z > MAX_CACHED_ZOOM:
+        return build(layer, z, x, y)
+    key = tile_cache_key(layer, fmt, z, x, y)
+    tile = cache.get(key)
+    if tile is None:
+        tile = build(layer, z, x, y)
+        cache.set(key, tile, TILE_CACHE_TTL)
+    return tile
+
+
+def clusters_for_bbox(layer, west, south, east, north, z):
+    """
+    Кластери для видимої області: тайли беремо з кешу одним get_many,
+    добудовуємо тільки відсутні.
+    """
+    tiles = tiles_for_bbox(west, south, east, north, z)
+    if len(tiles) > MAX_TILES_PER_QUERY:
+        raise ValueError("Забагато тайлів для цього зуму - зменшіть область")
+
+    cacheable = z <= MAX_CACHED_ZOOM
+    keys = {tile_cache_key(layer, 'json', z, x, y): (x, y) for x, y in tiles}
+    cached = cache.get_many(list(keys)) if cacheable else {}
+    missing = {}
+    for key, (x, y) in keys.items():
+        if key not in cached:
+            missing[key] = build_tile(layer, z, x, y)
+    if cacheable and missing:
+        cache.set_many(missing, TILE_CACHE_TTL)
+
+    clusters = []
+    for tile in (*cached.values(), *missing.values()):
+        clusters.extend(
+            c for c in tile
+            if west <= c['lng'] <= east and south <= c['lat'] <= north
+        )
+    return clusters
+
+
+def invalidate_point(layer, point):
+    invalidate_points(layer, [point])
+
+
+def invalidate_points(layer, points):
+    """
+    Скидає всі закешовані тайли (на всіх зумах), в які потрапляють точки.
+    Після коміту - щоб паралельний запит не закешував старі дані знову.
+    """
+    tiles = set()
+    for point in points:
+        if point is None:
+            continue
+        # Координати з GEOS - один раз на точку; сусідні точки на дрібних зумах
+        # дають ті самі тайли, тож ключі будуємо вже по унікальних тайлах
+        lng, lat = point.coords
+        tiles.update((z, *tile_for_point(lng, lat, z)) for z in range(MAX_CACHED_ZOOM + 1))
+    keys = {tile_cache_key(layer, fmt, z, x, y) for z, x, y in tiles for fmt in FORMATS}
+    if keys:
+        transaction.on_commit(lambda: cache.delete_many(list(keys)))
@@ -0,0 +1,323 @@
+# car_repair_backend/core/vehicles.py
+"""
+Каталог марок / моделей / поколінь: автодоповнення і нормалізація вільного тексту.
+
+Індекс будується з каталогу один раз на версію (search.VersionedIndex) і далі
+живе в пам'яті процесу:
+- відсортований словник нормалізованих ключів ("toyota camry", "camry",
+  "vw golf", "фольксваген golf"...) -> записи; префіксний пошук - bisect,
+  тож автодоповнення не ходить у БД;
+- словники марок і моделей (з синонімами) для нормалізатора: точний збіг
+  найдовшого префікса, далі нечіткий (difflib) - для "TOYTA CAMRY 2.5",
+  "BMW 320d" і подібного тексту з парсера або з клавіатури.
+"""
+
+import difflib
+import json
+import os
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from django.conf import settings
+from django.db import transaction
+from .models import VehicleMake, VehicleModel, VehicleGeneration, Car, Request, ArchivedRequest
+from .search import VersionedIndex
+
+CATALOG_PATH = os.path.join(settings.BASE_DIR, 'core', 'fixtures', 'car_catalog.json')
+AUTOCOMPLETE_LIMIT = 10
+MAX_SCAN = 500             # більше ключів з одним префіксом не переглядаємо
+MAKE_CUTOFF = 0.8          # схожість для нечіткого збігу марки ("toyta" -> toyota)
+MODEL_CUTOFF = 0.75
+BATCH_SIZE = 2000
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+# Діакритика в латинських назвах ("Škoda", "Citroën") - кирилицю не чіпаємо
+LATIN_FOLD = str.maketrans('šëéèöüçäåøž', 'seeeoucaaoz')
+# "пассат" -> "passat": моделі в каталозі латиницею, а набирають часто кирилицею
+TRANSLIT = str.maketrans({
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'ґ': 'g', 'д': 'd', 'е': 'e', 'є': 'e', 'ё': 'e',
+    'ж': 'zh', 'з': 'z', 'и': 'i', 'і': 'i', 'ї': 'i', 'й': 'y', 'к': 'k', 'л': 'l', 'м': 'm',
+    'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f', 'х': 'h',
+    'ц': 'c', 'ч': 'ch', 'ш': 'sh', 'щ': 'sch', 'ь': '', 'ъ': '', 'ы': 'y', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+})
+
+
+def normalize(text):
+    """
+    "Mercedes-Benz E-Class" -> "mercedes benz e class", "Kia cee'd" -> "kia ceed".
+    """
+    text = (text or '').lower().replace("'", '').replace('’', '').replace('ʼ', '').translate(LATIN_FOLD)
+    return ' '.join(TOKEN_RE.findall(text))
+
+
+class CatalogIndex:
+    def __init__(self, makes, models, generations):
+        self.makes = {row['id']: row for row in makes}
+        self.models = {row['id']: row for row in models}
+        self.generations = defaultdict(list)  # model_id -> [(id, year_from, year_to)]
+        for row in generations:
+            self.generations[row['model_id']].append((row['id'], row['year_from'], row['year_to']))
+
+        # Готові відповіді автодоповнення - серіалізуються як є
+        self.suggestions = {}
+        self.make_keys = {}                     # нормалізована назва/синонім -> make_id
+        self.model_keys = defaultdict(dict)     # make_id -> {назва/синонім -> model_id}
+        self.any_model_keys = {}                # назва моделі без марки -> model_id (перший)
+        by_key = defaultdict(list)
+
+        for make in self.makes.values():
+            suggestion = {"kind": "make", "id": make['id'], "make_id": make['id'],
+                          "make": make['name'], "model": None, "label": make['name']}
+            self.suggestions['make', make['id']] = suggestion
+            for name in [make['name'], *make['aliases']]:
+                key = normalize(name)
+                if key:
+                    self.make_keys.setdefault(key, make['id'])
+                    by_key[key].append(('make', make['id']))
+
+        for model in self.models.values():
+            make = self.makes[model['make_id']]
+            label = f"{make['name']} {model['name']}"
+            self.suggestions['model', model['id']] = {
+                "kind": "model", "id": model['id'], "make_id": make['id'],
+                "make": make['name'], "model": model['name'], "label": label,
+            }
+            model_names = [key for key in (normalize(name) for name in [model['name'], *model['aliases']]) if key]
+            make_names = [key for key in (normalize(name) for name in [make['name'], *make['aliases']]) if key]
+            for model_key in model_names:
+                self.model_keys[make['id']].setdefault(model_key, model['id'])
+                self.any_model_keys.setdefault(model_key, model['id'])
+                by_key[model_key].append(('model', model['id']))
+                for make_key in make_names:
+                    by_key[f"{make_key} {model_key}"].append(('model', model['id']))
+
+        self.by_key = dict(by_key)
+        self.vocabulary = sorted(self.by_key)
+        self.all_make_keys = list(self.make_keys)
+        self.all_model_keys = list(self.any_model_keys)
+
+    def _variants(self, key):
+        """
+        Нормалізований запит + латинський варіант, якщо в ньому є кирилиця:
+        марка (з синонімом) -> її назва, решта транслітерується.
+        "фольксваген пас" -> "volkswagen pas", "мерс е" -> "mercedes benz e".
+        """
+        variants = [key]
+        if key.isascii():
+            return variants
+        tokens = key.split()
+        for n in (2, 1):
+            make_id = self.make_keys.get(' '.join(tokens[:n]))
+            if make_id:
+                head, tokens = [normalize(self.makes[make_id]['name'])], tokens[n:]
+                break
+        else:
+            head = []
+        latin = ' '.join(head + [token.translate(TRANSLIT) for token in tokens])
+        if latin and latin != key:
+            variants.append(latin)
+        return variants
+
+    # --- АВТОДОПОВНЕННЯ ---
+
+    def autocomplete(self, q, limit=AUTOCOMPLETE_LIMIT):
+        """
+        Марки й моделі, чий ключ починається з запиту. Спершу точні збіги,
+        потім коротші ключі (ближчі до запиту), марки перед їхніми моделями.
+        """
+        key = normalize(q)
+        if not key:
+            return []
+        ranked = {}
+        for prefix in self._variants(key):
+            start = bisect_left(self.vocabulary, prefix)
+            for candidate in self.vocabulary[start:start + MAX_SCAN]:
+                if not candidate.startswith(prefix):
+                    break
+                rank = (candidate != prefix, len(candidate))
+                for entry in self.by_key[candidate]:
+                    entry_rank = (*rank, entry[0] != 'make')
+                    if entry not in ranked or entry_rank < ranked[entry]:
+                        ranked[entry] = entry_rank
+        best = sorted(ranked, key=lambda entry: (ranked[entry], self.suggestions[entry]['label']))
+        return [self.suggestions[entry] for entry in best[:limit]]
+
+    # --- НОРМАЛІЗАЦІЯ ---
+
+    def _model_in_make(self, make_id, tokens):
+        keys = self.model_keys.get(make_id, {})
+        for n in range(len(tokens), 0, -1):
+            model_id = keys.get(' '.join(tokens[:n]))
+            if model_id:
+                return model_id
+        for n in (2, 1):
+            if len(tokens) >= n:
+                close = difflib.get_close_matches(' '.join(tokens[:n]), list(keys), n=1, cutoff=MODEL_CUTOFF)
+                if close:
+                    return keys[close[0]]
+        return None
+
+    def match(self, text):
+        """
+        model_id для "марка модель ..." у вільній формі або None.
+        """
+        key = normalize(text)
+        for variant in self._variants(key) if key else ():
+            model_id = self._match_tokens(variant.split())
+            if model_id:
+                return model_id
+        return None
+
+    def _match_tokens(self, tokens):
+        # 1. Найдовший точний префікс: "land rover range rover sport 3.0" -> модель
+        for n in range(len(tokens), 0, -1):
+            entries = self.by_key.get(' '.join(tokens[:n]))
+            if not entries:
+                continue
+            models = [entry_id for kind, entry_id in entries if kind == 'model']
+            if models:
+                return models[0]
+            # Збіглася тільки марка - модель шукаємо серед її моделей
+            return self._model_in_make(entries[0][1], tokens[n:])
+
+        # 2. Марка з опечаткою ("toyta", "mersedes benz")
+        for n in (2, 1):
+            if len(tokens) >= n:
+                close = difflib.get_close_matches(' '.join(tokens[:n]), self.all_make_keys, n=1, cutoff=MAKE_CUTOFF)
+                if close:
+                    return self._model_in_make(self.make_keys[close[0]], tokens[n:])
+
+        # 3. Модель без марки з опечаткою ("camri")
+        for n in (2, 1):
+            if len(tokens) >= n:
+                close = difflib.get_close_matches(' '.join(tokens[:n]), self.all_model_keys, n=1, cutoff=MODEL_CUTOFF)
+                if close:
+                    return self.any_model_keys[close[0]]
+        return None
+
+    def generation(self, model_id, year):
+        """
+        Покоління моделі за роком випуску (з тих, що перекриваються, - новіше).
+        """
+        if not model_id or not year:
+            return None
+        fitting = [
+            (year_from or 0, gen_id) for gen_id, year_from, year_to in self.generations.get(model_id, ())
+            if (year_from or 0) <= year <= (year_to or 9999)
+        ]
+        return max(fitting)[1] if fitting else None
+
+
+def _build_index():
+    return CatalogIndex(
+        VehicleMake.objects.values('id', 'name', 'aliases'),
+        VehicleModel.objects.values('id', 'make_id', 'name', 'aliases'),
+        VehicleGeneration.objects.values('id', 'model_id', 'year_from', 'year_to'),
+    )
+
+
+catalog_index = VersionedIndex('vehicle_catalog', _build_index)
+
+
+def autocomplete(q, limit=AUTOCOMPLETE_LIMIT):
+    return catalog_index.get().autocomplete(q, limit)
+
+
+def match_vehicle(text, year=None):
+    """
+    (model_id, generation_id) для тексту brand_model / car_model; (None, None) - не впізнали.
+    """
+    index = catalog_index.get()
+    model_id = index.match(text)
+    return model_id, index.generation(model_id, year)
+
+
+# --- ЗАВАНТАЖЕННЯ КАТАЛОГУ ---
+
+@transaction.atomic
+def load_catalog(path=CATALOG_PATH):
+    """
+    Upsert каталогу з JSON: {"Марка": {"aliases": [...], "models": {"Модель": [[покоління, з, по], ...]}}}.
+    Модель може бути і {"aliases": [...], "generations": [...]}. Нічого не видаляє:
+    на записи вже посилаються авто й заявки. Повертає (марок, моделей, поколінь).
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+
+    counts = [0, 0, 0]
+    for make_name, make_data in data.items():
+        make, _ = VehicleMake.objects.update_or_create(
+            name=make_name, defaults={'aliases': make_data.get('aliases', [])},
+        )
+        counts[0] += 1
+        for model_name, model_data in make_data.get('models', {}).items():
+            if isinstance(model_data, list):
+                model_data = {'generations': model_data}
+            model, _ = VehicleModel.objects.update_or_create(
+                make=make, name=model_name, defaults={'aliases': model_data.get('aliases', [])},
+            )
+            counts[1] += 1
+            for gen_name, year_from, year_to in model_data.get('generations', []):
+                VehicleGeneration.objects.update_or_create(
+                    model=model, name=gen_name, defaults={'year_from': year_from, 'year_to': year_to},
+                )
+                counts[2] += 1
+
+    catalog_index.invalidate()
+    return tuple(counts)
+
+
+# --- МАСОВА НОРМАЛІЗАЦІЯ ---
+
+# модель -> (поле з текстом, поле року або None, чи є поле покоління)
+NORMALIZED_SOURCES = (
+    (Car, 'brand_model', 'year', True),
+    (Request, 'car_model', None, False),
+    (ArchivedRequest, 'car_model', None, False),
+)
+
+
+def normalize_existing(redo=False, batch_size=BATCH_SIZE):
+    """
+    Проставляє vehicle_model (і покоління для авто) за вільним текстом.
+    Кожен унікальний рядок зіставляється один раз; оновлення - одним UPDATE
+    на групу рядків з однаковим результатом у межах пачки.
+    Повертає {таблиця: {"scanned", "matched", "distinct"}}.
+    """
+    index = catalog_index.get()
+    memo = {}
+    stats = {}
+    for model, text_field, year_field, has_generation in NORMALIZED_SOURCES:
+        queryset = model.objects.all() if redo else model.objects.filter(vehicle_model__isnull=True)
+        columns = ['id', text_field] + ([year_field] if year_field else [])
+        scanned = matched = 0
+        texts = set()
+        batch = []
+
+        def flush():
+            groups = defaultdict(list)
+            for row_id, model_id, generation_id in batch:
+                groups[model_id, generation_id].append(row_id)
+            for (model_id, generation_id), ids in groups.items():
+                values = {'vehicle_model_id': model_id}
+                if has_generation:
+                    values['vehicle_generation_id'] = generation_id
+                model.objects.filter(id__in=ids).update(**values)
+            batch.clear()
+
+        for row in queryset.order_by('id').values_list(*columns).iterator(chunk_size=batch_size):
+            scanned += 1
+            text = row[1]
+            texts.add(text)
+            if text not in memo:
+                memo[text] = index.match(text)
+            model_id = memo[text]
+            if model_id is None:
+                continue
+            matched += 1
+            batch.append((row[0], model_id, index.generation(model_id, row[2]) if year_field else None))
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+        stats[model._meta.db_table] = {"scanned": scanned, "matched": matched, "distinct": len(texts)}
+    return stats
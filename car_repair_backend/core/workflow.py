@@ -0,0 +1,172 @@
+# car_repair_backend/core/workflow.py
+"""
+Єдина state machine заявки та оферів.
+
+Всі переходи статусу робляться умовним UPDATE ... WHERE status=<очікуваний>
+в одній транзакції: з двох одночасних "прийняти" виграє рівно один,
+другий отримує InvalidTransition. QuerySet.update() не шле post_save,
+тому сповіщення відправляються тут явно - по одному на отримувача.
+"""
+
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .models import Request, Offer
+from .notifications import notify, notify_many, notify_batch
+from . import tiles, rollups, pricing
+
+# Дозволені переходи статусу заявки
+TRANSITIONS = {
+    'new': {'active', 'canceled'},
+    'active': {'done', 'canceled'},
+    'done': set(),
+    'canceled': set(),
+}
+
+
+# Відкриті заявки без прийнятого офера старші за це - закриваються (expire_requests)
+REQUEST_EXPIRE_AFTER = getattr(settings, 'REQUEST_EXPIRE_AFTER', timedelta(days=7))
+
+
+class InvalidTransition(Exception):
+    """Заявка вже не в тому статусі, з якого можна зробити перехід."""
+
+
+def _transition(request_id, from_status, to_status):
+    """
+    Атомарний перехід статусу. Повертає True, якщо саме ми його зробили.
+    """
+    if to_status not in TRANSITIONS[from_status]:
+        raise InvalidTransition(f"{from_status} -> {to_status}")
+    # update() не чіпає auto_now, тому updated_at виставляємо самі
+    return Request.objects.filter(id=request_id, status=from_status).update(
+        status=to_status, updated_at=timezone.now()
+    ) == 1
+
+
+def create_offer(req, mechanic, price, comment=''):
+    """
+    Новий офер на заявку. Лічильники майстра і скетч цін оновлюються тут же,
+    з уже завантаженої заявки - без повторного читання Request.
+    """
+    with transaction.atomic():
+        offer = Offer.objects.create(request=req, mechanic=mechanic, price=price, comment=comment)
+        rollups.offer_created(offer, req.created_at)
+        pricing.record_price(req.category_id, req.location, offer.price)
+    return offer
+
+
+def accept_offer(offer):
+    """
+    Приймає офер: заявка new -> active, офер прийнятий, решта - відхилені.
+    """
+    with transaction.atomic():
+        if not _transition(offer.request_id, 'new', 'active'):
+            raise InvalidTransition("Заявка вже не приймає пропозицій")
+
+        # Вже прийнятий ("старі" дані) - уже є в лічильниках
+        if Offer.objects.filter(id=offer.id, is_accepted=False).update(is_accepted=True):
+            rollups.offer_accepted(offer)
+        # Сусідні офери відхиляємо (на випадок "старих" подвійних прийнять) - і знімаємо їх з лічильників
+        cleared = list(
+            Offer.objects.filter(request_id=offer.request_id, is_accepted=True).exclude(id=offer.id)
+            .only('id', 'mechanic_id', 'price', 'created_at')
+        )
+        if cleared:
+            Offer.objects.filter(id__in=[sibling.id for sibling in cleared]).update(is_accepted=False)
+            for sibling in cleared:
+                rollups.offer_unaccepted(sibling)
+
+        req = Request.objects.select_related('client').get(id=offer.request_id)
+        # Заявка вже не "new" - прибираємо її з тайлів мапи
+        tiles.invalidate_point('requests', req.location)
+        notify(
+            f"user_{offer.mechanic_id}",
+            f"Вашу пропозицію на {req.car_model} прийнято!",
+            {
+                "event": "offer_accepted",
+                "request_id": req.id,
+                "offer_id": offer.id,
+                "status": req.status,
+                "client_phone": req.client.phone
+            }
+        )
+        # Решті майстрів - що заявку віддали іншому (інакше їх офер так і висить "на розгляді")
+        losers = Offer.objects.filter(request_id=req.id).exclude(mechanic_id=offer.mechanic_id)\
+            .values_list('mechanic_id', flat=True)
+        notify_many(
+            [f"user_{mechanic_id}" for mechanic_id in losers],
+            f"Заявку на {req.car_model} віддали іншому майстру",
+            {"event": "offer_rejected", "request_id": req.id, "status": req.status},
+        )
+    return req
+
+
+def finish_request(req):
+    """
+    Завершує заявку: active -> done.
+    """
+    with transaction.atomic():
+        if not _transition(req.id, 'active', 'done'):
+            raise InvalidTransition("Завершити можна тільки заявку в роботі")
+
+        req.status = 'done'
+        rollups.job_done(req.id)
+        notify(
+            f"user_{req.client_id}",
+            f"Статус заявки змінено на: {req.get_status_display()}",
+            {
+                "event": "request_status_update",
+                "request_id": req.id,
+                "status": req.status
+            }
+        )
+    return req
+
+
+def expire_stale_requests(older_than=None, batch_size=1000):
+    """
+    Закриває (new -> canceled) покинуті заявки пачками UPDATE без post_save на кожен рядок.
+    Кожен клієнт отримує одне зведене сповіщення на весь прогін.
+    Повертає статистику пачок: [{"rows": N, "seconds": T}].
+    """
+    cutoff = timezone.now() - (older_than or REQUEST_EXPIRE_AFTER)
+    expired_by_client = {}
+    locations = []
+    batches = []
+
+    while True:
+        started = time.perf_counter()
+        with transaction.atomic():
+            # skip_locked: рядки, які саме зараз приймають (accept_offer), не чіпаємо
+            rows = list(
+                Request.objects.select_for_update(skip_locked=True)
+                .filter(status='new', created_at__lt=cutoff)
+                .order_by('id')
+                .values_list('id', 'client_id', 'location')[:batch_size]
+            )
+            if not rows:
+                break
+            Request.objects.filter(id__in=[row[0] for row in rows]).update(
+                status='canceled', updated_at=timezone.now()
+            )
+        batches.append({"rows": len(rows), "seconds": round(time.perf_counter() - started, 3)})
+
+        for request_id, client_id, location in rows:
+            expired_by_client.setdefault(client_id, []).append(request_id)
+            locations.append(location)
+
+    if expired_by_client:
+        with transaction.atomic():
+            notify_batch([
+                (
+                    f"user_{client_id}",
+                    f"Закрито заявок без відповіді: {len(request_ids)}",
+                    {"event": "requests_expired", "request_ids": request_ids, "status": "canceled"},
+                )
+                for client_id, request_ids in expired_by_client.items()
+            ])
+            tiles.invalidate_points('requests', locations)
+    return batches
@@ -2,12 +2,18 @@ import { useEffect, useRef } from 'react';
 import { useAuth } from '@/context/AuthContext'; // Припускаю, у вас є AuthContext
 
 export const useSocket = (onMessage: (data: any) => void) => {
-    const { token } = useAuth(); // Потрібен токен для авторизації, якщо використовуєте JWT в query params або cookies
+    const { user } = useAuth();
     const socketRef = useRef<WebSocket | null>(null);
+    // Останній отриманий seq кожного stream - після реконекту бекенд дошле пропущене
+    const cursorRef = useRef<Record<string, number>>({});
 
     useEffect(() => {
-        // Якщо використовуєте cookies для auth, токен в URL не обов'язковий, Django Channels зчитає сесію
-        const ws = new WebSocket('ws://localhost:8000/ws/notifications/');
+        // Бекенд авторизує сокет по JWT з query string (JWTAuthMiddleware)
+        const token = localStorage.getItem('access_token');
+        if (!user || !token) return;
+        const cursor = Object.entries(cursorRef.current).map(([stream, seq]) => `${stream}:${seq}`).join(',');
+        const since = cursor ? `&since=${encodeURIComponent(cursor)}` : '';
+        const ws = new WebSocket(`ws://localhost:8000/ws/notifications/?token=${encodeURIComponent(token)}${since}`);
 
         ws.onopen = () => {
             console.log('WebSocket Connected');
@@ -15,6 +21,13 @@ export const useSocket = (onMessage: (data: any) => void) => {
 
         ws.onmessage = (event) => {
             const data = JSON.parse(event.data);
+            if (data.type === 'cursor' || data.type === 'resync') {
+                // Поточний курсор від бекенду; після resync стрічку треба перезавантажити
+                cursorRef.current = { ...cursorRef.current, ...data.cursor };
+                if (data.type === 'cursor') return;
+            } else if (typeof data.seq === 'number' && data.stream && data.seq > (cursorRef.current[data.stream] ?? 0)) {
+                cursorRef.current[data.stream] = data.seq;
+            }
             onMessage(data);
         };
 
@@ -27,7 +40,7 @@ export const useSocket = (onMessage: (data: any) => void) => {
         return () => {
             ws.close();
         };
-    }, [token, onMessage]);
+    }, [user, onMessage]);
 
     return socketRef.current;
 };
\ No newline at end of file